@@ -3,10 +3,25 @@ Cloudinary Configuration
 """
 
 import os
+import time
+import random
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import cloudinary
+import cloudinary.utils
 import cloudinary.uploader
 import cloudinary.api
 from app.utils.logger import logger
+from app.utils.metrics import CLOUDINARY_UPLOAD_DURATION
+from app.config.constants import CLOUDINARY_UPLOAD_CONFIG
+
+# Uploads run on their own threads so transfers never block the event loop
+_upload_executor = ThreadPoolExecutor(
+    max_workers=CLOUDINARY_UPLOAD_CONFIG['MAX_CONCURRENT'] + 1,
+    thread_name_prefix="cloudinary-upload"
+)
+_upload_semaphore = asyncio.Semaphore(CLOUDINARY_UPLOAD_CONFIG['MAX_CONCURRENT'])
 
 
 def configure_cloudinary():
@@ -39,22 +54,94 @@ async def test_cloudinary_connection():
         return False
 
 
-async def upload_video(file_path: str, folder: str = None, public_id: str = None):
+def _upload_chunked(file_path: str, options: dict, progress_callback=None) -> dict:
+    """
+    Chunked upload with per-chunk retry (runs on the upload thread pool)
+    
+    Same protocol as cloudinary.uploader.upload_large: every chunk carries a
+    Content-Range and the shared X-Unique-Upload-Id, so a failed chunk can be
+    re-sent on its own instead of restarting the whole transfer.
+    """
+    chunk_size = CLOUDINARY_UPLOAD_CONFIG['CHUNK_SIZE']
+    max_retries = CLOUDINARY_UPLOAD_CONFIG['MAX_RETRIES']
+    file_size = os.path.getsize(file_path)
+    upload_id = cloudinary.utils.random_public_id()
+    file_name = os.path.basename(file_path)
+    options = dict(options)
+    result = None
+    
+    if file_size == 0:
+        raise ValueError(f"File kosong: {file_path}")
+    
+    with open(file_path, 'rb') as f:
+        offset = 0
+        while offset < file_size:
+            chunk = f.read(chunk_size)
+            http_headers = {
+                "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{file_size}",
+                "X-Unique-Upload-Id": upload_id
+            }
+            
+            for attempt in range(max_retries + 1):
+                try:
+                    result = cloudinary.uploader.upload_large_part(
+                        (file_name, chunk), http_headers=http_headers, **options
+                    )
+                    break
+                except Exception as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = min(CLOUDINARY_UPLOAD_CONFIG['BACKOFF_MAX'],
+                                CLOUDINARY_UPLOAD_CONFIG['BACKOFF_BASE'] * 2 ** attempt)
+                    delay *= random.uniform(0.5, 1.0)
+                    logger.warning(f"⚠️ Cloudinary chunk at {offset} failed ({e}), retry in {delay:.1f}s")
+                    time.sleep(delay)
+            
+            # Later chunks must target the public_id assigned by the first one
+            options["public_id"] = result.get("public_id")
+            offset += len(chunk)
+            if progress_callback:
+                progress_callback(offset, file_size)
+    
+    return result
+
+
+async def _run_upload(file_path: str, options: dict, progress_callback=None) -> dict:
+    """Run a chunked upload off the event loop with bounded concurrency"""
+    loop = asyncio.get_running_loop()
+    
+    def report(sent, total):
+        # Called from the worker thread; deliver on the event loop
+        loop.call_soon_threadsafe(progress_callback, sent, total)
+    
+    async with _upload_semaphore:
+        upload_start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(
+                _upload_executor, _upload_chunked, file_path, options,
+                report if progress_callback else None
+            )
+        except Exception:
+            CLOUDINARY_UPLOAD_DURATION.labels(outcome="failure").observe(time.perf_counter() - upload_start)
+            raise
+        CLOUDINARY_UPLOAD_DURATION.labels(outcome="success").observe(time.perf_counter() - upload_start)
+        return result
+
+
+async def upload_video(file_path: str, folder: str = None, public_id: str = None, progress_callback=None):
     """Upload video to Cloudinary"""
     configure_cloudinary()
     
     folder = folder or f"{os.getenv('CLOUDINARY_FOLDER', 'yolo-deteksi')}/videos"
     
     try:
-        result = cloudinary.uploader.upload(
-            file_path,
-            resource_type="video",
-            folder=folder,
-            public_id=public_id,
-            overwrite=True,
-            timeout=900000,
-            chunk_size=20000000
-        )
+        result = await _run_upload(file_path, {
+            "resource_type": "video",
+            "folder": folder,
+            "public_id": public_id,
+            "overwrite": True,
+            "timeout": CLOUDINARY_UPLOAD_CONFIG['TIMEOUT']
+        }, progress_callback)
         return {
             "url": result.get("secure_url"),
             "public_id": result.get("public_id")
@@ -64,20 +151,21 @@ async def upload_video(file_path: str, folder: str = None, public_id: str = None
         raise
 
 
-async def upload_file(file_path: str, folder: str = None, public_id: str = None, resource_type: str = "auto"):
+async def upload_file(file_path: str, folder: str = None, public_id: str = None, resource_type: str = "auto",
+                      progress_callback=None):
     """Upload file to Cloudinary"""
     configure_cloudinary()
     
     folder = folder or os.getenv('CLOUDINARY_FOLDER', 'yolo-deteksi')
     
     try:
-        result = cloudinary.uploader.upload(
-            file_path,
-            resource_type=resource_type,
-            folder=folder,
-            public_id=public_id,
-            overwrite=True
-        )
+        result = await _run_upload(file_path, {
+            "resource_type": resource_type,
+            "folder": folder,
+            "public_id": public_id,
+            "overwrite": True,
+            "timeout": CLOUDINARY_UPLOAD_CONFIG['TIMEOUT']
+        }, progress_callback)
         return {
             "url": result.get("secure_url"),
             "public_id": result.get("public_id")
@@ -92,17 +180,22 @@ async def delete_resource(public_id: str, resource_type: str = "video"):
     configure_cloudinary()
     
     try:
-        result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            _upload_executor,
+            functools.partial(cloudinary.uploader.destroy, public_id, resource_type=resource_type)
+        )
         return result.get("result") == "ok"
     except Exception as e:
         logger.error(f"❌ Cloudinary delete failed: {str(e)}")
         return False
 
 
-async def upload_to_cloudinary(file_path: str, folder: str = "deteksi"):
+async def upload_to_cloudinary(file_path: str, folder: str = "deteksi", progress_callback=None):
     """Upload file to Cloudinary - alias for compatibility"""
     try:
-        result = await upload_file(file_path, folder=folder, resource_type="video")
+        result = await upload_file(file_path, folder=folder, resource_type="video",
+                                   progress_callback=progress_callback)
         return result.get("url")
     except Exception as e:
         logger.error(f"❌ upload_to_cloudinary failed: {str(e)}")
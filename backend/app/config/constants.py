@@ -2,6 +2,8 @@
 Application Constants - PKJI 2023 Standards
 """
 
+import os
+
 # Kapasitas dasar (C0) per tipe jalan (smp/jam/lajur)
 KAPASITAS_DASAR = {
     '4/2 D': 1650,    # 4 lajur 2 arah dengan median
@@ -79,8 +81,110 @@ YOLO_CONFIG = {
     'CATCH_UP_ZONE': 100,
     'MIN_TRACK_DISTANCE': 30,
     'MAX_FRAMES_SINCE_LINE': 15,
+    # Tiled inference for high-resolution cameras (full-res tiles around the counting line)
+    'TILED_INFERENCE': False,
+    'TILE_SIZE': 640,
+    'TILE_OVERLAP': 0.2,
+    'TILE_BAND_MARGIN': 200,
+    'TILE_BATCH_SIZE': 8,
+    'TILE_MERGE_IOS': 0.8,
+    # Per-video processing resolution calibration
+    'AUTO_RESOLUTION': False,
+    'RESOLUTION_CANDIDATES': [480, 640, 960, 1280],
+    'MIN_BOX_SIZE': 24,
+    'CALIBRATION_FRAMES': 16,
+    'CALIBRATION_RECALL': 0.9,
+    'CALIBRATION_BAND': 0.15,
 }
 
 # Video processing
-MAX_VIDEO_SIZE = 5 * 1024 * 1024 * 1024  # 5GB
+MAX_VIDEO_SIZE = int(os.getenv('MAX_VIDEO_SIZE_MB', 5 * 1024)) * 1024 * 1024  # 5GB default
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))  # seconds an idle resumable upload is kept
+UPLOAD_SESSION_CLEANUP_INTERVAL = int(os.getenv('UPLOAD_SESSION_CLEANUP_INTERVAL', 15 * 60))  # seconds between sweeps
+
+# Cloudinary upload stage (chunked, retried, bounded concurrency)
+CLOUDINARY_UPLOAD_CONFIG = {
+    'MAX_CONCURRENT': int(os.getenv('CLOUDINARY_MAX_CONCURRENT_UPLOADS', 2)),
+    'CHUNK_SIZE': 20 * 1024 * 1024,  # 20MB, same as cloudinary.uploader.upload_large
+    'MAX_RETRIES': 4,                # per chunk
+    'BACKOFF_BASE': 1.0,             # seconds, doubled per attempt
+    'BACKOFF_MAX': 30.0,
+    'TIMEOUT': 600,                  # seconds per chunk request
+}
+
+# Progress push (SSE)
+PROGRESS_CONFIG = {
+    'MIN_INTERVAL': float(os.getenv('PROGRESS_MIN_INTERVAL', 0.5)),  # seconds between messages per job
+    'HEARTBEAT': 15,                                                 # keep-alive comment when idle
+    'STREAM_TOKEN_TTL': int(os.getenv('STREAM_TOKEN_TTL', 15 * 60)), # seconds a job-scoped ?token= is valid
+}
+
+# Processed media storage
+STORAGE_CONFIG = {
+    'BACKEND': os.getenv('STORAGE_BACKEND', 'auto'),  # auto: Cloudinary when configured, else local disk
+    'MEDIA_ROOT': os.getenv('MEDIA_ROOT', '/tmp/media'),
+    'RETENTION_DAYS': float(os.getenv('MEDIA_RETENTION_DAYS', 7)),
+    'MAX_TOTAL_MB': float(os.getenv('MEDIA_MAX_TOTAL_MB', 2048)),
+    'THUMBNAIL_WIDTH': 320,
+    'STREAM_CHUNK_SIZE': 256 * 1024,
+}
+
+# Progressive detection while a resumable upload is still arriving
+PROGRESSIVE_CONFIG = {
+    'START_BYTES': 8 * 1024 * 1024,      # received bytes before detection starts
+    'MIN_GROWTH_BYTES': 2 * 1024 * 1024,  # new bytes needed before reopening the file
+    'HOLDBACK_FRAMES': 4,                 # frames near the end of a partial file decoded again later
+    'POLL_INTERVAL': 0.5,
+    'STALL_TIMEOUT': 30 * 60,             # give up when the upload stops growing
+}
 ALLOWED_VIDEO_TYPES = ['video/mp4', 'video/avi', 'video/mov', 'video/mkv', 'video/x-matroska']
+
+# Memory admission for detection jobs (estimates in MB)
+MEMORY_CONFIG = {
+    'MEMORY_LIMIT_MB': int(os.getenv('MEMORY_LIMIT_MB', 512)),
+    'SAFETY_MARGIN_MB': int(os.getenv('MEMORY_SAFETY_MARGIN_MB', 48)),
+    'TORCH_RUNTIME_MB': 180,       # torch + ultralytics import, paid once per process
+    'MODEL_MEMORY_FACTOR': 4.0,    # resident size relative to the weights file
+    'MODEL_DEFAULT_MB': 6.5,       # yolov8n.pt when the weights file is not on disk yet
+    'ACTIVATION_FACTOR': 20,       # activation memory relative to one float32 input tensor
+    'FRAME_BUFFERS_FULL': 6,       # decode, resize, annotate, encoder queue
+    'FRAME_BUFFERS_COUNT_ONLY': 2,
+    'ADMISSION_MAX_WAIT': int(os.getenv('ADMISSION_MAX_WAIT', 120)),  # seconds before downgrading
+    'ADMISSION_POLL_INTERVAL': 2.0,
+}
+
+# In-memory job status table
+STATUS_STORE_CONFIG = {
+    'TERMINAL_TTL': int(os.getenv('STATUS_TTL_SECONDS', 600)),  # keep finished jobs this long for polls
+    'MAX_ENTRIES': int(os.getenv('STATUS_MAX_ENTRIES', 1000)),
+}
+
+# In-process caches
+CACHE_CONFIG = {
+    'STATUS_RESULTS': int(os.getenv('STATUS_CACHE_SIZE', 256)),  # completed jobs kept for status polls
+    'USERS': 1024,                                               # authenticated users resolved from tokens
+    'USER_TTL': int(os.getenv('USER_CACHE_TTL', 30)),            # seconds; bounds staleness across workers
+    'RESPONSES': 512,                                            # cached dashboard/statistics responses
+}
+
+# Response cache TTL per endpoint (seconds); writes invalidate earlier by tag
+RESPONSE_CACHE_TTL = {
+    'dashboard.stats': 30,
+    'dashboard.chart': 60,
+    'admin.stats': 30,
+    'histori.summary': 60,
+    'system.status': 15,
+}
+
+# Password hashing (bcrypt)
+PASSWORD_CONFIG = {
+    'BCRYPT_ROUNDS': int(os.getenv('BCRYPT_ROUNDS', 12)),  # cost factor; older hashes are upgraded at login
+    'MAX_WORKERS': int(os.getenv('BCRYPT_WORKERS', min(4, os.cpu_count() or 1))),
+}
+
+# Bulk PKJI calculation (/api/perhitungan/bulk)
+BULK_CONFIG = {
+    'MAX_ROWS': int(os.getenv('BULK_MAX_ROWS', 5000)),  # observations per request
+    'MAX_ERRORS': 20,                                     # invalid rows reported back
+}
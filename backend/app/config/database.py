@@ -5,6 +5,7 @@ Database Configuration - MongoDB with Motor (async driver)
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.utils.logger import logger
+from app.utils.metrics import MongoCommandMetrics
 
 # Global database client
 client: AsyncIOMotorClient = None
@@ -25,7 +26,7 @@ async def connect_db():
         return
     
     try:
-        client = AsyncIOMotorClient(mongodb_uri)
+        client = AsyncIOMotorClient(mongodb_uri, event_listeners=[MongoCommandMetrics()])
         
         # Get database name from URI or use default
         db_name = os.getenv("DB_NAME", "yolo_detection")
@@ -52,19 +53,43 @@ async def create_indexes():
         await db.users.create_index("emailUser", unique=True)
         await db.users.create_index("role")
         await db.users.create_index("isActive")
+        await db.users.create_index([("createdAt", -1), ("_id", -1)])
+        await db.users.create_index([("role", 1), ("createdAt", -1), ("_id", -1)])
+        await db.users.create_index("searchKeys")
+        await backfill_user_search_keys()
         
         # DeteksiYOLO indexes
         await db.deteksi.create_index("userId")
         await db.deteksi.create_index("status")
         await db.deteksi.create_index([("createdAt", -1)])
+        await db.deteksi.create_index([("status", 1), ("createdAt", -1), ("_id", -1)])
+        await db.deteksi.create_index([("userId", 1), ("createdAt", -1), ("_id", -1)])
+        await db.deteksi.create_index("storage.video.key", sparse=True)
+        await db.deteksi.create_index("storage.thumbnail.key", sparse=True)
+        
+        # Backfill totalKendaraan (stored at save time since it was added)
+        await db.deteksi.update_many(
+            {"status": "completed", "countingData": {"$exists": True}, "totalKendaraan": {"$exists": False}},
+            [{"$set": {"totalKendaraan": {"$add": [
+                {"$ifNull": [f"$countingData.{lane}.{vehicle}", 0]}
+                for lane in ("laneKiri", "laneKanan")
+                for vehicle in ("mobil", "bus", "truk")
+            ]}}}]
+        )
         
         # Histori indexes
-        await db.histori.create_index([("idUser", 1), ("tanggal", -1)])
+        await db.histori.create_index([("idUser", 1), ("tanggal", -1), ("_id", -1)])
+        await db.histori.create_index([("idUser", 1), ("actionType", 1), ("tanggal", -1), ("_id", -1)])
         await db.histori.create_index([("actionType", 1), ("tanggal", -1)])
         
         # Perhitungan indexes
         await db.perhitungan.create_index("userId")
-        await db.perhitungan.create_index([("createdAt", -1)])
+        await db.perhitungan.create_index([("createdAt", -1), ("_id", -1)])
+        
+        # Daily rollups (built from raw data on first start)
+        await db.daily_rollups.create_index("date")
+        from app.services.rollups import ensure_rollups
+        await ensure_rollups(db)
         
         logger.info("✅ Database indexes created")
         
@@ -72,6 +97,22 @@ async def create_indexes():
         logger.warning(f"⚠️ Index creation warning: {str(e)}")
 
 
+async def backfill_user_search_keys():
+    """Add searchKeys to users created before the admin search index existed"""
+    from pymongo import UpdateOne
+    from app.models.user import user_search_keys
+    
+    updates = []
+    cursor = db.users.find({"searchKeys": {"$exists": False}}, {"namaUser": 1, "emailUser": 1})
+    async for user in cursor:
+        keys = user_search_keys(user.get("namaUser"), user.get("emailUser"))
+        updates.append(UpdateOne({"_id": user["_id"]}, {"$set": {"searchKeys": keys}}))
+    
+    if updates:
+        await db.users.bulk_write(updates, ordered=False)
+        logger.info(f"🔎 Search keys added to {len(updates)} user(s)")
+
+
 async def close_db():
     """Close MongoDB connection"""
     global client
@@ -1,29 +1,143 @@
 """
-Socket Manager Stub - REST-only mode
-Socket.IO has been removed, this is a placeholder for backwards compatibility
+Progress Broker - Push channel for detection progress (Server-Sent Events)
+One channel per job fans the latest state out to every subscriber; updates
+are coalesced so subscribers receive at most one message per interval
 """
 
+import time
+import asyncio
+from typing import AsyncIterator, Optional
+
 from app.utils.logger import logger
+from app.config.constants import PROGRESS_CONFIG
+
+
+def is_terminal(data: dict) -> bool:
+    """True when no further updates will follow for this job"""
+    status = (data or {}).get("status")
+    if status == "error":
+        return True
+    if status != "completed":
+        return False
+    # Completed jobs still report the background video upload
+    upload = ((data.get("result") or {}).get("video_upload") or {}).get("status")
+    return upload not in ("pending", "uploading")
+
+
+class JobChannel:
+    """Latest state of one job plus its subscribers"""
+
+    def __init__(self, job_id: str, min_interval: float):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.latest = None
+        self.version = 0
+        self.closed = False
+        self.subscribers = set()
+        self._last_flush = 0.0
+        self._flush_handle = None
+
+    def publish(self, data: dict):
+        self.latest = data
+        self.version += 1
+        final = is_terminal(data)
+        if final:
+            self.closed = True
+
+        elapsed = time.monotonic() - self._last_flush
+        if final or elapsed >= self.min_interval:
+            self._flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._flush()
+                return
+            self._flush_handle = loop.call_later(self.min_interval - elapsed, self._flush)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._last_flush = time.monotonic()
+
+        message = (self.version, self.latest)
+        for queue in self.subscribers:
+            # Keep only the newest message per subscriber
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+
+class ProgressBroker:
+    """Registry of job channels (replaces the former Socket.IO stub)"""
+
+    def __init__(self, min_interval: float = None):
+        self.min_interval = PROGRESS_CONFIG['MIN_INTERVAL'] if min_interval is None else min_interval
+        self.channels = {}
+        logger.info("📡 Progress broker initialized (SSE)")
+
+    def publish(self, job_id: str, data: dict):
+        """Publish a job's full state; no-op when nobody is listening"""
+        channel = self.channels.get(job_id)
+        if channel is None:
+            return
+        channel.publish(data)
+
+    def subscriber_count(self, job_id: str = None) -> int:
+        if job_id is not None:
+            channel = self.channels.get(job_id)
+            return len(channel.subscribers) if channel else 0
+        return sum(len(channel.subscribers) for channel in self.channels.values())
+
+    async def subscribe(self, job_id: str, initial: Optional[dict] = None,
+                        heartbeat: float = None) -> AsyncIterator[Optional[tuple]]:
+        """
+        Yield (version, state) as the job progresses, or None every `heartbeat`
+        seconds without updates; ends after a terminal state
+        """
+        heartbeat = heartbeat or PROGRESS_CONFIG['HEARTBEAT']
+        channel = self.channels.get(job_id)
+        if channel is None:
+            channel = self.channels[job_id] = JobChannel(job_id, self.min_interval)
+
+        queue = asyncio.Queue(maxsize=1)
+        channel.subscribers.add(queue)
+        try:
+            current = channel.latest or initial
+            if current is not None:
+                yield channel.version, current
+                if is_terminal(current):
+                    return
+
+            while True:
+                try:
+                    version, data = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield version, data
+                if is_terminal(data):
+                    return
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers:
+                if channel._flush_handle is not None:
+                    channel._flush_handle.cancel()
+                self.channels.pop(job_id, None)
 
-class SocketManagerStub:
-    """Stub socket manager that does nothing - REST-only mode"""
-    
-    def __init__(self):
-        logger.info("🔄 SocketManager stub initialized (REST-only mode)")
-    
     async def emit_progress(self, tracking_id: str, data: dict):
-        """No-op emit for backwards compatibility"""
-        pass
-    
+        """Backwards compatible emit used by the legacy detection service"""
+        self.publish(tracking_id, data)
+
     async def emit(self, event: str, data: dict, to: str = None):
-        """No-op emit for backwards compatibility"""
-        pass
-    
+        if to:
+            self.publish(to, {**data, "event": event})
+
     async def broadcast(self, event: str, data: dict):
-        """No-op broadcast for backwards compatibility"""
-        pass
+        for job_id in list(self.channels):
+            self.publish(job_id, {**data, "event": event})
 
-# Create stub instance
-socket_manager = SocketManagerStub()
 
-logger.info("⚠️ Socket.IO disabled - using REST-only mode with polling")
+# Global broker instance (name kept for existing imports)
+socket_manager = ProgressBroker()
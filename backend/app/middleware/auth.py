@@ -2,20 +2,83 @@
 Authentication Middleware
 """
 
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from bson import ObjectId
-from app.utils.jwt import verify_token
+from app.utils.jwt import verify_token, verify_stream_token
+from app.utils.cache import LRUCache
 from app.config.database import get_collection
+from app.config.constants import CACHE_CONFIG
 from app.utils.logger import logger
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# user_id -> user document (without password); short TTL, invalidated on admin changes
+user_cache = LRUCache(CACHE_CONFIG['USERS'], ttl=CACHE_CONFIG['USER_TTL'])
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a cached user so the next request reads it from the database"""
+    user_cache.pop(str(user_id))
 
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user from token"""
-    token = credentials.credentials
+    return await authenticate_token(credentials.credentials)
+
+
+async def get_current_user_or_query_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    token: Optional[str] = Query(None)
+):
+    """
+    Same as get_current_user, but also accepts ?token=
+    For clients that cannot set headers (<video> sources, EventSource)
+    """
+    raw_token = credentials.credentials if credentials else token
+    if not raw_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "status": "error",
+                "message": "Token tidak ditemukan. Silakan login kembali.",
+                "code": "TOKEN_MISSING"
+            }
+        )
+    return await authenticate_token(raw_token)
+
+
+async def get_stream_user(
+    tracking_id: str,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    token: Optional[str] = Query(None)
+):
+    """
+    Bearer token, or a job-scoped ?token= from POST /events/{tracking_id}/token
+    The long-lived login JWT is not accepted in the URL (it would end up in logs)
+    """
+    if credentials:
+        return await authenticate_token(credentials.credentials)
     
+    user_id = verify_stream_token(token, tracking_id) if token else None
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={
+                "success": False,
+                "status": "error",
+                "message": "Token stream tidak valid atau telah kadaluarsa.",
+                "code": "STREAM_TOKEN_INVALID"
+            }
+        )
+    return await get_active_user(user_id)
+
+
+async def authenticate_token(token: str) -> dict:
+    """Resolve a JWT to an active user"""
     # Verify token
     payload = verify_token(token)
     if not payload:
@@ -41,9 +104,20 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             }
         )
     
-    # Get user from database
-    users_collection = get_collection("users")
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    return await get_active_user(user_id)
+
+
+async def get_active_user(user_id: str) -> dict:
+    """Load an authenticated user (cached) and reject deleted or inactive accounts"""
+    # Get user from cache or database
+    user = user_cache.get(user_id)
+    if user is None:
+        users_collection = get_collection("users")
+        user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"passwordUser": 0, "searchKeys": 0})
+        if user:
+            # Convert ObjectId to string
+            user["_id"] = str(user["_id"])
+            user_cache.set(user_id, user)
     
     if not user:
         raise HTTPException(
@@ -67,10 +141,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             }
         )
     
-    # Convert ObjectId to string
-    user["_id"] = str(user["_id"])
-    
-    return user
+    # Copy so request handlers cannot modify the cached entry
+    return dict(user)
 
 
 async def get_admin_user(user: dict = Depends(get_current_user)):
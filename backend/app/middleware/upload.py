@@ -4,13 +4,218 @@ File Upload Handling
 
 import os
 import uuid
+import hashlib
+from typing import Callable, Optional
 import aiofiles
-from fastapi import UploadFile, HTTPException
+from fastapi import UploadFile, HTTPException, Request
 from app.utils.logger import logger
-from app.config.constants import MAX_VIDEO_SIZE, ALLOWED_VIDEO_TYPES
+from app.config.constants import MAX_VIDEO_SIZE, ALLOWED_VIDEO_TYPES, UPLOAD_CHUNK_SIZE
+
+try:
+    import multipart
+    from multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # pragma: no cover
+    multipart = None
 
 UPLOAD_DIR = "/tmp/uploads"
 
+# Allowance for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Upload routes parse the body themselves (stream_multipart_to_disk); this
+# keeps the file field in the OpenAPI docs
+VIDEO_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary"}}
+        }}}
+    }
+}
+
+
+def format_size_limit(max_size: int) -> str:
+    """Human readable size limit for error messages"""
+    if max_size >= 1024 ** 3:
+        return f"{max_size / 1024 ** 3:.1f}GB"
+    return f"{max_size / 1024 ** 2:.0f}MB"
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail={"success": False, "message": f"File terlalu besar (maksimal {format_size_limit(max_size)})"}
+    )
+
+
+def safe_filename(filename: str) -> str:
+    """Strip directory components from a client supplied filename"""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name or "video"
+
+
+async def stream_upload_to_disk(file: UploadFile, destination: str,
+                                max_size: int = MAX_VIDEO_SIZE,
+                                chunk_size: int = UPLOAD_CHUNK_SIZE) -> dict:
+    """
+    Stream an upload to disk in fixed-size chunks
+    
+    Memory use stays at one chunk regardless of file size. The SHA-256 hash
+    and size are computed while writing and the size limit is enforced as
+    soon as it is exceeded (the partial file is removed).
+    
+    Returns:
+        Dict with path, size (bytes) and sha256 (hex)
+    """
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    
+    digest = hashlib.sha256()
+    total_size = 0
+    try:
+        async with aiofiles.open(destination, 'wb') as out_file:
+            while content := await file.read(chunk_size):
+                total_size += len(content)
+                
+                if total_size > max_size:
+                    raise _too_large(max_size)
+                
+                digest.update(content)
+                await out_file.write(content)
+    except BaseException:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+    
+    return {"path": destination, "size": total_size, "sha256": digest.hexdigest()}
+
+
+async def stream_multipart_to_disk(request: Request, destination: Callable[[str], str],
+                                   field: str = "file",
+                                   accept: Optional[Callable[[str, str], None]] = None,
+                                   max_size: int = MAX_VIDEO_SIZE) -> dict:
+    """
+    Stream the `field` file of a multipart/form-data request straight to disk
+
+    Unlike an UploadFile parameter, the body is not spooled to a temporary
+    file first: each received chunk goes through the multipart parser into
+    the destination while it is hashed. An oversized Content-Length is
+    rejected before reading anything, and the size limit is enforced again
+    per chunk for chunked requests. `destination(filename)` gives the target
+    path and `accept(filename, content_type)` may raise to reject the file
+    before any of it is written. Other form fields are ignored.
+
+    Returns:
+        Dict with path, size (bytes), sha256 (hex), filename and content_type
+    """
+    if multipart is None:
+        raise RuntimeError("python-multipart is required for file uploads")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise _too_large(max_size)
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "message": "Permintaan harus berupa multipart/form-data"}
+        )
+
+    # Parser callbacks are synchronous: queue events and handle them per chunk
+    events = []
+    header = {"field": b"", "value": b""}
+    headers = []
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        headers.append((header["field"].lower(), header["value"]))
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        events.append(("part", dict(headers)))
+
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    digest = hashlib.sha256()
+    total_size = 0
+    saved = None
+    out_file = None
+    writing = False
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, value in events:
+                if kind == "part":
+                    _, options = parse_options_header(value.get(b"content-disposition", b""))
+                    filename = options.get(b"filename")
+                    writing = (saved is None and filename is not None
+                               and options.get(b"name", b"").decode("latin-1") == field)
+                    if writing:
+                        filename = filename.decode("utf-8", errors="replace")
+                        part_type = value.get(b"content-type", b"").decode("latin-1")
+                        if accept:
+                            accept(filename, part_type)
+                        path = destination(filename)
+                        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                        saved = {"path": path, "filename": filename, "content_type": part_type}
+                        out_file = await aiofiles.open(path, "wb")
+                elif kind == "data" and writing:
+                    total_size += len(value)
+                    if total_size > max_size:
+                        raise _too_large(max_size)
+                    digest.update(value)
+                    await out_file.write(value)
+                elif kind == "end" and writing:
+                    writing = False
+                    await out_file.close()
+                    out_file = None
+            events.clear()
+        parser.finalize()
+    except BaseException:
+        if out_file is not None:
+            await out_file.close()
+        if saved and os.path.exists(saved["path"]):
+            os.remove(saved["path"])
+        raise
+
+    if out_file is not None:
+        # Body ended inside the file part (truncated request)
+        await out_file.close()
+        os.remove(saved["path"])
+        saved = None
+    if saved is None:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "message": f"File tidak ditemukan (field '{field}')"}
+        )
+
+    return {**saved, "size": total_size, "sha256": digest.hexdigest()}
+
 
 async def save_upload_file(file: UploadFile) -> str:
     """Save uploaded file to temporary directory"""
@@ -39,26 +244,10 @@ async def save_upload_file(file: UploadFile) -> str:
     file_path = os.path.join(UPLOAD_DIR, unique_filename)
     
     # Save file
-    total_size = 0
     try:
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            while content := await file.read(1024 * 1024):  # 1MB chunks
-                total_size += len(content)
-                
-                # Check size limit
-                if total_size > MAX_VIDEO_SIZE:
-                    os.remove(file_path)
-                    raise HTTPException(
-                        status_code=400,
-                        detail={
-                            "success": False,
-                            "message": f"Video size exceeds limit. Max: {MAX_VIDEO_SIZE / 1024 / 1024 / 1024:.1f}GB"
-                        }
-                    )
-                
-                await out_file.write(content)
+        saved = await stream_upload_to_disk(file, file_path)
         
-        logger.info(f"📹 Video saved: {unique_filename} ({total_size} bytes)")
+        logger.info(f"📹 Video saved: {unique_filename} ({saved['size']} bytes)")
         
         return file_path
         
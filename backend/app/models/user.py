@@ -2,6 +2,7 @@
 User Model - Pydantic schemas for User
 """
 
+import re
 from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
@@ -18,6 +19,30 @@ except ImportError:
     EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
 
 
+def user_search_keys(nama: str, email: str) -> List[str]:
+    """
+    Lowercase search terms stored in `searchKeys` (indexed)
+    Full name, each name word, full email and email domain, so an anchored
+    prefix regex on any of them can use the index
+    """
+    nama = (nama or "").strip().lower()
+    email = (email or "").strip().lower()
+    keys = {nama, *nama.split(), email}
+    if "@" in email:
+        keys.add(email.split("@", 1)[1])
+    keys.discard("")
+    return sorted(keys)
+
+
+def user_search_filter(search: str) -> dict:
+    """
+    `searchKeys` condition for an admin search term
+    Anchored, case-sensitive prefix on the lowercased term, which MongoDB
+    answers with a range scan on the searchKeys index
+    """
+    return {"searchKeys": {"$regex": f"^{re.escape(search.strip().lower())}"}}
+
+
 class PyObjectId(str):
     """Custom ObjectId type for Pydantic"""
     @classmethod
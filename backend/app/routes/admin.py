@@ -2,64 +2,97 @@
 Admin Routes
 """
 
+import asyncio
 from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, Query
 from bson import ObjectId
 from app.config.database import get_collection
-from app.models.user import UserCreate, UserUpdate, UserResponse
-from app.utils.password import hash_password
+from app.models.user import UserCreate, UserUpdate, UserResponse, user_search_keys, user_search_filter
+from app.utils.password import hash_password_async
+from app.utils.pagination import paginate
 from app.utils.logger import logger
-from app.middleware.auth import get_admin_user
+from app.middleware.auth import get_admin_user, invalidate_user
+from app.services.response_cache import response_cache, invalidate_responses
 
 router = APIRouter()
 
 
+async def _compute_admin_stats():
+    """Admin dashboard statistics (uncached): one aggregation per collection, run concurrently"""
+    users = get_collection("users")
+    deteksi = get_collection("deteksi")
+    perhitungan = get_collection("perhitungan")
+    
+    user_groups, detection_groups, calculation_groups = await asyncio.gather(
+        # Users by role, with active users per role
+        users.aggregate([
+            {"$group": {
+                "_id": "$role",
+                "count": {"$sum": 1},
+                "active": {"$sum": {"$cond": [{"$eq": ["$isActive", True]}, 1, 0]}}
+            }}
+        ]).to_list(length=None),
+        # Detections by status
+        deteksi.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(length=None),
+        # Calculations
+        perhitungan.aggregate([
+            {"$group": {"_id": None, "count": {"$sum": 1}}}
+        ]).to_list(length=1)
+    )
+    
+    # Count users by role
+    users_by_role = {group["_id"]: group["count"] for group in user_groups}
+    total_users = sum(users_by_role.values())
+    admin_count = users_by_role.get("admin", 0)
+    surveyor_count = users_by_role.get("surveyor", 0)
+    user_count = users_by_role.get("user", 0)
+    active_users = sum(group["active"] for group in user_groups)
+    
+    # Count detections
+    detections_by_status = {group["_id"]: group["count"] for group in detection_groups}
+    total_detections = sum(detections_by_status.values())
+    completed_detections = detections_by_status.get("completed", 0)
+    processing_detections = detections_by_status.get("processing", 0)
+    failed_detections = detections_by_status.get("failed", 0)
+    
+    # Count calculations
+    total_calculations = calculation_groups[0]["count"] if calculation_groups else 0
+    
+    return {
+        "status": "success",
+        "data": {
+            "users": {
+                "total": total_users,
+                "admin": admin_count,
+                "surveyor": surveyor_count,
+                "user": user_count,
+                "active": active_users
+            },
+            "detections": {
+                "total": total_detections,
+                "completed": completed_detections,
+                "processing": processing_detections,
+                "failed": failed_detections
+            },
+            "calculations": {
+                "total": total_calculations
+            }
+        }
+    }
+
+
 @router.get("/stats")
 async def get_dashboard_stats(admin: dict = Depends(get_admin_user)):
     """Get admin dashboard statistics"""
     try:
-        users = get_collection("users")
-        deteksi = get_collection("deteksi")
-        perhitungan = get_collection("perhitungan")
-        
-        # Count users by role
-        total_users = await users.count_documents({})
-        admin_count = await users.count_documents({"role": "admin"})
-        surveyor_count = await users.count_documents({"role": "surveyor"})
-        user_count = await users.count_documents({"role": "user"})
-        active_users = await users.count_documents({"isActive": True})
-        
-        # Count detections
-        total_detections = await deteksi.count_documents({})
-        completed_detections = await deteksi.count_documents({"status": "completed"})
-        processing_detections = await deteksi.count_documents({"status": "processing"})
-        failed_detections = await deteksi.count_documents({"status": "failed"})
-        
-        # Count calculations
-        total_calculations = await perhitungan.count_documents({})
-        
-        return {
-            "status": "success",
-            "data": {
-                "users": {
-                    "total": total_users,
-                    "admin": admin_count,
-                    "surveyor": surveyor_count,
-                    "user": user_count,
-                    "active": active_users
-                },
-                "detections": {
-                    "total": total_detections,
-                    "completed": completed_detections,
-                    "processing": processing_detections,
-                    "failed": failed_detections
-                },
-                "calculations": {
-                    "total": total_calculations
-                }
-            }
-        }
+        return await response_cache.get_or_compute(
+            "admin.stats",
+            _compute_admin_stats,
+            tags=("users", "deteksi", "perhitungan")
+        )
         
     except Exception as e:
         logger.error(f"Get dashboard stats error: {str(e)}")
@@ -72,10 +105,12 @@ async def get_all_users(
     limit: int = Query(10, ge=1, le=100),
     role: Optional[str] = None,
     isActive: Optional[str] = None,
-    search: Optional[str] = None,
+    search: Optional[str] = Query(None, description="Prefix of a name word, the email or the email domain (case-insensitive)"),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    includeTotal: Optional[bool] = None,
     admin: dict = Depends(get_admin_user)
 ):
-    """Get all users with pagination and filtering"""
+    """Get all users with pagination (page number or cursor) and filtering"""
     try:
         users = get_collection("users")
         
@@ -88,18 +123,15 @@ async def get_all_users(
         if isActive is not None:
             query["isActive"] = isActive == "true"
         
-        if search:
-            query["$or"] = [
-                {"namaUser": {"$regex": search, "$options": "i"}},
-                {"emailUser": {"$regex": search, "$options": "i"}}
-            ]
-        
-        # Get total count
-        total = await users.count_documents(query)
+        if search and search.strip():
+            # Prefix match on name words, email or email domain (indexed)
+            query.update(user_search_filter(search))
         
         # Get users with pagination
-        cursor = users.find(query, {"passwordUser": 0}).sort("createdAt", -1).skip((page - 1) * limit).limit(limit)
-        user_list = await cursor.to_list(length=limit)
+        result = await paginate(users, query, limit, page=page, cursor=cursor,
+                                projection={"passwordUser": 0, "searchKeys": 0}, include_total=includeTotal)
+        user_list = result["items"]
+        total = result["total"]
         
         # Convert ObjectId to string
         for user in user_list:
@@ -111,14 +143,18 @@ async def get_all_users(
             "data": {
                 "users": user_list,
                 "pagination": {
-                    "currentPage": page,
-                    "totalPages": (total + limit - 1) // limit,
+                    "currentPage": None if cursor else page,
+                    "totalPages": (total + limit - 1) // limit if total is not None else None,
                     "totalUsers": total,
-                    "limit": limit
+                    "limit": limit,
+                    "nextCursor": result["next_cursor"],
+                    "hasMore": result["has_more"]
                 }
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get all users error: {str(e)}")
         raise HTTPException(status_code=500, detail={"status": "error", "message": str(e)})
@@ -130,7 +166,7 @@ async def get_user(user_id: str, admin: dict = Depends(get_admin_user)):
     try:
         users = get_collection("users")
         
-        user = await users.find_one({"_id": ObjectId(user_id)}, {"passwordUser": 0})
+        user = await users.find_one({"_id": ObjectId(user_id)}, {"passwordUser": 0, "searchKeys": 0})
         
         if not user:
             raise HTTPException(
@@ -171,16 +207,18 @@ async def create_user(request: UserCreate, admin: dict = Depends(get_admin_user)
         user_data = {
             "namaUser": request.namaUser,
             "emailUser": request.emailUser.lower(),
-            "passwordUser": hash_password(request.passwordUser),
+            "passwordUser": await hash_password_async(request.passwordUser),
             "role": request.role,
             "isActive": request.isActive,
             "phoneNumber": request.phoneNumber,
             "profileImage": request.profileImage,
+            "searchKeys": user_search_keys(request.namaUser, request.emailUser),
             "createdAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow()
         }
         
         result = await users.insert_one(user_data)
+        invalidate_responses("users")
         
         logger.info(f"Admin created new user: {request.emailUser}")
         
@@ -243,11 +281,18 @@ async def update_user(user_id: str, request: UserUpdate, admin: dict = Depends(g
             update_data["phoneNumber"] = request.phoneNumber
         if request.profileImage is not None:
             update_data["profileImage"] = request.profileImage
+        if "namaUser" in update_data or "emailUser" in update_data:
+            update_data["searchKeys"] = user_search_keys(
+                update_data.get("namaUser", existing.get("namaUser")),
+                update_data.get("emailUser", existing.get("emailUser"))
+            )
         
         await users.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        invalidate_user(user_id)
+        invalidate_responses("users")
         
         logger.info(f"Admin updated user: {user_id}")
         
@@ -285,6 +330,8 @@ async def delete_user(user_id: str, admin: dict = Depends(get_admin_user)):
             )
         
         await users.delete_one({"_id": ObjectId(user_id)})
+        invalidate_user(user_id)
+        invalidate_responses("users")
         
         logger.info(f"Admin deleted user: {user_id}")
         
@@ -319,6 +366,8 @@ async def toggle_user_status(user_id: str, admin: dict = Depends(get_admin_user)
             {"_id": ObjectId(user_id)},
             {"$set": {"isActive": new_status, "updatedAt": datetime.utcnow()}}
         )
+        invalidate_user(user_id)
+        invalidate_responses("users")
         
         logger.info(f"Admin toggled user status: {user_id} -> {new_status}")
         
@@ -351,10 +400,11 @@ async def reset_password(user_id: str, new_password: str, admin: dict = Depends(
         await users.update_one(
             {"_id": ObjectId(user_id)},
             {"$set": {
-                "passwordUser": hash_password(new_password),
+                "passwordUser": await hash_password_async(new_password),
                 "updatedAt": datetime.utcnow()
             }}
         )
+        invalidate_user(user_id)
         
         logger.info(f"Admin reset password for user: {user_id}")
         
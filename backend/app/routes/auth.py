@@ -8,12 +8,13 @@ from bson import ObjectId
 from app.config.database import get_collection
 from app.models.user import (
     UserLoginRequest, UserRegisterRequest, ChangePasswordRequest,
-    UserResponse, TokenResponse
+    UserResponse, TokenResponse, user_search_keys
 )
 from app.utils.jwt import generate_token
-from app.utils.password import hash_password, verify_password
+from app.utils.password import hash_password_async, verify_password_async, needs_rehash
 from app.utils.logger import logger
-from app.middleware.auth import get_current_user
+from app.middleware.auth import get_current_user, invalidate_user
+from app.services.response_cache import invalidate_responses
 
 router = APIRouter()
 
@@ -49,15 +50,17 @@ async def register(request: UserRegisterRequest, req: Request):
         user_data = {
             "namaUser": request.namaUser,
             "emailUser": request.emailUser.lower(),
-            "passwordUser": hash_password(request.passwordUser),
+            "passwordUser": await hash_password_async(request.passwordUser),
             "role": user_role,
             "isActive": True,
+            "searchKeys": user_search_keys(request.namaUser, request.emailUser),
             "createdAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow()
         }
         
         result = await users.insert_one(user_data)
         user_id = str(result.inserted_id)
+        invalidate_responses("users")
         
         # Create history log
         await histori.insert_one({
@@ -122,18 +125,24 @@ async def login(request: UserLoginRequest):
             )
         
         # Verify password
-        if not verify_password(request.passwordUser, user.get("passwordUser", "")):
+        if not await verify_password_async(request.passwordUser, user.get("passwordUser", "")):
             logger.warning(f"Login failed - Wrong password for: {request.emailUser}")
             raise HTTPException(
                 status_code=401,
                 detail={"status": "error", "message": "Email atau password salah"}
             )
         
-        # Update last login
+        # Update last login (and upgrade the hash if the cost factor changed)
+        login_update = {"lastLogin": datetime.utcnow()}
+        if needs_rehash(user.get("passwordUser", "")):
+            login_update["passwordUser"] = await hash_password_async(request.passwordUser)
+            logger.info(f"Password hash upgraded for: {request.emailUser}")
+        
         await users.update_one(
             {"_id": user["_id"]},
-            {"$set": {"lastLogin": datetime.utcnow()}}
+            {"$set": login_update}
         )
+        invalidate_user(user["_id"])
         
         # Generate token
         user_id = str(user["_id"])
@@ -193,7 +202,7 @@ async def change_password(request: ChangePasswordRequest, user: dict = Depends(g
         user_with_password = await users.find_one({"_id": ObjectId(user["_id"])})
         
         # Verify current password
-        if not verify_password(request.currentPassword, user_with_password.get("passwordUser", "")):
+        if not await verify_password_async(request.currentPassword, user_with_password.get("passwordUser", "")):
             raise HTTPException(
                 status_code=400,
                 detail={"status": "error", "message": "Password saat ini salah"}
@@ -203,10 +212,11 @@ async def change_password(request: ChangePasswordRequest, user: dict = Depends(g
         await users.update_one(
             {"_id": ObjectId(user["_id"])},
             {"$set": {
-                "passwordUser": hash_password(request.newPassword),
+                "passwordUser": await hash_password_async(request.newPassword),
                 "updatedAt": datetime.utcnow()
             }}
         )
+        invalidate_user(user["_id"])
         
         logger.info(f"Password changed for user: {user.get('emailUser')}")
         
@@ -254,9 +264,10 @@ async def create_test_user():
         test_user = {
             "namaUser": "Test User",
             "emailUser": "test@test.com",
-            "passwordUser": hash_password("test123"),
+            "passwordUser": await hash_password_async("test123"),
             "role": "surveyor",
             "isActive": True,
+            "searchKeys": user_search_keys("Test User", "test@test.com"),
             "createdAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow()
         }
@@ -2,17 +2,130 @@
 Dashboard Routes - Statistics API
 """
 
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, Query
 from bson import ObjectId
 from app.config.database import get_collection
 from app.middleware.auth import get_current_user
+from app.services.rollups import ROLLUP_COLLECTION
+from app.services.response_cache import response_cache
 from app.utils.logger import logger
 
 router = APIRouter()
 
 
+LOS_ORDER = ['A', 'B', 'C', 'D', 'E', 'F']
+
+# Only the fields the dashboard reads
+PERHITUNGAN_FIELDS = {
+    "LOS": 1, "DJ": 1, "totalKendaraan": 1, "createdAt": 1,
+    "metrics.namaRuas": 1, "metrics.waktuObservasi": 1
+}
+
+
+def _day_range(date: Optional[str]):
+    """Start and end of the given ISO date (or today, UTC)"""
+    day = datetime.fromisoformat(date.replace('Z', '+00:00')) if date else datetime.utcnow()
+    day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day, day + timedelta(days=1)
+
+
+def _rollup_totals_pipeline(today_key: str) -> list:
+    """All-time totals and the day's count from the daily rollups (one document per day and segment)"""
+    return [
+        {"$group": {
+            "_id": None,
+            "totalPerhitungan": {"$sum": "$perhitungan.count"},
+            "todayPerhitungan": {"$sum": {"$cond": [{"$eq": ["$date", today_key]}, "$perhitungan.count", 0]}},
+            "totalDeteksi": {"$sum": "$deteksi.count"},
+            "totalTrafficCounter": {"$sum": {"$add": [
+                {"$ifNull": [f"$deteksi.{vehicle}", 0]} for vehicle in ("mobil", "bus", "truk")
+            ]}},
+            **{f"los{los}": {"$sum": {"$ifNull": [f"$perhitungan.los.{los}", 0]}} for los in LOS_ORDER}
+        }}
+    ]
+
+
+def _highest_los_pipeline(today, today_end) -> list:
+    """The day's highest LOS (most recent on ties), using the createdAt index"""
+    return [
+        {"$match": {"createdAt": {"$gte": today, "$lt": today_end}}},
+        {"$project": {**PERHITUNGAN_FIELDS, "los": {"$toUpper": {"$ifNull": ["$LOS", ""]}}}},
+        {"$addFields": {"losRank": {"$indexOfArray": [LOS_ORDER, "$los"]}}},
+        {"$match": {"losRank": {"$gte": 0}}},
+        {"$sort": {"losRank": -1, "createdAt": -1}},
+        {"$limit": 1}
+    ]
+
+
+async def _compute_dashboard_stats(date: Optional[str]):
+    """Dashboard statistics (uncached)"""
+    perhitungan = get_collection("perhitungan")
+    rollups = get_collection(ROLLUP_COLLECTION)
+    
+    today, today_end = _day_range(date)
+    filtered_query = {"createdAt": {"$gte": today, "$lt": today_end}} if date else {}
+    
+    # Totals come from rollups; only the day's rows and the latest 50 touch raw data
+    totals_result, highest_result, recent = await asyncio.gather(
+        rollups.aggregate(_rollup_totals_pipeline(today.strftime("%Y-%m-%d"))).to_list(length=1),
+        perhitungan.aggregate(_highest_los_pipeline(today, today_end)).to_list(length=1),
+        perhitungan.find(filtered_query, PERHITUNGAN_FIELDS).sort("createdAt", -1).to_list(length=50)
+    )
+    totals = totals_result[0] if totals_result else {}
+    
+    # Calculate LOS distribution
+    los_distribution = {los: totals.get(f"los{los}", 0) for los in LOS_ORDER}
+    
+    # Highest LOS of the day (most recent on ties)
+    highest_los = None
+    highest_los_location = None
+    highest_los_time = None
+    if highest_result:
+        item = highest_result[0]
+        metrics = item.get("metrics", {})
+        highest_los = item["los"]
+        highest_los_location = metrics.get("namaRuas", "Unknown")
+        highest_los_time = metrics.get("waktuObservasi") or item.get("createdAt", datetime.utcnow()).strftime("%H:%M")
+    
+    # Calculate percentages
+    total_los = sum(los_distribution.values())
+    los_percentages = {}
+    for los, count in los_distribution.items():
+        los_percentages[los] = round((count / total_los * 100), 1) if total_los > 0 else 0
+    
+    # Get traffic data for chart
+    traffic_data = []
+    for item in recent:
+        metrics = item.get("metrics", {})
+        traffic_data.append({
+            "date": item.get("createdAt"),
+            "namaRuas": metrics.get("namaRuas", ""),
+            "los": item.get("LOS", ""),  # lowercase for frontend
+            "dj": item.get("DJ", 0),     # lowercase for frontend
+            "totalKendaraan": item.get("totalKendaraan", 0),
+            "waktuObservasi": metrics.get("waktuObservasi", "")
+        })
+    
+    return {
+        "success": True,
+        "data": {
+            "totalTrafficCounter": totals.get("totalTrafficCounter", 0),
+            "losDistribution": los_distribution,
+            "losPercentages": los_percentages,
+            "highestLOS": highest_los or "-",           # direct value
+            "highestLOSLocation": highest_los_location or "-",
+            "highestLOSTime": highest_los_time or "-",
+            "trafficData": traffic_data,
+            "totalPerhitungan": totals.get("totalPerhitungan", 0),
+            "totalDeteksi": totals.get("totalDeteksi", 0),
+            "todayPerhitungan": totals.get("todayPerhitungan", 0)
+        }
+    }
+
+
 @router.get("/")
 async def get_dashboard_stats(
     date: Optional[str] = None,
@@ -20,106 +133,12 @@ async def get_dashboard_stats(
 ):
     """Get dashboard statistics with optional date filter"""
     try:
-        perhitungan = get_collection("perhitungan")
-        deteksi = get_collection("deteksi")
-        
-        # Get all perhitungan
-        perhitungan_list = await perhitungan.find({}).sort("createdAt", -1).to_list(length=1000)
-        
-        # Get all completed deteksi
-        deteksi_list = await deteksi.find({"status": "completed"}).to_list(length=1000)
-        
-        # Filter by date if provided
-        filtered_perhitungan = perhitungan_list
-        if date:
-            target_date = datetime.fromisoformat(date.replace('Z', '+00:00'))
-            target_date = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            next_day = target_date + timedelta(days=1)
-            
-            filtered_perhitungan = [
-                item for item in perhitungan_list
-                if target_date <= item.get("createdAt", datetime.min) < next_day
-            ]
-        
-        # Calculate total traffic counter
-        total_traffic_counter = 0
-        for det in deteksi_list:
-            counting_data = det.get("countingData", {})
-            if counting_data:
-                lane_kiri = counting_data.get("laneKiri", {})
-                lane_kanan = counting_data.get("laneKanan", {})
-                total_traffic_counter += (
-                    lane_kiri.get("mobil", 0) + lane_kiri.get("bus", 0) + lane_kiri.get("truk", 0) +
-                    lane_kanan.get("mobil", 0) + lane_kanan.get("bus", 0) + lane_kanan.get("truk", 0)
-                )
-        
-        # Calculate LOS distribution
-        los_distribution = {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'E': 0, 'F': 0}
-        highest_los = None
-        highest_los_location = None
-        highest_los_time = None
-        
-        # Get today's data for highest LOS
-        today = datetime.fromisoformat(date.replace('Z', '+00:00')) if date else datetime.utcnow()
-        today = today.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today + timedelta(days=1)
-        
-        today_perhitungan = [
-            item for item in filtered_perhitungan
-            if today <= item.get("createdAt", datetime.min) < today_end
-        ]
-        
-        # Count LOS distribution from all data
-        for item in perhitungan_list:
-            los = item.get("LOS", "").upper()
-            if los in los_distribution:
-                los_distribution[los] += 1
-        
-        # Find highest LOS from today
-        los_order = ['A', 'B', 'C', 'D', 'E', 'F']
-        for item in today_perhitungan:
-            los = item.get("LOS", "").upper()
-            if los:
-                if not highest_los or los_order.index(los) > los_order.index(highest_los):
-                    highest_los = los
-                    metrics = item.get("metrics", {})
-                    highest_los_location = metrics.get("namaRuas", "Unknown")
-                    highest_los_time = metrics.get("waktuObservasi") or item.get("createdAt", datetime.utcnow()).strftime("%H:%M")
-        
-        # Calculate percentages
-        total_los = sum(los_distribution.values())
-        los_percentages = {}
-        for los, count in los_distribution.items():
-            los_percentages[los] = round((count / total_los * 100), 1) if total_los > 0 else 0
-        
-        # Get traffic data for chart
-        traffic_data = []
-        for item in filtered_perhitungan[:50]:  # Limit to 50 items
-            metrics = item.get("metrics", {})
-            traffic_data.append({
-                "date": item.get("createdAt"),
-                "namaRuas": metrics.get("namaRuas", ""),
-                "los": item.get("LOS", ""),  # lowercase for frontend
-                "dj": item.get("DJ", 0),     # lowercase for frontend
-                "totalKendaraan": item.get("totalKendaraan", 0),
-                "waktuObservasi": metrics.get("waktuObservasi", "")
-            })
-        
-        return {
-            "success": True,
-            "data": {
-                "totalTrafficCounter": total_traffic_counter,
-                "losDistribution": los_distribution,
-                "losPercentages": los_percentages,
-                "highestLOS": highest_los or "-",           # direct value
-                "highestLOSLocation": highest_los_location or "-",
-                "highestLOSTime": highest_los_time or "-",
-                "trafficData": traffic_data,
-                "totalPerhitungan": len(perhitungan_list),
-                "totalDeteksi": len(deteksi_list),
-                "todayPerhitungan": len(today_perhitungan)
-            }
-        }
+        return await response_cache.get_or_compute(
+            "dashboard.stats",
+            lambda: _compute_dashboard_stats(date),
+            params={"date": date},
+            tags=("perhitungan", "deteksi")
+        )
         
     except Exception as e:
         logger.error(f"Get dashboard stats error: {str(e)}")
@@ -129,46 +148,58 @@ async def get_dashboard_stats(
         )
 
 
+async def _compute_chart_data(days: int):
+    """Chart data per day (uncached)"""
+    rollups = get_collection(ROLLUP_COLLECTION)
+    
+    # Calculate start date
+    start_date = datetime.utcnow() - timedelta(days=days)
+    
+    # Get data: one rollup per day and road segment
+    data = await rollups.find(
+        {"date": {"$gte": start_date.strftime("%Y-%m-%d")}, "perhitungan.count": {"$gt": 0}},
+        {"date": 1, "perhitungan": 1}
+    ).sort("date", 1).to_list(length=None)
+    
+    # Merge segments per date
+    chart_data = {}
+    for item in data:
+        date_key = item["date"]
+        if date_key not in chart_data:
+            chart_data[date_key] = {
+                "date": date_key,
+                "count": 0,
+                "totalKendaraan": 0,
+                "los": {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'E': 0, 'F': 0}
+            }
+        
+        counts = item["perhitungan"]
+        chart_data[date_key]["count"] += counts.get("count", 0)
+        chart_data[date_key]["totalKendaraan"] += counts.get("totalKendaraan", 0)
+        
+        for los, count in (counts.get("los") or {}).items():
+            if los in chart_data[date_key]["los"]:
+                chart_data[date_key]["los"][los] += count
+    
+    return {
+        "success": True,
+        "data": list(chart_data.values())
+    }
+
+
 @router.get("/chart-data")
 async def get_chart_data(
     days: int = Query(7, ge=1, le=30),
     user: dict = Depends(get_current_user)
 ):
-    """Get chart data for the last N days"""
+    """Get chart data for the last N days (from daily rollups)"""
     try:
-        perhitungan = get_collection("perhitungan")
-        
-        # Calculate start date
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Get data
-        data = await perhitungan.find(
-            {"createdAt": {"$gte": start_date}}
-        ).sort("createdAt", 1).to_list(length=1000)
-        
-        # Group by date
-        chart_data = {}
-        for item in data:
-            date_key = item.get("createdAt", datetime.utcnow()).strftime("%Y-%m-%d")
-            if date_key not in chart_data:
-                chart_data[date_key] = {
-                    "date": date_key,
-                    "count": 0,
-                    "totalKendaraan": 0,
-                    "los": {'A': 0, 'B': 0, 'C': 0, 'D': 0, 'E': 0, 'F': 0}
-                }
-            
-            chart_data[date_key]["count"] += 1
-            chart_data[date_key]["totalKendaraan"] += item.get("totalKendaraan", 0)
-            
-            los = item.get("LOS", "").upper()
-            if los in chart_data[date_key]["los"]:
-                chart_data[date_key]["los"][los] += 1
-        
-        return {
-            "success": True,
-            "data": list(chart_data.values())
-        }
+        return await response_cache.get_or_compute(
+            "dashboard.chart",
+            lambda: _compute_chart_data(days),
+            params={"days": days},
+            tags=("perhitungan",)
+        )
         
     except Exception as e:
         logger.error(f"Get chart data error: {str(e)}")
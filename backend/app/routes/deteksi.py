@@ -7,13 +7,15 @@ import uuid
 import tempfile
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Query
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Query, Request
 from fastapi.responses import JSONResponse
 from bson import ObjectId
 
 from app.config.database import get_collection
 from app.middleware.auth import get_current_user
+from app.middleware.upload import stream_multipart_to_disk, safe_filename, UPLOAD_DIR, VIDEO_UPLOAD_OPENAPI
 from app.services.video_detection import video_detection_service
+from app.services.rollups import apply_rollup
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -118,60 +120,57 @@ async def get_model_info(user: dict = Depends(get_current_user)):
         )
 
 
-@router.post("/upload")
+def _validate_video(filename: str, content_type: str):
+    """Reject non-video uploads before any of the body is written"""
+    if not filename:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "message": "Nama file tidak valid"}
+        )
+    
+    # Check by extension or content type
+    file_ext = filename.split('.')[-1].lower()
+    allowed_extensions = ['mp4', 'avi', 'mov', 'mkv', 'webm', 'flv']
+    if not (content_type and content_type.startswith('video/')) and file_ext not in allowed_extensions:
+        logger.warning(f"❌ Invalid file type: {content_type}, extension: {file_ext}")
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "message": f"File harus berupa video. Format yang didukung: {', '.join(allowed_extensions)}"}
+        )
+
+
+@router.post("/upload", openapi_extra=VIDEO_UPLOAD_OPENAPI)
 async def upload_video(
-    file: UploadFile = File(...),
+    request: Request,
     user: dict = Depends(get_current_user)
 ):
-    """Upload video for detection processing"""
+    """Upload video (multipart field `file`) for detection processing"""
     try:
-        logger.info(f"📤 Upload request - File: {file.filename}, Content-Type: {file.content_type}, User: {user.get('email', 'unknown')}")
-        
-        # Validate file extension and content type
-        if file.filename:
-            file_ext = file.filename.split('.')[-1].lower()
-            allowed_extensions = ['mp4', 'avi', 'mov', 'mkv', 'webm', 'flv']
-            
-            # Check by extension or content type
-            if not (file.content_type and file.content_type.startswith('video/')) and file_ext not in allowed_extensions:
-                logger.warning(f"❌ Invalid file type: {file.content_type}, extension: {file_ext}")
-                raise HTTPException(
-                    status_code=400,
-                    detail={"success": False, "message": f"File harus berupa video. Format yang didukung: {', '.join(allowed_extensions)}"}
-                )
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail={"success": False, "message": "Nama file tidak valid"}
-            )
-        
-        # Check file size (50MB limit for free tier)
-        content = await file.read()
-        file_size = len(content)
-        
-        if file_size > 50 * 1024 * 1024:  # 50MB
-            raise HTTPException(
-                status_code=400,
-                detail={"success": False, "message": "File terlalu besar (maksimal 50MB)"}
-            )
-        
         # Generate tracking ID
         tracking_id = str(uuid.uuid4())
         
-        # Save file temporarily
-        temp_path = f"/tmp/uploads/{tracking_id}_{file.filename}"
-        os.makedirs("/tmp/uploads", exist_ok=True)
-        
-        with open(temp_path, "wb") as f:
-            f.write(content)
+        # Stream the file part straight to disk (size limit and hash computed on the fly)
+        saved = await stream_multipart_to_disk(
+            request,
+            destination=lambda filename: os.path.join(UPLOAD_DIR, f"{tracking_id}_{safe_filename(filename)}"),
+            accept=_validate_video
+        )
+        temp_path = saved["path"]
+        logger.info(f"📤 Upload request - File: {saved['filename']}, Content-Type: {saved['content_type']}, User: {user.get('email', 'unknown')}")
         
         # Start background detection
-        await video_detection_service.start_detection(
-            tracking_id=tracking_id,
-            video_file_path=temp_path,
-            user_id=user["_id"],
-            filename=file.filename
-        )
+        try:
+            await video_detection_service.start_detection(
+                tracking_id=tracking_id,
+                video_file_path=temp_path,
+                user_id=user["_id"],
+                filename=saved["filename"],
+                file_info={"size": saved["size"], "sha256": saved["sha256"]}
+            )
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         
         logger.info(f"✅ Video upload successful: {tracking_id}")
         
@@ -180,7 +179,9 @@ async def upload_video(
             "message": "Video berhasil diunggah dan sedang diproses",
             "data": {
                 "tracking_id": tracking_id,
-                "filename": file.filename,
+                "filename": saved["filename"],
+                "size": saved["size"],
+                "sha256": saved["sha256"],
                 "status": "processing"
             }
         }
@@ -338,14 +339,16 @@ async def delete_detection(
     """Delete detection record"""
     try:
         deteksi = get_collection("deteksi")
-        result = await deteksi.delete_one({"_id": tracking_id, "userId": user["_id"]})
+        deleted = await deteksi.find_one_and_delete({"_id": tracking_id, "userId": user["_id"]})
         
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(
                 status_code=404,
                 detail={"success": False, "message": "Data deteksi tidak ditemukan"}
             )
         
+        await apply_rollup(deleted, "deteksi", sign=-1)
+        
         return {
             "success": True,
             "message": "Data deteksi berhasil dihapus"
@@ -4,16 +4,28 @@ Simple polling-based progress tracking for Render + Vercel
 """
 
 import os
+import json
 import uuid
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Query, Request, Header, Body
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from bson import ObjectId
 
 from app.config.database import get_collection
-from app.middleware.auth import get_current_user
+from app.middleware.auth import get_current_user, get_stream_user
+from app.core.socket import socket_manager
+from app.middleware.upload import stream_multipart_to_disk, safe_filename, UPLOAD_DIR, VIDEO_UPLOAD_OPENAPI
 from app.services.video_detection_rest import video_detection_rest_service
+from app.services.storage import delete_media
+from app.services.rollups import apply_rollup
+from app.services.upload_sessions import (
+    upload_session_manager, session_status, UploadSessionError, ProgressiveSource
+)
+from app.utils.pagination import paginate
+from app.utils.jwt import generate_stream_token
+from app.config.constants import PROGRESS_CONFIG
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -102,62 +114,61 @@ async def get_model_info(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail={"success": False, "message": str(e)})
 
 
-@router.post("/upload")
+def _validate_video(filename: str, content_type: str):
+    """Reject non-video uploads before any of the body is written"""
+    if not filename:
+        raise HTTPException(status_code=400, detail={"success": False, "message": "Nama file tidak valid"})
+    
+    file_ext = filename.split('.')[-1].lower()
+    allowed = ['mp4', 'avi', 'mov', 'mkv', 'webm', 'flv']
+    if not (content_type and content_type.startswith('video/')) and file_ext not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail={"success": False, "message": f"Format yang didukung: {', '.join(allowed)}"}
+        )
+
+
+@router.post("/upload", openapi_extra=VIDEO_UPLOAD_OPENAPI)
 async def upload_video(
-    file: UploadFile = File(...),
+    request: Request,
     user: dict = Depends(get_current_user)
 ):
-    """Upload video for detection - returns tracking_id for polling"""
+    """Upload video (multipart field `file`) for detection - returns tracking_id for polling"""
     try:
-        logger.info(f"📤 Upload: {file.filename}, User: {user.get('email')}")
-        
-        # Validate file
-        if file.filename:
-            file_ext = file.filename.split('.')[-1].lower()
-            allowed = ['mp4', 'avi', 'mov', 'mkv', 'webm', 'flv']
-            
-            if not (file.content_type and file.content_type.startswith('video/')) and file_ext not in allowed:
-                raise HTTPException(
-                    status_code=400,
-                    detail={"success": False, "message": f"Format yang didukung: {', '.join(allowed)}"}
-                )
-        else:
-            raise HTTPException(status_code=400, detail={"success": False, "message": "Nama file tidak valid"})
-        
-        # Check file size (50MB limit)
-        content = await file.read()
-        file_size = len(content)
-        
-        if file_size > 50 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail={"success": False, "message": "File terlalu besar (maksimal 50MB)"}
-            )
-        
-        # Generate tracking ID and save file
+        # Stream the file part straight to disk (size limit checked up front and per chunk)
         tracking_id = str(uuid.uuid4())
-        temp_path = f"/tmp/uploads/{tracking_id}_{file.filename}"
-        os.makedirs("/tmp/uploads", exist_ok=True)
-        
-        with open(temp_path, "wb") as f:
-            f.write(content)
+        saved = await stream_multipart_to_disk(
+            request,
+            destination=lambda filename: os.path.join(UPLOAD_DIR, f"{tracking_id}_{safe_filename(filename)}"),
+            accept=_validate_video
+        )
+        temp_path = saved["path"]
+        logger.info(f"📤 Upload: {saved['filename']}, User: {user.get('email')}")
         
         # Start background detection
-        await video_detection_rest_service.start_detection(
-            tracking_id=tracking_id,
-            video_file_path=temp_path,
-            user_id=user["_id"],
-            filename=file.filename
-        )
+        try:
+            await video_detection_rest_service.start_detection(
+                tracking_id=tracking_id,
+                video_file_path=temp_path,
+                user_id=user["_id"],
+                filename=saved["filename"],
+                file_info={"size": saved["size"], "sha256": saved["sha256"]}
+            )
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         
-        logger.info(f"✅ Upload successful: {tracking_id}")
+        logger.info(f"✅ Upload successful: {tracking_id} ({saved['size']} bytes)")
         
         return {
             "success": True,
             "message": "Video berhasil diunggah dan sedang diproses",
             "data": {
                 "tracking_id": tracking_id,
-                "filename": file.filename,
+                "filename": saved["filename"],
+                "size": saved["size"],
+                "sha256": saved["sha256"],
                 "status": "processing",
                 "poll_url": f"/api/deteksi/status/{tracking_id}"
             }
@@ -170,56 +181,228 @@ async def upload_video(
         raise HTTPException(status_code=500, detail={"success": False, "message": str(e)})
 
 
+def _session_error(e: UploadSessionError) -> HTTPException:
+    detail = {"success": False, "message": e.message}
+    headers = None
+    if e.offset is not None:
+        detail["offset"] = e.offset
+        headers = {"Upload-Offset": str(e.offset)}
+    return HTTPException(status_code=e.status_code, detail=detail, headers=headers)
+
+
+@router.post("/uploads")
+async def create_upload_session(
+    payload: dict = Body(...),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Create a resumable upload session
+    Body: {"filename": "...", "size": <total bytes>, "progressive": false}
+    With progressive=true, detection of MKV/WebM, MPEG-TS and fragmented MP4
+    starts while the upload is still arriving
+    """
+    try:
+        session = upload_session_manager.create(
+            user_id=user["_id"],
+            filename=payload.get("filename", ""),
+            total_size=int(payload.get("size") or 0),
+            options={"progressive": bool(payload.get("progressive", False))}
+        )
+        return {
+            "success": True,
+            "message": "Sesi unggah dibuat",
+            "data": {
+                **session_status(session),
+                "upload_url": f"/api/deteksi/uploads/{session['id']}"
+            }
+        }
+    except UploadSessionError as e:
+        raise _session_error(e)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail={"success": False, "message": "Ukuran file tidak valid"})
+
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Append a chunk (raw request body) at Upload-Offset
+    A mismatched offset returns 409 with the committed offset to resume from
+    """
+    try:
+        session = await upload_session_manager.write_chunk(
+            upload_id, user["_id"], upload_offset, request.stream()
+        )
+        
+        if upload_session_manager.should_start_progressive(session):
+            await video_detection_rest_service.start_detection(
+                tracking_id=upload_id,
+                video_file_path=session["path"],
+                user_id=user["_id"],
+                filename=session["filename"],
+                progressive_source=ProgressiveSource(upload_session_manager, upload_id)
+            )
+            logger.info(f"⏩ Progressive detection started: {upload_id} at {session['offset']} bytes")
+        
+        return JSONResponse(
+            content={"success": True, "data": session_status(session)},
+            headers={"Upload-Offset": str(session["offset"])}
+        )
+    except UploadSessionError as e:
+        raise _session_error(e)
+
+
+@router.head("/uploads/{upload_id}")
+async def get_upload_offset_head(upload_id: str, user: dict = Depends(get_current_user)):
+    """Committed offset in headers (cheap resume check)"""
+    try:
+        session = upload_session_manager.get(upload_id, user["_id"])
+    except UploadSessionError as e:
+        raise _session_error(e)
+    return Response(headers={
+        "Upload-Offset": str(session["offset"]),
+        "Upload-Length": str(session["totalSize"]),
+        "Cache-Control": "no-store"
+    })
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_session(upload_id: str, user: dict = Depends(get_current_user)):
+    """Committed offset and session state"""
+    try:
+        session = upload_session_manager.get(upload_id, user["_id"])
+    except UploadSessionError as e:
+        raise _session_error(e)
+    return {"success": True, "data": session_status(session)}
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload_session(
+    upload_id: str,
+    payload: Optional[dict] = Body(None),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Finalize an upload and start detection
+    Optional body: {"sha256": "<hex>"} to verify the received file
+    """
+    try:
+        saved = await upload_session_manager.finalize(
+            upload_id, user["_id"], expected_sha256=(payload or {}).get("sha256")
+        )
+        session = upload_session_manager.get(upload_id, user["_id"])
+        tracking_id = upload_id
+        
+        if not saved["duplicate"] and not session.get("detectionStarted"):
+            upload_session_manager.mark_detection_started(session)
+            await video_detection_rest_service.start_detection(
+                tracking_id=tracking_id,
+                video_file_path=saved["path"],
+                user_id=user["_id"],
+                filename=session["filename"],
+                file_info={"size": saved["size"], "sha256": saved["sha256"]}
+            )
+            logger.info(f"✅ Resumable upload finalized: {tracking_id} ({saved['size']} bytes)")
+        
+        return {
+            "success": True,
+            "message": "Video berhasil diunggah dan sedang diproses",
+            "data": {
+                "tracking_id": tracking_id,
+                "filename": session["filename"],
+                "size": saved["size"],
+                "sha256": saved["sha256"],
+                "status": "processing",
+                "poll_url": f"/api/deteksi/status/{tracking_id}"
+            }
+        }
+    except UploadSessionError as e:
+        raise _session_error(e)
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str, user: dict = Depends(get_current_user)):
+    """Abort an upload and delete the partial file"""
+    try:
+        session = upload_session_manager.get(upload_id, user["_id"])
+    except UploadSessionError as e:
+        raise _session_error(e)
+    if session["status"] == "completed":
+        raise HTTPException(status_code=409, detail={"success": False, "message": "Sesi unggah sudah diselesaikan"})
+    upload_session_manager.discard(upload_id)
+    return {"success": True, "message": "Sesi unggah dibatalkan"}
+
+
+async def _check_job_access(tracking_id: str, user: dict) -> Optional[dict]:
+    """
+    Only the job's owner (or an admin) may read its progress and results
+    Returns the stored status when the job is no longer in memory.
+    """
+    stored = None
+    owner = video_detection_rest_service.job_owner(tracking_id)
+    if owner is None:
+        stored = await video_detection_rest_service.get_stored_status(tracking_id)
+        if not stored:
+            raise HTTPException(
+                status_code=404,
+                detail={"success": False, "message": "Tracking ID tidak ditemukan"}
+            )
+        owner = stored["owner"]
+    if owner != str(user["_id"]) and user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail={"success": False, "message": "Tidak memiliki izin untuk mengakses deteksi ini"}
+        )
+    return stored
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
 @router.get("/status/{tracking_id}")
 async def get_detection_status(
     tracking_id: str,
+    request: Request,
     user: dict = Depends(get_current_user)
 ):
     """
     Get detection status - POLLING ENDPOINT
-    Client should poll this every 2 seconds during processing
+    Client should poll this every 2 seconds during processing (or use /events).
+    Send the last ETag in If-None-Match to get 304 when nothing changed.
     """
     try:
+        stored = await _check_job_access(tracking_id, user)
+        
         # First check in-memory processing status
         status = video_detection_rest_service.get_processing_status(tracking_id)
         
         if status:
-            return {
-                "success": True,
-                "data": {
-                    "tracking_id": tracking_id,
-                    **status
-                }
-            }
+            etag = video_detection_rest_service.status_etag(tracking_id, status)
+            data = {"tracking_id": tracking_id, **status}
+        else:
+            # If not in memory, check database (cached) for completed results
+            stored = stored or await video_detection_rest_service.get_stored_status(tracking_id)
+            if not stored:
+                raise HTTPException(
+                    status_code=404,
+                    detail={"success": False, "message": "Tracking ID tidak ditemukan"}
+                )
+            etag, data = stored["etag"], stored["data"]
         
-        # If not in memory, check database for completed results
-        deteksi = get_collection("deteksi")
-        result = await deteksi.find_one({"_id": tracking_id})
-        
-        if result:
-            return {
-                "success": True,
-                "data": {
-                    "tracking_id": tracking_id,
-                    "status": result.get("status", "completed"),
-                    "progress": 100,
-                    "message": "Deteksi selesai",
-                    "result": {
-                        "filename": result.get("filename"),
-                        "video_info": result.get("videoInfo"),
-                        "vehicle_counts": result.get("detectionResults", {}).get("vehicleCounts"),
-                        "total_detections": result.get("detectionResults", {}).get("totalDetections"),
-                        "processed_video_url": result.get("processedVideoUrl"),
-                        "counting_data": result.get("countingData"),
-                        "created_at": result.get("createdAt")
-                    }
-                }
-            }
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
         
-        raise HTTPException(
-            status_code=404,
-            detail={"success": False, "message": "Tracking ID tidak ditemukan"}
-        )
+        return JSONResponse(content=jsonable_encoder({"success": True, "data": data}), headers=headers)
         
     except HTTPException:
         raise
@@ -228,20 +411,83 @@ async def get_detection_status(
         raise HTTPException(status_code=500, detail={"success": False, "message": str(e)})
 
 
+@router.post("/events/{tracking_id}/token")
+async def create_stream_token(tracking_id: str, user: dict = Depends(get_current_user)):
+    """
+    Job-scoped token for EventSource clients (?token= on /events)
+    Expires after PROGRESS_CONFIG['STREAM_TOKEN_TTL']; request a new one to reconnect later.
+    """
+    await _check_job_access(tracking_id, user)
+    return {
+        "success": True,
+        "data": {
+            "token": generate_stream_token(user["_id"], tracking_id),
+            "expiresIn": PROGRESS_CONFIG['STREAM_TOKEN_TTL']
+        }
+    }
+
+
+@router.get("/events/{tracking_id}")
+async def stream_detection_events(
+    tracking_id: str,
+    request: Request,
+    user: dict = Depends(get_stream_user)
+):
+    """
+    Progress stream (Server-Sent Events) - replaces status polling
+    Authenticated once at connect with the Bearer header, or ?token= from
+    POST /events/{tracking_id}/token for EventSource clients.
+    Sends the current state first, then coalesced updates until the job ends.
+    """
+    stored = await _check_job_access(tracking_id, user)
+    initial = video_detection_rest_service.get_processing_status(tracking_id)
+    
+    if initial is None:
+        stored = stored or await video_detection_rest_service.get_stored_status(tracking_id)
+        if not stored:
+            raise HTTPException(
+                status_code=404,
+                detail={"success": False, "message": "Tracking ID tidak ditemukan"}
+            )
+        # Finished before this server's status store knew it: one final event
+        initial = {"status": "error" if stored["data"].get("status") == "error" else "completed",
+                   "progress": 100, "message": "Deteksi selesai"}
+    
+    async def event_stream():
+        yield "retry: 3000\n\n"
+        async for message in socket_manager.subscribe(tracking_id, initial=initial):
+            if await request.is_disconnected():
+                break
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            version, data = message
+            payload = json.dumps({"tracking_id": tracking_id, **data}, default=str)
+            yield f"id: {version}\nevent: progress\ndata: {payload}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/list")
 async def get_detection_list(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    includeTotal: Optional[bool] = None,
     user: dict = Depends(get_current_user)
 ):
-    """Get user's detection history"""
+    """Get user's detection history (page number or cursor)"""
     try:
         deteksi = get_collection("deteksi")
         query = {"userId": user["_id"]}
         
-        total = await deteksi.count_documents(query)
-        cursor = deteksi.find(query).sort("createdAt", -1).skip((page - 1) * limit).limit(limit)
-        detection_list = await cursor.to_list(length=limit)
+        result = await paginate(deteksi, query, limit, page=page, cursor=cursor, include_total=includeTotal)
+        detection_list = result["items"]
+        total = result["total"]
         
         for detection in detection_list:
             detection["id"] = str(detection["_id"])
@@ -252,13 +498,17 @@ async def get_detection_list(
             "success": True,
             "data": detection_list,
             "pagination": {
-                "currentPage": page,
-                "totalPages": (total + limit - 1) // limit,
+                "currentPage": None if cursor else page,
+                "totalPages": (total + limit - 1) // limit if total is not None else None,
                 "totalItems": total,
-                "itemsPerPage": limit
+                "itemsPerPage": limit,
+                "nextCursor": result["next_cursor"],
+                "hasMore": result["has_more"]
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"List error: {str(e)}")
         raise HTTPException(status_code=500, detail={"success": False, "message": str(e)})
@@ -318,7 +568,26 @@ async def delete_detection(
                 detail={"success": False, "message": "Tidak memiliki izin untuk menghapus deteksi ini"}
             )
         
-        await deteksi.delete_one({"_id": detection_id})
+        # Atomic delete: of concurrent deletes only one gets the document and
+        # decrements the rollups
+        delete_filter = {"_id": detection_id}
+        if user.get("role") != "admin":
+            delete_filter["userId"] = detection.get("userId")
+        deleted = await deteksi.find_one_and_delete(delete_filter)
+        
+        if not deleted:
+            raise HTTPException(
+                status_code=404,
+                detail={"success": False, "message": "Deteksi tidak ditemukan"}
+            )
+        
+        video_detection_rest_service.result_cache.pop(detection_id)
+        await apply_rollup(deleted, "deteksi", sign=-1)
+        
+        # Remove stored media (local file or Cloudinary resource)
+        stored = deleted.get("storage") or {}
+        for media in (stored.get("video"), stored.get("thumbnail")):
+            await delete_media(media)
         
         return {
             "success": True,
@@ -8,6 +8,8 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from bson import ObjectId
 from app.config.database import get_collection
 from app.middleware.auth import get_current_user
+from app.services.response_cache import response_cache, invalidate_responses
+from app.utils.pagination import paginate
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -18,9 +20,11 @@ async def get_history(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     actionType: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    includeTotal: Optional[bool] = None,
     user: dict = Depends(get_current_user)
 ):
-    """Get user's activity history"""
+    """Get user's activity history (page number or cursor)"""
     try:
         histori = get_collection("histori")
         
@@ -30,12 +34,11 @@ async def get_history(
         if actionType:
             query["actionType"] = actionType
         
-        # Get total count
-        total = await histori.count_documents(query)
-        
-        # Get history with pagination
-        cursor = histori.find(query).sort("tanggal", -1).skip((page - 1) * limit).limit(limit)
-        history_list = await cursor.to_list(length=limit)
+        # Get history with pagination (newest first)
+        result = await paginate(histori, query, limit, page=page, cursor=cursor,
+                                sort_field="tanggal", include_total=includeTotal)
+        history_list = result["items"]
+        total = result["total"]
         
         # Convert ObjectIds
         for hist in history_list:
@@ -51,13 +54,17 @@ async def get_history(
             "success": True,
             "data": history_list,
             "pagination": {
-                "currentPage": page,
-                "totalPages": (total + limit - 1) // limit,
+                "currentPage": None if cursor else page,
+                "totalPages": (total + limit - 1) // limit if total is not None else None,
                 "totalItems": total,
-                "limit": limit
+                "limit": limit,
+                "nextCursor": result["next_cursor"],
+                "hasMore": result["has_more"]
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get history error: {str(e)}")
         raise HTTPException(
@@ -72,10 +79,57 @@ async def get_history_list(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     actionType: Optional[str] = None,
+    cursor: Optional[str] = None,
+    includeTotal: Optional[bool] = None,
     user: dict = Depends(get_current_user)
 ):
     """Get user's activity history (alias for /)"""
-    return await get_history(page, limit, actionType, user)
+    return await get_history(page, limit, actionType, cursor, includeTotal, user)
+
+
+async def _compute_activity_summary(user_id: str, days: int):
+    """A user's activity summary (uncached)"""
+    histori = get_collection("histori")
+    
+    # Calculate start date
+    from datetime import timedelta
+    start_date = datetime.utcnow() - timedelta(days=days)
+    
+    # Aggregate activities by type
+    pipeline = [
+        {
+            "$match": {
+                "idUser": ObjectId(user_id),
+                "tanggal": {"$gte": start_date}
+            }
+        },
+        {
+            "$group": {
+                "_id": "$actionType",
+                "count": {"$sum": 1},
+                "lastActivity": {"$max": "$tanggal"}
+            }
+        }
+    ]
+    
+    cursor = histori.aggregate(pipeline)
+    activities = await cursor.to_list(length=100)
+    
+    # Format result
+    summary = {}
+    for activity in activities:
+        summary[activity["_id"]] = {
+            "count": activity["count"],
+            "lastActivity": activity["lastActivity"]
+        }
+    
+    return {
+        "success": True,
+        "data": {
+            "days": days,
+            "summary": summary
+        }
+    }
 
 
 @router.get("/summary")
@@ -85,47 +139,13 @@ async def get_activity_summary(
 ):
     """Get user's activity summary"""
     try:
-        histori = get_collection("histori")
-        
-        # Calculate start date
-        from datetime import timedelta
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Aggregate activities by type
-        pipeline = [
-            {
-                "$match": {
-                    "idUser": ObjectId(user["_id"]),
-                    "tanggal": {"$gte": start_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$actionType",
-                    "count": {"$sum": 1},
-                    "lastActivity": {"$max": "$tanggal"}
-                }
-            }
-        ]
-        
-        cursor = histori.aggregate(pipeline)
-        activities = await cursor.to_list(length=100)
-        
-        # Format result
-        summary = {}
-        for activity in activities:
-            summary[activity["_id"]] = {
-                "count": activity["count"],
-                "lastActivity": activity["lastActivity"]
-            }
-        
-        return {
-            "success": True,
-            "data": {
-                "days": days,
-                "summary": summary
-            }
-        }
+        return await response_cache.get_or_compute(
+            "histori.summary",
+            lambda: _compute_activity_summary(user["_id"], days),
+            scope=user["_id"],
+            params={"days": days},
+            tags=(f"histori:{user['_id']}",)
+        )
         
     except Exception as e:
         logger.error(f"Get activity summary error: {str(e)}")
@@ -168,6 +188,7 @@ async def create_history_log(
             log_data["userAgent"] = user_agent
         
         await histori.insert_one(log_data)
+        invalidate_responses(f"histori:{user_id}")
         
     except Exception as e:
         logger.error(f"Create history log error: {str(e)}")
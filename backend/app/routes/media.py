@@ -0,0 +1,157 @@
+"""
+Media Routes - Serve locally stored processed videos and thumbnails
+Supports Range requests (video seeking), ETag and conditional GET
+"""
+
+import os
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+import aiofiles
+
+from app.config.database import get_collection
+from app.middleware.auth import get_current_user_or_query_token
+from app.services.storage import local_storage
+from app.config.constants import STORAGE_CONFIG
+
+router = APIRouter()
+
+# Detection field that records each kind of stored media
+MEDIA_OWNER_FIELDS = {"videos": "storage.video", "thumbnails": "storage.thumbnail"}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def _parse_range(header: str, size: int):
+    """
+    Parse a single-range `bytes=` header into (start, end) inclusive
+    Returns None when the header should be ignored (malformed or multi-range)
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, separator, end_text = header[6:].strip().partition("-")
+    if not separator or not (start_text + end_text).isdigit():
+        return None
+
+    if not start_text:
+        # Suffix range: last N bytes
+        suffix = int(end_text)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - suffix), size - 1
+
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+async def _check_media_access(kind: str, name: str, user: dict):
+    """Only the detection's owner (or an admin) may fetch its media"""
+    field = MEDIA_OWNER_FIELDS[kind]
+    detection = await get_collection("deteksi").find_one(
+        {f"{field}.key": name, f"{field}.backend": local_storage.name},
+        {"userId": 1}
+    )
+    if not detection:
+        raise HTTPException(status_code=404, detail={"success": False, "message": "Media tidak ditemukan"})
+    if str(detection.get("userId")) != str(user["_id"]) and user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail={"success": False, "message": "Tidak memiliki izin untuk mengakses media ini"}
+        )
+
+
+async def _file_iterator(path: str, start: int, length: int):
+    chunk_size = STORAGE_CONFIG['STREAM_CHUNK_SIZE']
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = await f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.api_route("/{kind}/{name}", methods=["GET", "HEAD"])
+async def get_media(
+    kind: str,
+    name: str,
+    request: Request,
+    user: dict = Depends(get_current_user_or_query_token)
+):
+    """Serve a stored video or thumbnail (owner or admin only)"""
+    try:
+        path = local_storage.path_for(kind, name)
+    except ValueError:
+        raise HTTPException(status_code=404, detail={"success": False, "message": "Media tidak ditemukan"})
+
+    await _check_media_access(kind, name, user)
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail={"success": False, "message": "Media tidak ditemukan"})
+
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=3600",
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    start, end, status_code = 0, size - 1, 200
+
+    # If-Range: only honour Range when the client's copy is still current
+    if_range = request.headers.get("if-range")
+    range_header = request.headers.get("range") if not if_range or if_range == etag else None
+
+    try:
+        byte_range = _parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(
+        _file_iterator(path, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
@@ -2,17 +2,24 @@
 Perhitungan Routes - Traffic Calculation API (PKJI 2023)
 """
 
+import io
+import csv
+import json
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional, List
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from bson import ObjectId
+from pydantic import ValidationError
 from app.config.database import get_collection
 from app.config.constants import (
     KAPASITAS_DASAR, FAKTOR_LEBAR, FAKTOR_PEMISAH, 
-    FAKTOR_HAMBATAN, FAKTOR_KOTA, EMP, LOS_THRESHOLDS
+    FAKTOR_HAMBATAN, FAKTOR_KOTA, EMP, LOS_THRESHOLDS, BULK_CONFIG
 )
 from app.models.perhitungan import ManualCalculationRequest
 from app.middleware.auth import get_current_user, get_surveyor_or_admin
+from app.services.rollups import apply_rollup
+from app.utils.pagination import paginate
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -108,6 +115,59 @@ def tentukan_los(dj: float) -> str:
     return 'F'
 
 
+# LOS upper DJ bounds in order; anything above the last one is F
+LOS_LABELS = np.array(['A', 'B', 'C', 'D', 'E', 'F'])
+LOS_BOUNDS = np.array([LOS_THRESHOLDS[los]['max'] for los in LOS_LABELS[:-1]])
+
+
+def hitung_batch(rows: List[ManualCalculationRequest]) -> dict:
+    """
+    Capacity, SMP volume, DJ and LOS for many observations at once
+    
+    Same formulas (and rounding) as hitung_kapasitas, hitung_volume_smp,
+    hitung_derajat_jenuh and tentukan_los, evaluated as NumPy arrays.
+    """
+    # Per-row factor lookups
+    C0 = np.array([KAPASITAS_DASAR.get(row.tipeJalan, 1650) for row in rows])
+    n = np.array([1 if '2/2' in row.tipeJalan else row.jumlahLajur for row in rows])
+    FCsp = np.array([FAKTOR_PEMISAH.get(row.faktorPemisah, 1.00) for row in rows])
+    FCsf = np.array([FAKTOR_HAMBATAN.get(row.hambatanSamping, 1.00) for row in rows])
+    FCcs = np.array([FAKTOR_KOTA.get(row.ukuranKota, 0.94) for row in rows])
+    
+    # Width factor: closest tabulated width (first one on ties, like min())
+    lebar_keys = np.array(list(FAKTOR_LEBAR.keys()))
+    lebar = np.array([row.lebarLajur for row in rows], dtype=float)
+    FCw = np.array(list(FAKTOR_LEBAR.values()))[np.abs(lebar[:, None] - lebar_keys).argmin(axis=1)]
+    
+    kapasitas = np.rint(n * C0 * FCw * FCsp * FCsf * FCcs)
+    
+    # Volume in SMP/hour
+    counts = {vehicle: np.array([getattr(row, vehicle) for row in rows]) for vehicle in ('mobil', 'bus', 'truk', 'motor')}
+    smp = {vehicle: count * EMP[vehicle] for vehicle, count in counts.items()}
+    total_smp = smp['mobil'] + smp['bus'] + smp['truk'] + smp['motor']
+    durasi = np.array([row.durasiMenit for row in rows])
+    faktor_jam = 60 / durasi
+    volume = np.rint(total_smp * faktor_jam)
+    
+    # DJ (capped at 2) and LOS
+    dj = np.minimum(np.divide(volume, kapasitas, out=np.zeros_like(volume), where=kapasitas > 0), 2)
+    los = LOS_LABELS[np.searchsorted(LOS_BOUNDS, dj, side='left')]
+    
+    # Plain Python values for BSON/JSON
+    return {
+        'n': n.tolist(), 'C0': C0.tolist(), 'FCw': FCw.tolist(), 'FCsp': FCsp.tolist(),
+        'FCsf': FCsf.tolist(), 'FCcs': FCcs.tolist(),
+        'kapasitas': kapasitas.astype(int).tolist(),
+        'counts': {vehicle: count.tolist() for vehicle, count in counts.items()},
+        'smp': {vehicle: value.tolist() for vehicle, value in smp.items()},
+        'totalSMPRaw': total_smp.tolist(),
+        'faktorJam': faktor_jam.tolist(),
+        'volumeSMP': volume.astype(int).tolist(),
+        'DJ': [round(value, 4) for value in dj.tolist()],
+        'LOS': los.tolist()
+    }
+
+
 def get_los_description(los: str) -> str:
     """Get LOS description"""
     descriptions = {
@@ -180,6 +240,7 @@ async def hitung_manual(request: ManualCalculationRequest, user: dict = Depends(
         }
         
         result = await perhitungan.insert_one(perhitungan_data)
+        await apply_rollup(perhitungan_data, "perhitungan")
         
         logger.info(f"Manual calculation saved: {result.inserted_id}")
         
@@ -289,6 +350,7 @@ async def hitung_from_deteksi(
         }
         
         result = await perhitungan.insert_one(perhitungan_data)
+        await apply_rollup(perhitungan_data, "perhitungan")
         
         logger.info(f"Calculation from detection saved: {result.inserted_id}")
         
@@ -319,41 +381,241 @@ async def hitung_from_deteksi(
         )
 
 
+def _parse_csv(raw: bytes) -> list:
+    """CSV with a header row named after ManualCalculationRequest fields"""
+    reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+    rows = []
+    for record in reader:
+        # Blank cells fall back to the field defaults
+        rows.append({
+            key.strip(): value.strip()
+            for key, value in record.items()
+            if key and isinstance(value, str) and value.strip()
+        })
+    return rows
+
+
+async def _read_bulk_rows(request: Request) -> list:
+    """Observations from a JSON array, a text/csv body or an uploaded file"""
+    content_type = request.headers.get("content-type", "")
+    
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise ValueError("File tidak ditemukan (field 'file')")
+        raw = await upload.read()
+        if (upload.filename or "").lower().endswith(".json"):
+            data = json.loads(raw)
+        else:
+            return _parse_csv(raw)
+    elif content_type.startswith("text/csv"):
+        return _parse_csv(await request.body())
+    else:
+        data = json.loads(await request.body())
+    
+    # Accept a bare array or {"items": [...]}
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise ValueError("Data harus berupa array observasi")
+    return data
+
+
+def _validate_bulk_rows(rows: list) -> tuple:
+    """Validated requests plus per-row errors (1-based row numbers)"""
+    valid, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            item = ManualCalculationRequest.model_validate(row)
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(part) for part in first.get("loc", ())) or "row"
+            errors.append({"row": number, "message": f"{field}: {first.get('msg')}"})
+            continue
+        if item.durasiMenit <= 0:
+            errors.append({"row": number, "message": "durasiMenit harus lebih dari 0"})
+        elif min(item.mobil, item.bus, item.truk, item.motor) < 0:
+            errors.append({"row": number, "message": "Jumlah kendaraan tidak boleh negatif"})
+        else:
+            valid.append(item)
+    return valid, errors
+
+
+@router.post("/bulk")
+async def hitung_bulk(request: Request, user: dict = Depends(get_surveyor_or_admin)):
+    """
+    Calculate and store many observations in one request
+    
+    Body: JSON array (or {"items": [...]}) of manual calculation inputs, a
+    text/csv body, or a multipart upload in field `file`. CSV headers use the
+    same names as the JSON fields. The batch is all-or-nothing.
+    """
+    try:
+        try:
+            rows = await _read_bulk_rows(request)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            # json.JSONDecodeError is a ValueError
+            raise HTTPException(
+                status_code=400,
+                detail={"success": False, "message": f"Data tidak dapat dibaca: {e}"}
+            )
+        
+        if not rows:
+            raise HTTPException(
+                status_code=400,
+                detail={"success": False, "message": "Tidak ada observasi untuk dihitung"}
+            )
+        if len(rows) > BULK_CONFIG['MAX_ROWS']:
+            raise HTTPException(
+                status_code=413,
+                detail={"success": False, "message": f"Maksimal {BULK_CONFIG['MAX_ROWS']} observasi per permintaan"}
+            )
+        
+        items, errors = _validate_bulk_rows(rows)
+        if errors:
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "success": False,
+                    "message": f"{len(errors)} observasi tidak valid",
+                    "errors": errors[:BULK_CONFIG['MAX_ERRORS']]
+                }
+            )
+        
+        hasil = hitung_batch(items)
+        
+        user_id = ObjectId(user["_id"])
+        now = datetime.utcnow()
+        documents = []
+        for i, item in enumerate(items):
+            mobil, bus, truk, motor = (hasil['counts'][vehicle][i] for vehicle in ('mobil', 'bus', 'truk', 'motor'))
+            documents.append({
+                "userId": user_id,
+                "jumlahMobil": mobil,
+                "jumlahMotor": motor,
+                "totalKendaraan": mobil + bus + truk + motor,
+                "DJ": hasil['DJ'][i],
+                "LOS": hasil['LOS'][i],
+                "waktuProses": now,
+                "metrics": {
+                    "namaRuas": item.namaRuas,
+                    "tipeJalan": item.tipeJalan,
+                    "kapasitas": hasil['kapasitas'][i],
+                    "flowRate": hasil['volumeSMP'][i],
+                    "durasiMenit": item.durasiMenit,
+                    "waktuObservasi": item.waktuObservasi,
+                    "bus": bus,
+                    "truk": truk,
+                    "kapasitasDetail": {
+                        factor: hasil[factor][i] for factor in ('n', 'C0', 'FCw', 'FCsp', 'FCsf', 'FCcs')
+                    },
+                    "volumeDetail": {
+                        **{
+                            vehicle: {'count': hasil['counts'][vehicle][i], 'smp': hasil['smp'][vehicle][i]}
+                            for vehicle in ('mobil', 'bus', 'truk', 'motor')
+                        },
+                        'totalKendaraan': mobil + bus + truk + motor,
+                        'totalSMPRaw': hasil['totalSMPRaw'][i],
+                        'durasiMenit': item.durasiMenit,
+                        'faktorJam': hasil['faktorJam'][i]
+                    }
+                },
+                "createdAt": now,
+                "updatedAt": now
+            })
+        
+        perhitungan = get_collection("perhitungan")
+        result = await perhitungan.insert_many(documents)
+        await apply_rollup(documents, "perhitungan")
+        
+        logger.info(f"Bulk calculation saved: {len(result.inserted_ids)} observation(s)")
+        
+        los_summary = {los: 0 for los in LOS_LABELS.tolist()}
+        for los in hasil['LOS']:
+            los_summary[los] += 1
+        
+        return {
+            "success": True,
+            "message": f"{len(documents)} perhitungan berhasil disimpan",
+            "data": {
+                "count": len(documents),
+                "losSummary": los_summary,
+                "results": [
+                    {
+                        "id": str(inserted_id),
+                        "namaRuas": item.namaRuas,
+                        "waktuObservasi": item.waktuObservasi,
+                        "kapasitas": hasil['kapasitas'][i],
+                        "volumeSMP": hasil['volumeSMP'][i],
+                        "DJ": hasil['DJ'][i],
+                        "LOS": hasil['LOS'][i]
+                    }
+                    for i, (item, inserted_id) in enumerate(zip(items, result.inserted_ids))
+                ]
+            }
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk calculation error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"success": False, "message": str(e)}
+        )
+
+
 @router.get("/available-detections")
-async def get_deteksi_available(user: dict = Depends(get_current_user)):
-    """Get available detection results for calculation"""
+async def get_deteksi_available(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    includeTotal: Optional[bool] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Get available detection results for calculation (page number or cursor)"""
     try:
         deteksi = get_collection("deteksi")
         
-        # Get completed detections
-        cursor = deteksi.find({
+        # Completed detections, served by the (status, createdAt, _id) index
+        query = {
             "status": "completed",
             "countingData": {"$exists": True}
-        }).sort("createdAt", -1)
+        }
+        projection = {"filename": 1, "status": 1, "createdAt": 1, "countingData": 1, "totalKendaraan": 1}
+        
+        result = await paginate(deteksi, query, limit, page=page, cursor=cursor,
+                                projection=projection, include_total=includeTotal)
+        data_list = result["items"]
+        total = result["total"]
         
         results = []
-        async for item in cursor:
+        for item in data_list:
             results.append({
                 "id": str(item["_id"]),
                 "filename": item.get("filename", "Unknown"),
                 "status": item.get("status", "completed"),
                 "createdAt": item.get("createdAt"),
                 "countingData": item.get("countingData", {}),
-                "totalKendaraan": (
-                    item.get("countingData", {}).get("laneKiri", {}).get("mobil", 0) +
-                    item.get("countingData", {}).get("laneKiri", {}).get("bus", 0) +
-                    item.get("countingData", {}).get("laneKiri", {}).get("truk", 0) +
-                    item.get("countingData", {}).get("laneKanan", {}).get("mobil", 0) +
-                    item.get("countingData", {}).get("laneKanan", {}).get("bus", 0) +
-                    item.get("countingData", {}).get("laneKanan", {}).get("truk", 0)
-                )
+                "totalKendaraan": item.get("totalKendaraan", 0)
             })
         
         return {
             "success": True,
-            "data": results
+            "data": results,
+            "pagination": {
+                "currentPage": None if cursor else page,
+                "totalPages": (total + limit - 1) // limit if total is not None else None,
+                "totalItems": total,
+                "limit": limit,
+                "nextCursor": result["next_cursor"],
+                "hasMore": result["has_more"]
+            }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get deteksi available error: {str(e)}")
         raise HTTPException(
@@ -393,21 +655,21 @@ async def get_referensi(user: dict = Depends(get_current_user)):
 async def list_perhitungan(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    includeTotal: Optional[bool] = None,
     user: dict = Depends(get_current_user)
 ):
-    """List calculations with pagination"""
+    """List calculations with pagination (page number or cursor)"""
     try:
         perhitungan = get_collection("perhitungan")
         
         # Build query - all users can see all data
         query = {}
         
-        # Get total count
-        total = await perhitungan.count_documents(query)
-        
-        # Get data
-        cursor = perhitungan.find(query).sort("createdAt", -1).skip((page - 1) * limit).limit(limit)
-        data_list = await cursor.to_list(length=limit)
+        # Get data (total is the collection's estimated count: the query is unfiltered)
+        result = await paginate(perhitungan, query, limit, page=page, cursor=cursor, include_total=includeTotal)
+        data_list = result["items"]
+        total = result["total"]
         
         # Convert ObjectIds
         for item in data_list:
@@ -423,13 +685,17 @@ async def list_perhitungan(
             "success": True,
             "data": data_list,
             "pagination": {
-                "currentPage": page,
-                "totalPages": (total + limit - 1) // limit,
+                "currentPage": None if cursor else page,
+                "totalPages": (total + limit - 1) // limit if total is not None else None,
                 "totalItems": total,
-                "limit": limit
+                "limit": limit,
+                "nextCursor": result["next_cursor"],
+                "hasMore": result["has_more"]
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"List perhitungan error: {str(e)}")
         raise HTTPException(
@@ -486,14 +752,15 @@ async def delete_perhitungan(perhitungan_id: str, user: dict = Depends(get_surve
     try:
         perhitungan = get_collection("perhitungan")
         
-        result = await perhitungan.delete_one({"_id": ObjectId(perhitungan_id)})
+        deleted = await perhitungan.find_one_and_delete({"_id": ObjectId(perhitungan_id)})
         
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(
                 status_code=404,
                 detail={"success": False, "message": "Perhitungan not found"}
             )
         
+        await apply_rollup(deleted, "perhitungan", sign=-1)
         logger.info(f"Perhitungan deleted: {perhitungan_id}")
         
         return {
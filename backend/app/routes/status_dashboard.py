@@ -3,13 +3,20 @@ from fastapi.responses import HTMLResponse
 from datetime import datetime
 import os
 from app.config.database import get_collection
+from app.services.response_cache import response_cache
 from app.utils.logger import logger
 
 router = APIRouter()
 
 
 async def check_system_status():
-    """Check comprehensive system status"""
+    """Check comprehensive system status (cached briefly; the page is refreshed often)"""
+    return await response_cache.get_or_compute(
+        "system.status", _compute_system_status, tags=("users", "deteksi")
+    )
+
+
+async def _compute_system_status():
     status = {
         "database": {"status": "❌", "details": "Not connected"},
         "collections": {"status": "❌", "details": "Not checked"},
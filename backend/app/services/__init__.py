@@ -2,6 +2,15 @@
 Services Package
 """
 
-from app.services.yolo_detector import YOLODetector, get_detector
+__all__ = ["YOLODetector", "get_detector", "VehicleCounter"]
 
-__all__ = ["YOLODetector", "get_detector"]
+
+def __getattr__(name):
+    # Lazy so model-free modules (e.g. vehicle_counter) don't pull in torch/ultralytics
+    if name in ("YOLODetector", "get_detector"):
+        from app.services import yolo_detector
+        return getattr(yolo_detector, name)
+    if name == "VehicleCounter":
+        from app.services.vehicle_counter import VehicleCounter
+        return VehicleCounter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
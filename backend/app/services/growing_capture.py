@@ -0,0 +1,196 @@
+"""
+Growing Video Capture - Decode a video file that is still being uploaded
+Only streamable containers (MKV/WebM, MPEG-TS, fragmented MP4) can be read
+before the last byte arrives
+"""
+
+import os
+import time
+import struct
+from collections import deque
+
+import cv2
+
+from app.utils.logger import logger
+from app.config.constants import PROGRESSIVE_CONFIG
+
+STREAMABLE_EXTENSIONS = ('mkv', 'webm', 'ts', 'mts', 'm2ts')
+MP4_EXTENSIONS = ('mp4', 'm4v', 'mov')
+
+
+def is_fragmented_mp4(path: str, max_boxes: int = 64) -> bool:
+    """True if the moov box comes before any mdat and declares fragments (mvex)"""
+    try:
+        with open(path, 'rb') as f:
+            for _ in range(max_boxes):
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                size, box_type = struct.unpack('>I4s', header)
+                header_size = 8
+                if size == 1:
+                    size = struct.unpack('>Q', f.read(8))[0]
+                    header_size = 16
+                if box_type == b'mdat' or size < header_size:
+                    return False
+                if box_type == b'moov':
+                    return b'mvex' in f.read(min(size - header_size, 4 * 1024 * 1024))
+                f.seek(size - header_size, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return False
+    return False
+
+
+def is_streamable(path: str) -> bool:
+    """Whether a partially written file of this container can be decoded"""
+    ext = path.rsplit('.', 1)[-1].lower()
+    if ext in STREAMABLE_EXTENSIONS:
+        return True
+    if ext in MP4_EXTENSIONS:
+        return is_fragmented_mp4(path)
+    return False
+
+
+class GrowingVideoCapture:
+    """
+    cv2.VideoCapture-like reader that follows a file while it grows
+
+    On EOF the reader waits until enough new bytes have arrived, then keeps
+    reading from the same capture. Only if the backend stays at EOF although
+    the file grew is the file reopened, seeking by timestamp to the last
+    emitted frame (nearest keyframe, then decode forward) rather than
+    re-decoding from the start. The last few decoded frames are held back
+    while the upload is incomplete because they may come from a truncated
+    packet; a reopen discards and decodes them again.
+
+    `source` provides status() ('uploading', 'completed' or 'aborted'),
+    received_bytes() and total_size. wait_for_data() blocks, so the reader
+    is meant to run in a worker thread.
+    """
+
+    def __init__(self, path: str, source, holdback: int = None):
+        self.path = path
+        self.source = source
+        self.holdback = PROGRESSIVE_CONFIG['HOLDBACK_FRAMES'] if holdback is None else holdback
+        self.frames_emitted = 0
+        self.reopens = 0
+        self._buffer = deque()  # (timestamp ms, frame)
+        self._last_msec = None  # timestamp of the last emitted frame
+        self._skip_through = None  # after a reopen, drop frames up to this timestamp
+        self._checked_bytes = 0  # file size when the reader last hit EOF
+        self._retry_pending = False
+        self._complete = self.source.status() == 'completed'
+        self._cap = cv2.VideoCapture(self.path)
+        self._checked_bytes = self._file_size()
+
+    def _file_size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _reopen(self):
+        """Fresh capture positioned after the last emitted frame"""
+        self.reopens += 1
+        self._cap.release()
+        self._buffer.clear()
+        self._cap = cv2.VideoCapture(self.path)
+        if not self.frames_emitted or not self._cap.isOpened():
+            return
+        if self._last_msec:
+            self._cap.set(cv2.CAP_PROP_POS_MSEC, self._last_msec)
+            self._skip_through = self._last_msec
+        else:
+            # No usable timestamps: frame-index seek (keyframe based in FFmpeg)
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, self.frames_emitted)
+
+    def _read_one(self) -> bool:
+        """Decode one more frame into the buffer; False at (current) EOF"""
+        while True:
+            ret, frame = self._cap.read()
+            if not ret:
+                self._checked_bytes = self._file_size()
+                return False
+            msec = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+            if self._skip_through is not None:
+                if msec <= self._skip_through:
+                    continue
+                self._skip_through = None
+            self._buffer.append((msec, frame))
+            return True
+
+    def _fill(self, min_buffer: int):
+        while len(self._buffer) <= min_buffer and self._read_one():
+            pass
+
+    def isOpened(self) -> bool:
+        return self._cap is not None and self._cap.isOpened()
+
+    def get(self, prop_id):
+        return self._cap.get(prop_id)
+
+    def estimated_total_frames(self) -> int:
+        """Frame count extrapolated from bytes decoded so far"""
+        if self._complete:
+            total = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if total > 0:
+                return max(total, self.frames_emitted)
+        received = max(self._checked_bytes, 1)
+        decoded = max(self.frames_emitted + len(self._buffer), 1)
+        return max(int(decoded * self.source.total_size / received), self.frames_emitted)
+
+    def read(self):
+        """Next frame, or (False, None) when no more data is available right now"""
+        min_buffer = 0 if self._complete else self.holdback
+        if self._retry_pending:
+            # The file grew since the last EOF: continue the open capture,
+            # reopening only if it stays at EOF
+            self._retry_pending = False
+            if not self._read_one():
+                self._reopen()
+        self._fill(min_buffer)
+
+        if len(self._buffer) > min_buffer:
+            self.frames_emitted += 1
+            self._last_msec, frame = self._buffer.popleft()
+            return True, frame
+        return False, None
+
+    @property
+    def finished(self) -> bool:
+        """True once the whole (finalized) file has been read"""
+        return self._complete and not self._buffer and not self._retry_pending
+
+    def wait_for_data(self) -> bool:
+        """
+        Block until more of the file can be decoded (call from a worker thread)
+
+        Returns False when the upload is complete and fully read, or aborted.
+        """
+        if self.finished:
+            return False
+
+        poll_interval = PROGRESSIVE_CONFIG['POLL_INTERVAL']
+        min_growth = PROGRESSIVE_CONFIG['MIN_GROWTH_BYTES']
+        stall_timeout = PROGRESSIVE_CONFIG['STALL_TIMEOUT']
+        waited = 0.0
+
+        while True:
+            status = self.source.status()
+            if status == 'aborted':
+                logger.warning(f"⚠️ Upload aborted while processing: {self.path}")
+                return False
+            if status == 'completed' or self._file_size() - self._checked_bytes >= min_growth:
+                break
+            if waited >= stall_timeout:
+                logger.warning(f"⚠️ Upload stalled for {stall_timeout}s: {self.path}")
+                return False
+            time.sleep(poll_interval)
+            waited += poll_interval
+
+        if status == 'completed':
+            self._complete = True
+        self._retry_pending = True
+        return self.isOpened()
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
@@ -0,0 +1,147 @@
+"""
+Detection Job Scheduler - Memory-aware admission control
+Jobs start only when their estimated peak memory fits the budget; otherwise
+they wait in FIFO order or fall back to count-only mode (no annotated video)
+"""
+
+import asyncio
+import gc
+import os
+import time
+from collections import deque
+
+import psutil
+
+from app.utils.logger import logger
+from app.config.constants import MEMORY_CONFIG
+
+MB = 1024 * 1024
+
+MODE_FULL = "full"
+MODE_COUNT_ONLY = "count_only"
+
+
+def estimate_job_memory(width: int, height: int, imgsz: int = 640, batch_size: int = 1,
+                        model_path: str = None, model_loaded: bool = False,
+                        count_only: bool = False) -> float:
+    """
+    Rough peak memory (MB) of one detection job
+
+    Sum of frame buffers at processing resolution, model activations for one
+    batch at `imgsz`, and the model itself (plus the torch runtime when the
+    model still has to be loaded).
+    """
+    frame_mb = width * height * 3 / MB
+    buffers = MEMORY_CONFIG['FRAME_BUFFERS_COUNT_ONLY'] if count_only else MEMORY_CONFIG['FRAME_BUFFERS_FULL']
+
+    input_mb = imgsz * imgsz * 3 * 4 / MB
+    activations_mb = input_mb * MEMORY_CONFIG['ACTIVATION_FACTOR'] * batch_size
+
+    model_mb = 0.0
+    if not model_loaded:
+        weights_mb = MEMORY_CONFIG['MODEL_DEFAULT_MB']
+        if model_path and os.path.exists(model_path):
+            weights_mb = os.path.getsize(model_path) / MB
+        model_mb = weights_mb * MEMORY_CONFIG['MODEL_MEMORY_FACTOR'] + MEMORY_CONFIG['TORCH_RUNTIME_MB']
+
+    return round(frame_mb * buffers + activations_mb + model_mb, 1)
+
+
+class MemoryScheduler:
+    """FIFO admission queue bounded by a process memory budget"""
+
+    def __init__(self, limit_mb: int = None, safety_margin_mb: int = None, max_wait: float = None):
+        self.limit_mb = limit_mb or MEMORY_CONFIG['MEMORY_LIMIT_MB']
+        self.safety_margin_mb = MEMORY_CONFIG['SAFETY_MARGIN_MB'] if safety_margin_mb is None else safety_margin_mb
+        self.max_wait = MEMORY_CONFIG['ADMISSION_MAX_WAIT'] if max_wait is None else max_wait
+        self.poll_interval = MEMORY_CONFIG['ADMISSION_POLL_INTERVAL']
+        self.reservations = {}  # job_id -> (estimate_mb, rss_mb at admission)
+        self._queue = deque()
+        self._changed = asyncio.Event()
+        self._process = psutil.Process()
+        self._baseline_rss = None
+
+    def rss_mb(self) -> float:
+        return self._process.memory_info().rss / MB
+
+    def reserved_mb(self, rss: float) -> float:
+        """Memory admitted jobs may still grow into (estimate minus growth since admission)"""
+        return sum(max(0.0, estimate - max(0.0, rss - admitted_rss))
+                   for estimate, admitted_rss in self.reservations.values())
+
+    def headroom(self) -> tuple:
+        """(available now, available once every running job has finished) in MB"""
+        rss = self.rss_mb()
+        if not self.reservations:
+            self._baseline_rss = rss
+
+        system_free = psutil.virtual_memory().available / MB - self.safety_margin_mb
+        available = min(self.limit_mb - self.safety_margin_mb - rss - self.reserved_mb(rss), system_free)
+        ceiling = self.limit_mb - self.safety_margin_mb - (self._baseline_rss or rss)
+        return available, ceiling
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        return len(self.reservations)
+
+    def queue_position(self, job_id: str) -> int:
+        try:
+            return self._queue.index(job_id) + 1
+        except ValueError:
+            return 0
+
+    def _choose_mode(self, full_mb: float, count_only_mb: float, waited: float):
+        available, ceiling = self.headroom()
+
+        if full_mb <= available:
+            return MODE_FULL, full_mb
+        # Full mode can never fit or has waited long enough: degrade if that fits now
+        if count_only_mb <= available and (full_mb > ceiling or waited >= self.max_wait):
+            return MODE_COUNT_ONLY, count_only_mb
+        # Nothing else is running, so waiting cannot free more memory
+        if not self.reservations:
+            if full_mb <= ceiling:
+                return MODE_FULL, full_mb
+            logger.warning(f"⚠️ Job estimate {count_only_mb:.0f}MB exceeds memory budget, running count-only anyway")
+            return MODE_COUNT_ONLY, count_only_mb
+        return None, 0.0
+
+    async def admit(self, job_id: str, full_mb: float, count_only_mb: float) -> str:
+        """Wait until the job fits and reserve its memory; returns the processing mode"""
+        self._queue.append(job_id)
+        start = time.monotonic()
+
+        try:
+            while True:
+                if self._queue[0] == job_id:
+                    mode, estimate = self._choose_mode(full_mb, count_only_mb, time.monotonic() - start)
+                    if mode:
+                        self.reservations[job_id] = (estimate, self.rss_mb())
+                        logger.info(f"🧮 Job {job_id} admitted ({mode}, ~{estimate:.0f}MB, "
+                                    f"waited {time.monotonic() - start:.1f}s)")
+                        return mode
+
+                self._changed.clear()
+                try:
+                    # Also re-check periodically: RSS drops without a release event
+                    await asyncio.wait_for(self._changed.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if job_id in self._queue:
+                self._queue.remove(job_id)
+            self._changed.set()
+
+    def release(self, job_id: str):
+        """Free a job's reservation and wake up waiting jobs"""
+        if self.reservations.pop(job_id, None) is not None:
+            gc.collect()
+        self._changed.set()
+
+
+# Global scheduler instance
+job_scheduler = MemoryScheduler()
@@ -0,0 +1,25 @@
+"""
+Response Cache - Shared cache for dashboard and statistics endpoints
+Tags: "perhitungan", "deteksi", "users", "histori:<user_id>"
+"""
+
+from app.utils.cache import ResponseCache
+from app.utils.metrics import RESPONSE_CACHE_REQUESTS, RESPONSE_CACHE_ENTRIES
+from app.config.constants import CACHE_CONFIG, RESPONSE_CACHE_TTL
+
+
+def _record_lookup(endpoint: str, hit: bool):
+    RESPONSE_CACHE_REQUESTS.labels(endpoint=endpoint, result="hit" if hit else "miss").inc()
+
+
+response_cache = ResponseCache(
+    max_size=CACHE_CONFIG['RESPONSES'],
+    ttls=RESPONSE_CACHE_TTL,
+    on_lookup=_record_lookup
+)
+RESPONSE_CACHE_ENTRIES.set_function(lambda: len(response_cache))
+
+
+def invalidate_responses(*tags: str) -> int:
+    """Drop cached responses derived from the changed data"""
+    return response_cache.invalidate(*tags)
@@ -0,0 +1,199 @@
+"""
+Daily Traffic Rollups
+One document per day and road segment (namaRuas), kept current with $inc on
+every perhitungan / completed detection insert and delete so charts and the
+dashboard read a handful of documents instead of regrouping raw data
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.utils.logger import logger
+from app.services.response_cache import invalidate_responses
+
+ROLLUP_COLLECTION = "daily_rollups"
+LOS_LEVELS = ['A', 'B', 'C', 'D', 'E', 'F']
+VEHICLES = ['mobil', 'bus', 'truk', 'motor']
+UNKNOWN_SEGMENT = "-"
+
+
+def date_key(value: Optional[datetime]) -> str:
+    return (value or datetime.utcnow()).strftime("%Y-%m-%d")
+
+
+def rollup_id(day: str, nama_ruas: Optional[str]) -> str:
+    return f"{day}|{nama_ruas or UNKNOWN_SEGMENT}"
+
+
+def perhitungan_increments(doc: dict) -> dict:
+    """Rollup counters contributed by one perhitungan document"""
+    metrics = doc.get("metrics") or {}
+    inc = {
+        "perhitungan.count": 1,
+        "perhitungan.totalKendaraan": doc.get("totalKendaraan", 0) or 0,
+        "perhitungan.mobil": doc.get("jumlahMobil", 0) or 0,
+        "perhitungan.motor": doc.get("jumlahMotor", 0) or 0,
+        "perhitungan.bus": metrics.get("bus", 0) or 0,
+        "perhitungan.truk": metrics.get("truk", 0) or 0,
+    }
+    los = (doc.get("LOS") or "").upper()
+    if los in LOS_LEVELS:
+        inc[f"perhitungan.los.{los}"] = 1
+    return inc
+
+
+def deteksi_increments(doc: dict) -> dict:
+    """Rollup counters contributed by one completed detection"""
+    counting_data = doc.get("countingData") or {}
+    totals = {vehicle: 0 for vehicle in VEHICLES}
+    for lane in ("laneKiri", "laneKanan"):
+        for vehicle in VEHICLES:
+            totals[vehicle] += (counting_data.get(lane) or {}).get(vehicle, 0) or 0
+
+    inc = {"deteksi.count": 1, "deteksi.totalKendaraan": sum(totals.values())}
+    for vehicle, count in totals.items():
+        inc[f"deteksi.{vehicle}"] = count
+    return inc
+
+
+def _rollup_updates(docs: list, source: str, sign: int) -> list:
+    """One upsert per rollup document, summing the counters of every doc that lands in it"""
+    merged = {}
+    for doc in docs:
+        if source == "perhitungan":
+            nama_ruas = (doc.get("metrics") or {}).get("namaRuas")
+            increments = perhitungan_increments(doc)
+        else:
+            nama_ruas = doc.get("namaRuas")
+            increments = deteksi_increments(doc)
+
+        day = date_key(doc.get("createdAt"))
+        key = rollup_id(day, nama_ruas)
+        if key not in merged:
+            merged[key] = (day, nama_ruas or UNKNOWN_SEGMENT, {})
+        totals = merged[key][2]
+        for field, value in increments.items():
+            totals[field] = totals.get(field, 0) + value * sign
+
+    return [
+        UpdateOne(
+            {"_id": key},
+            {
+                "$inc": totals,
+                "$setOnInsert": {"date": day, "namaRuas": nama_ruas},
+                "$currentDate": {"updatedAt": True}
+            },
+            upsert=True
+        )
+        for key, (day, nama_ruas, totals) in merged.items()
+    ]
+
+
+async def apply_rollup(docs, source: str, sign: int = 1):
+    """
+    Add (sign=1) or remove (sign=-1) documents from the rollups
+
+    Failures are logged rather than raised so the write that triggered them
+    still succeeds; scripts/rebuild_rollups.py repairs any drift.
+    """
+    from app.config.database import get_collection
+
+    if isinstance(docs, dict):
+        docs = [docs]
+    if source == "deteksi":
+        docs = [doc for doc in docs if doc.get("status", "completed") == "completed"]
+    if not docs:
+        return
+
+    try:
+        await get_collection(ROLLUP_COLLECTION).bulk_write(
+            _rollup_updates(docs, source, sign), ordered=False
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Rollup update failed ({source}): {e}")
+    finally:
+        # Cached dashboard responses derived from this data are now stale
+        invalidate_responses(source)
+
+
+async def rebuild_rollups(db) -> int:
+    """Regenerate all rollups from raw perhitungan and deteksi documents"""
+    day_expr = {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}}
+    rollups = {}
+
+    def entry(day: str, nama_ruas: Optional[str]) -> dict:
+        key = rollup_id(day, nama_ruas)
+        if key not in rollups:
+            rollups[key] = {
+                "_id": key,
+                "date": day,
+                "namaRuas": nama_ruas or UNKNOWN_SEGMENT,
+                "perhitungan": {"count": 0, "totalKendaraan": 0, **{v: 0 for v in VEHICLES},
+                                "los": {los: 0 for los in LOS_LEVELS}},
+                "deteksi": {"count": 0, "totalKendaraan": 0, **{v: 0 for v in VEHICLES}},
+                "updatedAt": datetime.utcnow(),
+            }
+        return rollups[key]
+
+    perhitungan_groups = db.perhitungan.aggregate([
+        {"$group": {
+            "_id": {"date": day_expr, "namaRuas": "$metrics.namaRuas", "los": {"$toUpper": {"$ifNull": ["$LOS", ""]}}},
+            "count": {"$sum": 1},
+            "totalKendaraan": {"$sum": {"$ifNull": ["$totalKendaraan", 0]}},
+            "mobil": {"$sum": {"$ifNull": ["$jumlahMobil", 0]}},
+            "motor": {"$sum": {"$ifNull": ["$jumlahMotor", 0]}},
+            "bus": {"$sum": {"$ifNull": ["$metrics.bus", 0]}},
+            "truk": {"$sum": {"$ifNull": ["$metrics.truk", 0]}},
+        }}
+    ])
+    async for group in perhitungan_groups:
+        target = entry(group["_id"]["date"], group["_id"].get("namaRuas"))["perhitungan"]
+        for field in ("count", "totalKendaraan", *VEHICLES):
+            target[field] += group[field]
+        if group["_id"]["los"] in LOS_LEVELS:
+            target["los"][group["_id"]["los"]] += group["count"]
+
+    def lane_sum(vehicle: str) -> dict:
+        return {"$sum": {"$add": [
+            {"$ifNull": [f"$countingData.{lane}.{vehicle}", 0]} for lane in ("laneKiri", "laneKanan")
+        ]}}
+
+    deteksi_groups = db.deteksi.aggregate([
+        {"$match": {"status": "completed"}},
+        {"$group": {
+            "_id": {"date": day_expr, "namaRuas": "$namaRuas"},
+            "count": {"$sum": 1},
+            **{vehicle: lane_sum(vehicle) for vehicle in VEHICLES}
+        }}
+    ])
+    async for group in deteksi_groups:
+        target = entry(group["_id"]["date"], group["_id"].get("namaRuas"))["deteksi"]
+        target["count"] += group["count"]
+        for vehicle in VEHICLES:
+            target[vehicle] += group[vehicle]
+        target["totalKendaraan"] += sum(group[vehicle] for vehicle in VEHICLES)
+
+    # Build aside and swap in so readers never see a half-built collection
+    staging = db[f"{ROLLUP_COLLECTION}_rebuild"]
+    await staging.drop()
+    if rollups:
+        await staging.insert_many(list(rollups.values()))
+        await staging.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        await db[ROLLUP_COLLECTION].delete_many({})
+    await db[ROLLUP_COLLECTION].create_index("date")
+
+    logger.info(f"✅ Rebuilt {len(rollups)} daily rollup(s)")
+    return len(rollups)
+
+
+async def ensure_rollups(db):
+    """Build rollups once for databases that predate them"""
+    if await db[ROLLUP_COLLECTION].estimated_document_count() > 0:
+        return
+    if await db.perhitungan.estimated_document_count() == 0 and await db.deteksi.estimated_document_count() == 0:
+        return
+    logger.info("📊 Daily rollups missing, building from raw data")
+    await rebuild_rollups(db)
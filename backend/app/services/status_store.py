@@ -0,0 +1,111 @@
+"""
+Job Status Store
+In-memory status per tracking ID; finished jobs expire after a TTL and the
+table is capped so memory stays flat on long-running servers
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.utils.logger import logger
+from app.core.socket import is_terminal
+from app.config.constants import STATUS_STORE_CONFIG
+
+
+class StatusStore:
+    """
+    Dict-like status table
+
+    Active jobs are never evicted. Terminal jobs (see `is_terminal`) are kept
+    for `ttl` seconds after they finish and, when the table is over
+    `max_entries`, dropped oldest-finished first. Saved results remain
+    available from MongoDB after eviction.
+    """
+
+    def __init__(self, ttl: float = None, max_entries: int = None):
+        self.ttl = STATUS_STORE_CONFIG['TERMINAL_TTL'] if ttl is None else ttl
+        self.max_entries = STATUS_STORE_CONFIG['MAX_ENTRIES'] if max_entries is None else max_entries
+        self.evicted = 0
+        self._entries: Dict[str, dict] = {}
+        self._finished = OrderedDict()  # tracking_id -> finished_at, oldest first
+        self._owners: Dict[str, str] = {}  # tracking_id -> user_id, dropped with the entry
+
+    def get(self, tracking_id: str, default=None) -> Optional[dict]:
+        return self._entries.get(tracking_id, default)
+
+    def __getitem__(self, tracking_id: str) -> dict:
+        return self._entries[tracking_id]
+
+    def __setitem__(self, tracking_id: str, status: dict):
+        self._entries[tracking_id] = status
+        self.touch(tracking_id)
+
+    def __delitem__(self, tracking_id: str):
+        del self._entries[tracking_id]
+        self._finished.pop(tracking_id, None)
+        self._owners.pop(tracking_id, None)
+
+    def __contains__(self, tracking_id: str) -> bool:
+        return tracking_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def values(self):
+        return list(self._entries.values())
+
+    def set_owner(self, tracking_id: str, user_id: str):
+        """Record who started a job (kept out of the status sent to clients)"""
+        if tracking_id in self._entries:
+            self._owners[tracking_id] = str(user_id)
+
+    def owner(self, tracking_id: str) -> Optional[str]:
+        return self._owners.get(tracking_id)
+
+    def touch(self, tracking_id: str):
+        """Re-check a status after it was changed in place"""
+        status = self._entries.get(tracking_id)
+        if status is None:
+            return
+        if is_terminal(status):
+            if tracking_id not in self._finished:
+                self._finished[tracking_id] = time.monotonic()
+        else:
+            self._finished.pop(tracking_id, None)
+        self.evict()
+
+    def active_count(self) -> int:
+        """Jobs that have not reached a terminal state"""
+        self.evict()
+        return len(self._entries) - len(self._finished)
+
+    def evict(self) -> int:
+        """Drop expired terminal entries, then oldest terminal ones while over the size limit"""
+        cutoff = time.monotonic() - self.ttl
+        removed = 0
+        while self._finished:
+            tracking_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > cutoff and len(self._entries) <= self.max_entries:
+                break
+            self._finished.popitem(last=False)
+            self._entries.pop(tracking_id, None)
+            self._owners.pop(tracking_id, None)
+            removed += 1
+
+        if removed:
+            self.evicted += removed
+            logger.debug(f"🗑️ Evicted {removed} finished job status(es)")
+        if len(self._entries) > self.max_entries:
+            logger.warning(f"⚠️ Status store over limit with active jobs only ({len(self._entries)})")
+        return removed
+
+    def stats(self) -> dict:
+        active = self.active_count()
+        return {
+            "active": active,
+            "finished": len(self._entries) - active,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,175 @@
+"""
+Media Storage - Processed videos and thumbnails
+Local disk (served by /api/media with Range support) or Cloudinary, with
+local disk as the fallback when Cloudinary is not configured or fails
+"""
+
+import os
+import re
+import time
+import shutil
+import asyncio
+
+import cv2
+
+from app.utils.logger import logger
+from app.config.constants import STORAGE_CONFIG
+from app.config.cloudinary import upload_file, delete_resource
+
+MEDIA_KINDS = {"videos": (".mp4",), "thumbnails": (".jpg",)}
+MEDIA_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,127}\.(mp4|jpg)$")
+
+
+def cloudinary_configured() -> bool:
+    return all(os.getenv(name) for name in ("CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"))
+
+
+def create_thumbnail(video_path: str, thumbnail_path: str, width: int = None) -> bool:
+    """Write a JPEG of the middle frame of a video"""
+    width = width or STORAGE_CONFIG['THUMBNAIL_WIDTH']
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames > 1:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames // 2)
+        ret, frame = cap.read()
+        if not ret:
+            return False
+        height = int(frame.shape[0] * width / frame.shape[1])
+        thumbnail = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        return cv2.imwrite(thumbnail_path, thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    finally:
+        cap.release()
+
+
+class LocalStorage:
+    """Media files under MEDIA_ROOT/<kind>/<name>, pruned by age and total size"""
+
+    name = "local"
+
+    def __init__(self, root: str = None):
+        self.root = os.path.realpath(root or STORAGE_CONFIG['MEDIA_ROOT'])
+
+    def path_for(self, kind: str, name: str) -> str:
+        """Resolve a media name, rejecting anything that could escape the media root"""
+        if kind not in MEDIA_KINDS or not MEDIA_NAME_PATTERN.match(name or ""):
+            raise ValueError("Nama media tidak valid")
+        if not name.endswith(MEDIA_KINDS[kind]):
+            raise ValueError("Nama media tidak valid")
+
+        path = os.path.realpath(os.path.join(self.root, kind, name))
+        if os.path.dirname(path) != os.path.join(self.root, kind):
+            raise ValueError("Nama media tidak valid")
+        return path
+
+    def url_for(self, kind: str, name: str) -> str:
+        return f"/api/media/{kind}/{name}"
+
+    async def save(self, source_path: str, kind: str, name: str, progress_callback=None) -> dict:
+        """Move a file into the media root"""
+        destination = self.path_for(kind, name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        await asyncio.to_thread(shutil.move, source_path, destination)
+        size = os.path.getsize(destination)
+        if progress_callback:
+            progress_callback(size, size)
+
+        self.enforce_retention()
+        return {"backend": self.name, "kind": kind, "key": name, "url": self.url_for(kind, name), "size": size}
+
+    async def delete(self, kind: str, key: str) -> bool:
+        try:
+            os.remove(self.path_for(kind, key))
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def enforce_retention(self, max_age_days: float = None, max_total_mb: float = None) -> int:
+        """Delete files older than the retention period, then oldest first until under the size cap"""
+        max_age = (max_age_days or STORAGE_CONFIG['RETENTION_DAYS']) * 86400
+        max_total = (max_total_mb or STORAGE_CONFIG['MAX_TOTAL_MB']) * 1024 * 1024
+        now = time.time()
+
+        files = []
+        for kind in MEDIA_KINDS:
+            directory = os.path.join(self.root, kind)
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime <= max_age and total <= max_total:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+
+        if removed:
+            logger.info(f"🗑️ Media retention removed {removed} file(s)")
+        return removed
+
+
+class CloudinaryStorage:
+    """Media on Cloudinary (chunked, retried uploads)"""
+
+    name = "cloudinary"
+
+    async def save(self, source_path: str, kind: str, name: str, progress_callback=None) -> dict:
+        folder = f"{os.getenv('CLOUDINARY_FOLDER', 'yolo-deteksi')}/{kind}"
+        public_id = os.path.splitext(name)[0]
+        resource_type = "video" if kind == "videos" else "image"
+        result = await upload_file(source_path, folder=folder, public_id=public_id,
+                                   resource_type=resource_type, progress_callback=progress_callback)
+        size = os.path.getsize(source_path)
+        os.remove(source_path)
+        return {"backend": self.name, "kind": kind, "key": result["public_id"], "url": result["url"], "size": size}
+
+    async def delete(self, kind: str, key: str) -> bool:
+        return await delete_resource(key, resource_type="video" if kind == "videos" else "image")
+
+
+local_storage = LocalStorage()
+cloudinary_storage = CloudinaryStorage()
+
+
+def get_storage():
+    """Primary backend from STORAGE_BACKEND: local, cloudinary or auto"""
+    backend = STORAGE_CONFIG['BACKEND']
+    if backend == "local":
+        return local_storage
+    if backend == "cloudinary" or cloudinary_configured():
+        return cloudinary_storage
+    return local_storage
+
+
+def get_backend(name: str):
+    return cloudinary_storage if name == CloudinaryStorage.name else local_storage
+
+
+async def store_media(source_path: str, kind: str, name: str, progress_callback=None) -> dict:
+    """Store with the primary backend, keeping the file locally if that fails"""
+    storage = get_storage()
+    try:
+        return await storage.save(source_path, kind, name, progress_callback)
+    except Exception as e:
+        if storage is local_storage or not os.path.exists(source_path):
+            raise
+        logger.warning(f"⚠️ {storage.name} storage failed ({e}), keeping {name} on local disk")
+        return await local_storage.save(source_path, kind, name, progress_callback)
+
+
+async def delete_media(stored: dict) -> bool:
+    """Delete a file described by a store_media() result"""
+    if not stored or not stored.get("key"):
+        return False
+    return await get_backend(stored.get("backend")).delete(stored.get("kind"), stored["key"])
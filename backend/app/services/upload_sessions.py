@@ -0,0 +1,319 @@
+"""
+Resumable Upload Sessions
+Chunks are written at their offset straight into the destination file; a JSON
+sidecar per session keeps the committed offset so uploads survive reconnects
+and server restarts
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import AsyncIterator
+
+import aiofiles
+
+from app.utils.logger import logger
+from app.config.constants import (
+    MAX_VIDEO_SIZE, UPLOAD_CHUNK_SIZE, UPLOAD_SESSION_TTL, UPLOAD_SESSION_CLEANUP_INTERVAL, PROGRESSIVE_CONFIG
+)
+from app.middleware.upload import UPLOAD_DIR, safe_filename, format_size_limit
+from app.services.growing_capture import is_streamable
+
+SESSION_DIR = os.path.join(UPLOAD_DIR, "sessions")
+
+ALLOWED_EXTENSIONS = ['mp4', 'avi', 'mov', 'mkv', 'webm', 'flv', 'ts']
+
+
+class UploadSessionError(Exception):
+    """Upload protocol error with the HTTP status to report"""
+
+    def __init__(self, message: str, status_code: int = 400, offset: int = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadSessionManager:
+    """Create, append to, inspect and finalize resumable uploads"""
+
+    def __init__(self, session_dir: str = SESSION_DIR, ttl: int = UPLOAD_SESSION_TTL):
+        self.session_dir = session_dir
+        self.ttl = ttl
+        self._sessions = {}
+        self._hashers = {}  # upload_id -> sha256 over bytes [0, hashOffset)
+        self._locks = {}
+
+    def _sidecar_path(self, upload_id: str) -> str:
+        return os.path.join(self.session_dir, f"{upload_id}.json")
+
+    def _save(self, session: dict):
+        session["updatedAt"] = datetime.utcnow().isoformat()
+        path = self._sidecar_path(session["id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(session, f)
+        os.replace(tmp_path, path)
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        lock = self._locks.get(upload_id)
+        if lock is None:
+            lock = self._locks[upload_id] = asyncio.Lock()
+        return lock
+
+    def get(self, upload_id: str, user_id: str = None) -> dict:
+        """Load a session (from memory or its sidecar) and check ownership"""
+        session = self._sessions.get(upload_id)
+        if session is None:
+            try:
+                uuid.UUID(upload_id)
+                with open(self._sidecar_path(upload_id)) as f:
+                    session = json.load(f)
+            except (ValueError, OSError):
+                raise UploadSessionError("Sesi unggah tidak ditemukan", status_code=404)
+            self._sessions[upload_id] = session
+
+        if user_id is not None and session["userId"] != str(user_id):
+            raise UploadSessionError("Sesi unggah tidak ditemukan", status_code=404)
+        return session
+
+    def create(self, user_id: str, filename: str, total_size: int, options: dict = None) -> dict:
+        """Start a new upload session with an empty destination file"""
+        name = safe_filename(filename)
+        ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+        if ext not in ALLOWED_EXTENSIONS:
+            raise UploadSessionError(f"Format yang didukung: {', '.join(ALLOWED_EXTENSIONS)}")
+        if total_size <= 0:
+            raise UploadSessionError("Ukuran file tidak valid")
+        if total_size > MAX_VIDEO_SIZE:
+            raise UploadSessionError(f"File terlalu besar (maksimal {format_size_limit(MAX_VIDEO_SIZE)})")
+
+        self.cleanup_expired()
+        os.makedirs(self.session_dir, exist_ok=True)
+
+        upload_id = str(uuid.uuid4())
+        path = os.path.join(UPLOAD_DIR, f"{upload_id}_{name}")
+        open(path, "wb").close()
+
+        session = {
+            "id": upload_id,
+            "userId": str(user_id),
+            "filename": filename,
+            "path": path,
+            "totalSize": total_size,
+            "offset": 0,
+            "hashOffset": 0,
+            "status": "uploading",
+            "options": options or {},
+            "createdAt": datetime.utcnow().isoformat(),
+        }
+        self._sessions[upload_id] = session
+        self._hashers[upload_id] = hashlib.sha256()
+        self._save(session)
+
+        logger.info(f"📦 Upload session created: {upload_id} ({total_size} bytes)")
+        return session
+
+    async def write_chunk(self, upload_id: str, user_id: str, offset: int,
+                          chunks: AsyncIterator[bytes]) -> dict:
+        """
+        Append a chunk at `offset` (must equal the committed offset)
+
+        The body is streamed to disk as it arrives; if the connection drops
+        mid-chunk the bytes already written are kept and the committed offset
+        reflects them, so the client resumes from GET/HEAD offset.
+        """
+        session = self.get(upload_id, user_id)
+
+        async with self._lock(upload_id):
+            if session["status"] != "uploading":
+                raise UploadSessionError("Sesi unggah sudah selesai", status_code=409, offset=session["offset"])
+            if offset != session["offset"]:
+                raise UploadSessionError("Offset tidak sesuai", status_code=409, offset=session["offset"])
+
+            hasher = self._hashers.get(upload_id) if session["hashOffset"] == offset else None
+            position = offset
+            try:
+                async with aiofiles.open(session["path"], "r+b") as f:
+                    await f.seek(offset)
+                    async for data in chunks:
+                        if not data:
+                            continue
+                        if position + len(data) > session["totalSize"]:
+                            raise UploadSessionError("Data melebihi ukuran file yang dideklarasikan",
+                                                     status_code=413, offset=position)
+                        await f.write(data)
+                        position += len(data)
+                        if hasher is not None:
+                            hasher.update(data)
+            finally:
+                session["offset"] = position
+                if hasher is not None:
+                    session["hashOffset"] = position
+                self._save(session)
+
+        return session
+
+    async def _file_sha256(self, path: str) -> str:
+        digest = hashlib.sha256()
+        async with aiofiles.open(path, "rb") as f:
+            while data := await f.read(UPLOAD_CHUNK_SIZE):
+                digest.update(data)
+        return digest.hexdigest()
+
+    async def finalize(self, upload_id: str, user_id: str, expected_sha256: str = None) -> dict:
+        """Verify the upload is complete and return path, size and sha256"""
+        session = self.get(upload_id, user_id)
+
+        async with self._lock(upload_id):
+            if session["status"] == "completed":
+                # Repeated finalize (client lost the response): same result, no new job
+                return {"path": session["path"], "size": session["totalSize"],
+                        "sha256": session["sha256"], "duplicate": True}
+            if session["offset"] != session["totalSize"]:
+                raise UploadSessionError(
+                    f"Unggahan belum lengkap ({session['offset']}/{session['totalSize']} byte)",
+                    status_code=409, offset=session["offset"]
+                )
+
+            hasher = self._hashers.get(upload_id)
+            if hasher is not None and session["hashOffset"] == session["totalSize"]:
+                sha256 = hasher.hexdigest()
+            else:
+                # Hash state is lost after a restart: hash the file once
+                sha256 = await self._file_sha256(session["path"])
+
+            if expected_sha256 and expected_sha256.lower() != sha256:
+                raise UploadSessionError("Checksum file tidak cocok", status_code=422, offset=session["offset"])
+
+            session["status"] = "completed"
+            session["sha256"] = sha256
+            self._save(session)
+            self._hashers.pop(upload_id, None)
+
+        # No more writes are accepted; a repeated finalize gets a fresh lock
+        self._locks.pop(upload_id, None)
+
+        logger.info(f"✅ Upload session completed: {upload_id}")
+        return {"path": session["path"], "size": session["totalSize"], "sha256": sha256, "duplicate": False}
+
+    def should_start_progressive(self, session: dict) -> bool:
+        """
+        Whether detection can start on the partial file now
+
+        Decided once per session: containers that cannot be decoded while
+        incomplete fall back to starting detection at finalize.
+        """
+        if not session["options"].get("progressive") or session.get("detectionStarted"):
+            return False
+        if session["status"] != "uploading" or session["offset"] < PROGRESSIVE_CONFIG['START_BYTES']:
+            return False
+
+        if not is_streamable(session["path"]):
+            logger.info(f"ℹ️ Upload {session['id']} is not streamable, detection starts after finalize")
+            session["options"]["progressive"] = False
+            self._save(session)
+            return False
+
+        session["detectionStarted"] = True
+        self._save(session)
+        return True
+
+    def mark_detection_started(self, session: dict):
+        session["detectionStarted"] = True
+        self._save(session)
+
+    def discard(self, upload_id: str):
+        """Forget a session and delete its sidecar (and the file if never finalized)"""
+        session = self._sessions.pop(upload_id, None)
+        self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+        try:
+            if session is None:
+                with open(self._sidecar_path(upload_id)) as f:
+                    session = json.load(f)
+            os.remove(self._sidecar_path(upload_id))
+            # Finalized files belong to the detection job, which removes them
+            if session["status"] != "completed" and os.path.exists(session["path"]):
+                os.remove(session["path"])
+        except (OSError, ValueError):
+            pass
+
+    def cleanup_expired(self) -> int:
+        """Drop sessions idle for longer than the TTL"""
+        if not os.path.isdir(self.session_dir):
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for entry in os.scandir(self.session_dir):
+            if not entry.name.endswith(".json") or entry.stat().st_mtime >= cutoff:
+                continue
+            upload_id = entry.name[:-5]
+            lock = self._locks.get(upload_id)
+            if lock is not None and lock.locked():
+                continue  # a chunk is being written right now
+            logger.info(f"🗑️ Expired upload session: {upload_id}")
+            self.discard(upload_id)
+            removed += 1
+        return removed
+
+    async def run_cleanup(self, interval: float = UPLOAD_SESSION_CLEANUP_INTERVAL):
+        """Sweep expired sessions periodically (started from the app lifespan)"""
+        while True:
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                logger.warning(f"⚠️ Upload session cleanup failed: {e}")
+            await asyncio.sleep(interval)
+
+
+class ProgressiveSource:
+    """Upload state view handed to the detection job reading the growing file"""
+
+    def __init__(self, manager: UploadSessionManager, upload_id: str):
+        self.manager = manager
+        self.upload_id = upload_id
+        self.total_size = manager.get(upload_id)["totalSize"]
+
+    def _session(self):
+        try:
+            return self.manager.get(self.upload_id)
+        except UploadSessionError:
+            return None
+
+    def status(self) -> str:
+        session = self._session()
+        if session is None:
+            return "aborted"
+        return "completed" if session["status"] == "completed" else "uploading"
+
+    def received_bytes(self) -> int:
+        session = self._session()
+        return session["offset"] if session else 0
+
+    def file_info(self) -> dict:
+        session = self._session() or {}
+        return {"size": session.get("offset"), "sha256": session.get("sha256")}
+
+
+def session_status(session: dict) -> dict:
+    """Public view of a session"""
+    return {
+        "upload_id": session["id"],
+        "filename": session["filename"],
+        "offset": session["offset"],
+        "total_size": session["totalSize"],
+        "status": session["status"],
+        "progressive": bool(session["options"].get("progressive")),
+        "detection_started": bool(session.get("detectionStarted")),
+        "created_at": session["createdAt"],
+        "updated_at": session.get("updatedAt"),
+    }
+
+
+# Global session manager
+upload_session_manager = UploadSessionManager()
@@ -0,0 +1,272 @@
+"""
+Vehicle Counting Logic - Tracking state, class voting and line crossing
+Model-free so it can be benchmarked and tested without YOLO
+"""
+
+from collections import defaultdict, deque
+from app.config.constants import YOLO_CONFIG
+
+MAX_TRACKING_FRAMES = YOLO_CONFIG.get('MAX_TRACKING_FRAMES', 60)
+MIN_DETECTION_FRAMES = 1  # MIN_FRAMES_BEFORE_COUNT=1 dari count_video.py
+CATCH_UP_ZONE = YOLO_CONFIG.get('CATCH_UP_ZONE', 100)
+MIN_TRACK_DISTANCE = YOLO_CONFIG.get('MIN_TRACK_DISTANCE', 30)
+
+# Class mapping
+CLASS_MAP = {0: 'mobil', 1: 'bus', 2: 'truk'}
+
+
+def new_vehicle_status() -> dict:
+    """Initial tracking state for a new track ID"""
+    return {
+        'counted': False,
+        'y_history': deque(maxlen=MAX_TRACKING_FRAMES),
+        'x_history': deque(maxlen=MAX_TRACKING_FRAMES),
+        'width_history': deque(maxlen=MAX_TRACKING_FRAMES),
+        'height_history': deque(maxlen=MAX_TRACKING_FRAMES),
+        'conf_sum': 0.0,
+        'conf_count': 0,
+        'class_votes': defaultdict(int),
+        'class_votes_weighted': defaultdict(float),
+        'stable_class': None,
+        'lane': None,
+        'frame_count': 0,
+        'last_seen': 0,
+        'crossed_line': False,
+        'first_y': None,
+        'min_y': 9999,
+        'max_y': 0,
+        'passed_line_frame': None,
+        'was_above_line': False,
+        'was_below_line': False,
+        'crossing_confirmed': False
+    }
+
+
+def validate_class_by_size(cls_name: str, width: int, height: int) -> str:
+    """Validate and potentially correct vehicle classification based on size"""
+    area = width * height
+    aspect_ratio = width / max(height, 1)
+
+    if cls_name == 'bus':
+        if area < 6000 or width < 70:
+            return 'mobil'
+        if aspect_ratio > 1.3 and area > 8000:
+            return 'bus'
+        if area < 10000 and aspect_ratio < 1.5:
+            return 'mobil'
+    elif cls_name == 'mobil':
+        if area > 20000 and aspect_ratio > 2.0:
+            return 'bus'
+        return 'mobil'
+    elif cls_name == 'truk':
+        if area < 5000:
+            return 'mobil'
+        return 'truk'
+
+    return cls_name
+
+
+def get_stable_class(status: dict) -> str:
+    """Determine stable class using weighted voting"""
+    if status['frame_count'] < 3:
+        return None
+
+    widths = list(status['width_history'])
+    heights = list(status['height_history'])
+
+    if widths and heights:
+        avg_width = sum(widths) / len(widths)
+        avg_height = sum(heights) / len(heights)
+    else:
+        avg_width = 100
+        avg_height = 60
+
+    weighted_votes = status['class_votes_weighted']
+
+    if not weighted_votes:
+        return 'mobil'
+
+    best_class = max(weighted_votes.items(), key=lambda x: x[1])[0]
+    validated_class = validate_class_by_size(best_class, avg_width, avg_height)
+
+    return validated_class
+
+
+def get_lane_by_direction(y_history: list, first_y: int = None, min_y: int = None, max_y: int = None) -> str:
+    """Detect lane based on movement direction"""
+    if len(y_history) < 2:
+        return None
+
+    y_list = list(y_history)
+    first_y_val = first_y if first_y is not None else y_list[0]
+    last_y = y_list[-1]
+
+    if min_y is not None and max_y is not None and max_y > min_y:
+        if first_y_val < (min_y + max_y) / 2:
+            return 'kanan'
+        else:
+            return 'kiri'
+
+    overall_diff = last_y - first_y_val
+
+    if overall_diff < -10:
+        return 'kiri'
+    elif overall_diff > 10:
+        return 'kanan'
+    else:
+        return 'kiri' if overall_diff <= 0 else 'kanan'
+
+
+def check_crossing_with_catchup(status: dict, track_id: int, line_y: int, curr_y: int,
+                                frame_count: int, counted_ids_set: set) -> tuple:
+    """Enhanced crossing detection with catch-up mechanism"""
+    if track_id in counted_ids_set or status['counted']:
+        return False, None
+
+    y_history = status['y_history']
+    if len(y_history) < MIN_DETECTION_FRAMES:
+        return False, None
+
+    y_list = list(y_history)
+    first_y = status['first_y']
+
+    # Track position relative to line
+    if curr_y < line_y:
+        status['was_above_line'] = True
+    if curr_y > line_y:
+        status['was_below_line'] = True
+
+    # Determine direction
+    direction = None
+    if len(y_list) >= 3:
+        movement = y_list[-1] - y_list[0]
+        if movement > MIN_TRACK_DISTANCE:
+            direction = 'kanan'
+        elif movement < -MIN_TRACK_DISTANCE:
+            direction = 'kiri'
+
+    # METHOD 1: Direct crossing detection
+    for i in range(max(1, len(y_list) - 10), len(y_list)):
+        prev_y = y_list[i - 1]
+        curr = y_list[i]
+
+        if prev_y < line_y and curr >= line_y:
+            return True, 'kanan'
+        if prev_y > line_y and curr <= line_y:
+            return True, 'kiri'
+
+    # METHOD 2: Catch-up detection
+    if status['was_above_line'] and status['was_below_line']:
+        if not status['crossing_confirmed']:
+            status['crossing_confirmed'] = True
+            if first_y is not None:
+                if curr_y > first_y:
+                    return True, 'kanan'
+                else:
+                    return True, 'kiri'
+
+    # METHOD 3: Catch-up zone
+    if direction == 'kanan' and status['was_above_line']:
+        if line_y < curr_y < (line_y + CATCH_UP_ZONE):
+            if first_y is not None and first_y < line_y:
+                return True, 'kanan'
+
+    if direction == 'kiri' and status['was_below_line']:
+        if (line_y - CATCH_UP_ZONE) < curr_y < line_y:
+            if first_y is not None and first_y > line_y:
+                return True, 'kiri'
+
+    return False, direction
+
+
+class VehicleCounter:
+    """Per-video counting state fed with tracked boxes frame by frame"""
+
+    def __init__(self, line_position: int):
+        self.line_position = line_position
+        self.counters = {
+            'kiri': {'total': 0, 'mobil': 0, 'bus': 0, 'truk': 0},
+            'kanan': {'total': 0, 'mobil': 0, 'bus': 0, 'truk': 0}
+        }
+        self.total = 0
+        self.counted_vehicle_ids = []
+        self.counted_ids_set = set()
+        self.vehicle_status = defaultdict(new_vehicle_status)
+
+    def update(self, boxes, frame_count: int) -> list:
+        """
+        Update tracking state with one frame of tracked boxes
+
+        Args:
+            boxes: Iterable of (xyxy, track_id, cls_id, conf) in frame coordinates
+            frame_count: Current frame number
+
+        Returns:
+            List of (x1, y1, x2, y2, cx, cy, track_id, status, count_number) for drawing;
+            count_number is the running total when the vehicle was counted on this frame
+        """
+        line_y = self.line_position
+        annotations = []
+
+        for box, track_id, cls_id, conf in boxes:
+            x1, y1, x2, y2 = map(int, box)
+            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+            box_width = x2 - x1
+            box_height = y2 - y1
+
+            status = self.vehicle_status[track_id]
+            status['last_seen'] = frame_count
+            status['frame_count'] += 1
+            status['y_history'].append(cy)
+            status['x_history'].append(cx)
+            status['width_history'].append(box_width)
+            status['height_history'].append(box_height)
+            status['conf_sum'] += conf
+            status['conf_count'] += 1
+
+            if status['first_y'] is None:
+                status['first_y'] = cy
+            status['min_y'] = min(status['min_y'], cy)
+            status['max_y'] = max(status['max_y'], cy)
+
+            # Get and validate class
+            raw_cls_name = CLASS_MAP.get(cls_id, 'mobil')
+            validated_cls = validate_class_by_size(raw_cls_name, box_width, box_height)
+
+            status['class_votes'][validated_cls] += 1
+            status['class_votes_weighted'][validated_cls] += conf
+
+            if status['frame_count'] >= 3:
+                status['stable_class'] = get_stable_class(status)
+            else:
+                status['stable_class'] = validated_cls
+
+            # Detect lane
+            detected_lane = get_lane_by_direction(status['y_history'], status['first_y'],
+                                                  status['min_y'], status['max_y'])
+            if detected_lane:
+                status['lane'] = detected_lane
+
+            # Check crossing
+            count_number = None
+            if not status['counted'] and status['frame_count'] >= MIN_DETECTION_FRAMES:
+                is_crossing, lane = check_crossing_with_catchup(
+                    status, track_id, line_y, cy, frame_count, self.counted_ids_set
+                )
+
+                if is_crossing and lane:
+                    if track_id not in self.counted_ids_set:
+                        status['counted'] = True
+                        status['lane'] = lane
+                        self.counted_ids_set.add(track_id)
+
+                        final_class = get_stable_class(status) or status['stable_class']
+                        self.counters[lane]['total'] += 1
+                        self.counters[lane][final_class] += 1
+                        self.total += 1
+                        self.counted_vehicle_ids.append(int(track_id))
+                        count_number = self.total
+
+            annotations.append((x1, y1, x2, y2, cx, cy, track_id, status, count_number))
+
+        return annotations
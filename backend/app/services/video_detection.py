@@ -18,6 +18,7 @@ from pathlib import Path
 from app.utils.logger import logger
 from app.core.socket import socket_manager
 from app.config.cloudinary import upload_to_cloudinary
+from app.services.rollups import apply_rollup
 
 
 class VideoDetectionService:
@@ -124,7 +125,8 @@ class VideoDetectionService:
                           tracking_id: str, 
                           video_file_path: str, 
                           user_id: str,
-                          filename: str) -> Dict:
+                          filename: str,
+                          file_info: dict = None) -> Dict:
         """
         Complete video processing pipeline with real-time progress
         """
@@ -313,7 +315,9 @@ class VideoDetectionService:
                     "total_frames": total_frames,
                     "fps": fps,
                     "duration": duration,
-                    "resolution": f"{width}x{height}"
+                    "resolution": f"{width}x{height}",
+                    "file_size": (file_info or {}).get("size"),
+                    "sha256": (file_info or {}).get("sha256")
                 },
                 "detection_results": {
                     "total_detections": len([d for frame in detections for d in frame["detections"]]),
@@ -329,7 +333,7 @@ class VideoDetectionService:
             try:
                 from app.config.database import get_collection
                 deteksi_collection = get_collection("deteksi")
-                await deteksi_collection.insert_one({
+                result_doc = {
                     "_id": tracking_id,
                     "userId": user_id,
                     "filename": filename,
@@ -338,7 +342,9 @@ class VideoDetectionService:
                     "processedVideoUrl": video_url,
                     "createdAt": datetime.utcnow(),
                     "status": "completed"
-                })
+                }
+                await deteksi_collection.insert_one(result_doc)
+                await apply_rollup(result_doc, "deteksi")
             except Exception as e:
                 logger.warning(f"Failed to save to database: {e}")
             
@@ -383,10 +389,11 @@ class VideoDetectionService:
                             tracking_id: str, 
                             video_file_path: str, 
                             user_id: str,
-                            filename: str):
+                            filename: str,
+                            file_info: dict = None):
         """Start video detection as background task"""
         task = asyncio.create_task(
-            self.process_video(tracking_id, video_file_path, user_id, filename)
+            self.process_video(tracking_id, video_file_path, user_id, filename, file_info)
         )
         self.processing_tasks[tracking_id] = task
         return task
@@ -6,7 +6,9 @@ Production-ready for Render + Vercel deployment
 
 import os
 import uuid
+import time
 import asyncio
+import threading
 import tempfile
 from typing import Dict, List, Optional
 from ultralytics import YOLO
@@ -14,11 +16,27 @@ import cv2
 import numpy as np
 from datetime import datetime
 import json
+import hashlib
 from pathlib import Path
 import gc
 
+from fastapi.encoders import jsonable_encoder
+
 from app.utils.logger import logger
-from app.config.cloudinary import upload_to_cloudinary
+from app.core.socket import socket_manager, is_terminal
+from app.config.constants import YOLO_CONFIG, CACHE_CONFIG
+from app.utils.cache import LRUCache
+from app.utils.profiling import StageTimer
+from app.utils.metrics import DETECTION_FRAMES, DETECTION_FPS, DETECTION_JOBS, MODEL_LOAD_SECONDS
+from app.services.resolution_tuning import calibrate_resolution
+from app.services.job_scheduler import job_scheduler, estimate_job_memory, MODE_COUNT_ONLY
+from app.services.growing_capture import GrowingVideoCapture
+from app.services.storage import store_media, create_thumbnail
+from app.services.status_store import StatusStore
+from app.services.rollups import apply_rollup
+
+MAX_PROCESS_WIDTH = 1280
+MAX_PROCESS_HEIGHT = 720
 
 
 class VideoDetectionRestService:
@@ -28,7 +46,11 @@ class VideoDetectionRestService:
         self.model = None
         self.custom_model_path = None
         self.model_path = "yolov8n.pt"
-        self.processing_tasks: Dict[str, dict] = {}  # Store task status
+        self.processing_tasks = StatusStore()  # Store task status (finished jobs expire)
+        self.auto_resolution = YOLO_CONFIG.get('AUTO_RESOLUTION', False)
+        self._background_tasks = set()
+        self.result_cache = LRUCache(CACHE_CONFIG['STATUS_RESULTS'])  # tracking_id -> stored status
+        self._inference_lock = threading.Lock()  # frame loops of concurrent jobs share self.model
         
         # Check for custom models
         custom_models = [
@@ -51,23 +73,95 @@ class VideoDetectionRestService:
         """Get current processing status for polling"""
         return self.processing_tasks.get(tracking_id)
     
+    def job_owner(self, tracking_id: str) -> Optional[str]:
+        """User ID of a job still in the status store"""
+        return self.processing_tasks.owner(tracking_id)
+    
     def update_status(self, tracking_id: str, status: dict):
-        """Update processing status"""
+        """Update processing status and push it to subscribers"""
+        previous = self.processing_tasks.get(tracking_id) or {}
         self.processing_tasks[tracking_id] = {
             **status,
+            "version": previous.get("version", 0) + 1,
             "updated_at": datetime.utcnow().isoformat()
         }
+        socket_manager.publish(tracking_id, self.processing_tasks[tracking_id])
+    
+    def update_result(self, tracking_id: str, fields: dict):
+        """Merge fields into the result of a completed job's status"""
+        status = self.processing_tasks.get(tracking_id)
+        if status and isinstance(status.get("result"), dict):
+            status["result"].update(fields)
+            status["version"] = status.get("version", 0) + 1
+            status["updated_at"] = datetime.utcnow().isoformat()
+            self.processing_tasks.touch(tracking_id)
+            socket_manager.publish(tracking_id, status)
+    
+    def status_etag(self, tracking_id: str, status: dict) -> str:
+        """Weak ETag of an in-memory status (changes on every update)"""
+        return f'W/"{tracking_id[:8]}-{status.get("version", 0)}-{status.get("updated_at", "")}"'
+    
+    async def get_stored_status(self, tracking_id: str) -> Optional[dict]:
+        """
+        Status response data and ETag of a saved detection
+        Finished results are kept in an LRU cache so repeated polls skip MongoDB
+        """
+        cached = self.result_cache.get(tracking_id)
+        if cached is not None:
+            return cached
+        
+        from app.config.database import get_collection
+        result = await get_collection("deteksi").find_one({"_id": tracking_id})
+        if not result:
+            return None
+        
+        data = jsonable_encoder({
+            "tracking_id": tracking_id,
+            "status": result.get("status", "completed"),
+            "progress": 100,
+            "message": "Deteksi selesai",
+            "result": {
+                "filename": result.get("filename"),
+                "video_info": result.get("videoInfo"),
+                "vehicle_counts": result.get("detectionResults", {}).get("vehicleCounts"),
+                "total_detections": result.get("detectionResults", {}).get("totalDetections"),
+                "processed_video_url": result.get("processedVideoUrl"),
+                "video_upload": result.get("videoUpload"),
+                "thumbnail_url": result.get("thumbnailUrl"),
+                "counting_data": result.get("countingData"),
+                "created_at": result.get("createdAt")
+            }
+        })
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+        stored = {"data": data, "etag": f'"{digest}"', "owner": str(result.get("userId"))}
+        
+        # Documents still receiving the background video upload will change
+        if is_terminal(data):
+            self.result_cache.set(tracking_id, stored)
+        return stored
+    
+    def _spawn(self, coro):
+        """Run a background task, keeping a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
     
     def clear_status(self, tracking_id: str):
         """Clear processing status after completion"""
         if tracking_id in self.processing_tasks:
             del self.processing_tasks[tracking_id]
     
+    def count_jobs(self, *states: str) -> int:
+        """Count tracked jobs in the given states"""
+        return sum(1 for task in self.processing_tasks.values() if task.get("status") in states)
+    
     async def initialize_model(self):
         """Initialize YOLO model with memory optimization"""
         try:
             if self.model is None:
                 logger.info(f"🤖 Loading YOLO model: {self.model_path}")
+                load_start = time.perf_counter()
                 
                 # Memory cleanup
                 gc.collect()
@@ -84,6 +178,7 @@ class VideoDetectionRestService:
                 # Warm up model
                 test_frame = np.zeros((640, 640, 3), dtype=np.uint8)
                 _ = self.model(test_frame, verbose=False)
+                MODEL_LOAD_SECONDS.labels(pipeline='rest').set(time.perf_counter() - load_start)
                 
                 logger.info(f"✅ YOLO model loaded: {len(self.model.names)} classes")
                 gc.collect()
@@ -118,13 +213,146 @@ class VideoDetectionRestService:
         }
         return colors.get(vehicle_type.lower(), (128, 128, 128))
     
+    def estimate_memory(self, video_file_path: str) -> tuple:
+        """Estimated peak memory (MB) for (full, count-only) processing of a video"""
+        cap = cv2.VideoCapture(video_file_path)
+        try:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or MAX_PROCESS_WIDTH
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or MAX_PROCESS_HEIGHT
+        finally:
+            cap.release()
+        
+        scale = min(1.0, MAX_PROCESS_WIDTH / width, MAX_PROCESS_HEIGHT / height)
+        process_width, process_height = int(width * scale), int(height * scale)
+        # Calibration may try up to the largest candidate resolution
+        imgsz = max(YOLO_CONFIG.get('RESOLUTION_CANDIDATES', [640])) if self.auto_resolution else 640
+        imgsz = min(imgsz, max(process_width, 640))
+        
+        kwargs = dict(imgsz=imgsz, batch_size=1, model_path=self.model_path, model_loaded=self.model is not None)
+        return (
+            estimate_job_memory(process_width, process_height, **kwargs),
+            estimate_job_memory(process_width, process_height, count_only=True, **kwargs)
+        )
+    
+    def _calibrate(self, video_file_path: str, line_y: int, max_width: int) -> dict:
+        """calibrate_resolution under the model lock (runs in a worker thread)"""
+        with self._inference_lock:
+            return calibrate_resolution(self.model, video_file_path, line_y, max_width=max_width)
+    
+    def _process_frames(self, cap, out, timer: StageTimer, report, *, total_frames: int, fps: float,
+                        size: tuple, process_size: tuple, imgsz: Optional[int], progressive: bool) -> tuple:
+        """
+        Decode, detect, draw and encode every frame (runs in a worker thread)
+        Progress goes through `report`, which hands it back to the event loop.
+        Returns (detections, vehicle_counts, frame_count, total_frames).
+        """
+        detections = []
+        vehicle_counts = {"mobil": 0, "motor": 0, "truk": 0, "bus": 0}
+        frame_count = 0
+        skip_frames = max(1, int(fps / 10))  # Process ~10 frames per second
+        frames_metric = DETECTION_FRAMES.labels(pipeline='rest')
+        
+        while True:
+            t0 = time.perf_counter()
+            ret, frame = cap.read()
+            timer.add('decode', time.perf_counter() - t0)
+            if not ret:
+                if progressive:
+                    # Caught up with the upload: wait for more bytes
+                    with timer.stage('upload_wait'):
+                        more = cap.wait_for_data()
+                    if more:
+                        total_frames = cap.estimated_total_frames()
+                        continue
+                break
+            
+            frame_count += 1
+            frames_metric.inc()
+            
+            # Resize if needed
+            if process_size != size:
+                with timer.stage('resize'):
+                    frame = cv2.resize(frame, process_size)
+            
+            # Run detection on selected frames
+            if frame_count % skip_frames == 0:
+                # The shared model is not safe for concurrent predict calls; take the
+                # lock first so waiting on another job is not timed as inference
+                with self._inference_lock, timer.stage('inference'):
+                    if imgsz:
+                        results = self.model(frame, imgsz=imgsz, verbose=False)[0]
+                    else:
+                        results = self.model(frame, verbose=False)[0]
+                
+                # Class mapping and counting
+                t0 = time.perf_counter()
+                frame_detections = []
+                for box in results.boxes:
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    conf = float(box.conf[0])
+                    cls = int(box.cls[0])
+                    
+                    class_name = self.model.names[cls]
+                    vehicle_type = self._normalize_vehicle_type(class_name)
+                    
+                    if vehicle_type in vehicle_counts:
+                        vehicle_counts[vehicle_type] += 1
+                    
+                    frame_detections.append({
+                        "frame": frame_count,
+                        "class": vehicle_type,
+                        "confidence": round(conf, 3),
+                        "bbox": [x1, y1, x2, y2]
+                    })
+                detections.extend(frame_detections)
+                timer.add('counting', time.perf_counter() - t0)
+                
+                if out is not None:
+                    with timer.stage('drawing'):
+                        for detection in frame_detections:
+                            x1, y1, x2, y2 = detection["bbox"]
+                            vehicle_type = detection["class"]
+                            color = self._get_class_color(vehicle_type)
+                            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                            cv2.putText(frame, f"{vehicle_type} {detection['confidence']:.2f}", 
+                                       (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 
+                                       0.5, color, 2)
+            
+            if out is not None:
+                with timer.stage('encoding'):
+                    out.write(frame)
+            
+            # Update progress every 1% (pushed subscribers get it coalesced)
+            if frame_count % max(1, total_frames // 100) == 0:
+                progress = min(90, 10 + int((frame_count / max(total_frames, 1)) * 80))
+                report({
+                    "status": "processing",
+                    "progress": progress,
+                    "message": f"Memproses frame {frame_count}/{total_frames}",
+                    "current_frame": frame_count,
+                    "total_frames": total_frames,
+                    "vehicle_counts": vehicle_counts.copy(),
+                    "stage_timings": timer.totals()
+                })
+            
+            # Memory cleanup periodically
+            if frame_count % 100 == 0:
+                gc.collect()
+        
+        return detections, vehicle_counts, frame_count, total_frames
+    
     async def process_video_async(self, 
                                   tracking_id: str, 
                                   video_file_path: str, 
                                   user_id: str,
-                                  filename: str):
+                                  filename: str,
+                                  count_only: bool = False,
+                                  file_info: dict = None,
+                                  progressive_source=None):
         """
         Background video processing - status updated for polling
+        count_only skips the annotated video (no drawing, encoding or upload)
+        progressive_source follows a file that is still being uploaded
         """
         try:
             logger.info(f"🎬 Processing video: {tracking_id}")
@@ -150,129 +378,110 @@ class VideoDetectionRestService:
             self.update_status(tracking_id, {
                 "status": "processing",
                 "progress": 5,
-                "message": "Model YOLO siap, membuka video..."
+                "message": ("Memori terbatas, mode hitung saja (tanpa video hasil)..." if count_only
+                            else "Model YOLO siap, membuka video..."),
+                "mode": "count_only" if count_only else "full"
             })
             
             # Open video
-            cap = cv2.VideoCapture(video_file_path)
-            if not cap.isOpened():
-                self.update_status(tracking_id, {
-                    "status": "error",
-                    "message": "Tidak dapat membuka file video"
-                })
-                return None
-            
-            # Get video info
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            duration = total_frames / fps if fps > 0 else 0
-            
-            logger.info(f"📊 Video: {total_frames} frames, {fps:.1f} FPS, {width}x{height}")
-            
-            self.update_status(tracking_id, {
-                "status": "processing",
-                "progress": 10,
-                "message": f"Menganalisis video ({total_frames} frame)...",
-                "total_frames": total_frames,
-                "fps": fps,
-                "duration": round(duration, 2)
-            })
-            
-            # Setup output
-            os.makedirs("/tmp/temp", exist_ok=True)
-            output_path = f"/tmp/temp/detected_{tracking_id}.mp4"
-            
-            # Scale down if needed
-            if width > 1280 or height > 720:
-                scale = min(1280/width, 720/height)
-                new_width, new_height = int(width * scale), int(height * scale)
+            if progressive_source is not None:
+                cap = GrowingVideoCapture(video_file_path, progressive_source)
             else:
-                new_width, new_height = width, height
-            
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (new_width, new_height))
-            
-            # Process frames
-            detections = []
-            vehicle_counts = {"mobil": 0, "motor": 0, "truk": 0, "bus": 0}
-            frame_count = 0
-            skip_frames = max(1, int(fps / 10))  # Process ~10 frames per second
-            
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+                cap = cv2.VideoCapture(video_file_path)
+            out = None
+            try:
+                if not cap.isOpened():
+                    self.update_status(tracking_id, {
+                        "status": "error",
+                        "message": "Tidak dapat membuka file video"
+                    })
+                    return None
                 
-                frame_count += 1
+                # Get video info
+                if progressive_source is not None:
+                    total_frames = cap.estimated_total_frames()
+                else:
+                    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                duration = total_frames / fps if fps > 0 else 0
                 
-                # Resize if needed
-                if (new_width, new_height) != (width, height):
-                    frame = cv2.resize(frame, (new_width, new_height))
+                logger.info(f"📊 Video: {total_frames} frames, {fps:.1f} FPS, {width}x{height}")
                 
-                # Run detection on selected frames
-                if frame_count % skip_frames == 0:
-                    results = self.model(frame, verbose=False)[0]
-                    
-                    for box in results.boxes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        conf = float(box.conf[0])
-                        cls = int(box.cls[0])
-                        
-                        class_name = self.model.names[cls]
-                        vehicle_type = self._normalize_vehicle_type(class_name)
-                        
-                        if vehicle_type in vehicle_counts:
-                            vehicle_counts[vehicle_type] += 1
-                        
-                        color = self._get_class_color(vehicle_type)
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        cv2.putText(frame, f"{vehicle_type} {conf:.2f}", 
-                                   (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 
-                                   0.5, color, 2)
-                        
-                        detections.append({
-                            "frame": frame_count,
-                            "class": vehicle_type,
-                            "confidence": round(conf, 3),
-                            "bbox": [x1, y1, x2, y2]
-                        })
+                self.update_status(tracking_id, {
+                    "status": "processing",
+                    "progress": 10,
+                    "message": f"Menganalisis video ({total_frames} frame)...",
+                    "total_frames": total_frames,
+                    "fps": fps,
+                    "duration": round(duration, 2)
+                })
+                
+                # Setup output
+                os.makedirs("/tmp/temp", exist_ok=True)
+                output_path = f"/tmp/temp/detected_{tracking_id}.mp4"
                 
-                out.write(frame)
+                # Scale down if needed
+                scale = min(1.0, MAX_PROCESS_WIDTH / width, MAX_PROCESS_HEIGHT / height)
+                imgsz = None
+                calibration = None
                 
-                # Update progress every 10%
-                if frame_count % max(1, total_frames // 10) == 0:
-                    progress = min(90, 10 + int((frame_count / total_frames) * 80))
+                # Calibration samples the whole video, so it needs the complete file
+                if self.auto_resolution and progressive_source is None:
                     self.update_status(tracking_id, {
                         "status": "processing",
-                        "progress": progress,
-                        "message": f"Memproses frame {frame_count}/{total_frames}",
-                        "current_frame": frame_count,
-                        "total_frames": total_frames,
-                        "vehicle_counts": vehicle_counts.copy()
+                        "progress": 10,
+                        "message": "Kalibrasi resolusi pemrosesan..."
                     })
+                    calibration = await asyncio.to_thread(
+                        self._calibrate, video_file_path, int(height * 0.60), int(width * scale)
+                    )
+                    scale = min(scale, calibration['scale'])
+                    imgsz = calibration['imgsz']
                 
-                # Memory cleanup periodically
-                if frame_count % 100 == 0:
-                    gc.collect()
-            
-            cap.release()
-            out.release()
+                new_width, new_height = int(width * scale), int(height * scale)
+                
+                if not count_only:
+                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                    out = cv2.VideoWriter(output_path, fourcc, fps, (new_width, new_height))
+                
+                # Decode/inference loop runs in a worker thread so the event loop
+                # keeps serving requests (including upload chunks for this file)
+                processing_start = time.time()
+                timer = StageTimer()
+                loop = asyncio.get_running_loop()
+                
+                def report(status: dict):
+                    loop.call_soon_threadsafe(self.update_status, tracking_id, status)
+                
+                detections, vehicle_counts, frame_count, total_frames = await asyncio.to_thread(
+                    self._process_frames, cap, out, timer, report,
+                    total_frames=total_frames, fps=fps, size=(width, height),
+                    process_size=(new_width, new_height), imgsz=imgsz,
+                    progressive=progressive_source is not None
+                )
+                
+                if progressive_source is not None:
+                    if not cap.finished:
+                        raise RuntimeError("Unggahan video terhenti atau dibatalkan sebelum selesai")
+                    logger.info(f"⏩ Progressive read finished: {frame_count} frames, {cap.reopens} reopens")
+                    total_frames = frame_count
+                    duration = total_frames / fps if fps > 0 else 0
+                    file_info = progressive_source.file_info()
+            finally:
+                # Also on errors: frees the upload session's file and finalizes the writer
+                cap.release()
+                if out is not None:
+                    out.release()
             
-            self.update_status(tracking_id, {
-                "status": "uploading",
-                "progress": 92,
-                "message": "Mengunggah video hasil deteksi..."
-            })
+            processing_time = time.time() - processing_start
+            processing_fps = frame_count / processing_time if processing_time > 0 else 0
+            DETECTION_FPS.labels(pipeline='rest').set(processing_fps)
             
-            # Upload to Cloudinary
+            # Processed video is uploaded after the result is saved
             processed_url = None
-            try:
-                processed_url = await upload_to_cloudinary(output_path, f"detected_{tracking_id}")
-                logger.info(f"✅ Uploaded to Cloudinary: {processed_url}")
-            except Exception as e:
-                logger.warning(f"⚠️ Cloudinary upload failed: {e}")
+            video_upload = {"status": "pending" if out is not None else "skipped"}
             
             # Save to database
             from app.config.database import get_collection
@@ -305,7 +514,11 @@ class VideoDetectionRestService:
                     "totalFrames": total_frames,
                     "fps": fps,
                     "duration": round(duration, 2),
-                    "resolution": f"{width}x{height}"
+                    "resolution": f"{width}x{height}",
+                    "fileSize": (file_info or {}).get("size"),
+                    "sha256": (file_info or {}).get("sha256"),
+                    "processingResolution": f"{new_width}x{new_height}",
+                    "calibration": calibration
                 },
                 "detectionResults": {
                     "totalDetections": len(detections),
@@ -313,18 +526,26 @@ class VideoDetectionRestService:
                     "detections": detections[:100]  # Limit stored detections
                 },
                 "countingData": counting_data,
+                "totalKendaraan": sum(vehicle_counts.get(v, 0) for v in ("mobil", "bus", "truk")),
                 "processedVideoUrl": processed_url,
+                "videoUpload": video_upload,
+                "processingMode": "count_only" if count_only else "full",
+                "processingMetrics": {
+                    "processingTime": round(processing_time, 3),
+                    "processingFps": round(processing_fps, 2),
+                    "stageTimings": timer.summary()
+                },
                 "createdAt": datetime.utcnow(),
                 "updatedAt": datetime.utcnow()
             }
             
             await deteksi_collection.insert_one(result_doc)
+            await apply_rollup(result_doc, "deteksi")
             logger.info(f"✅ Detection saved: {tracking_id}")
             
-            # Cleanup
+            # Cleanup (the output file is removed by the upload task)
             try:
                 os.remove(video_file_path)
-                os.remove(output_path)
             except:
                 pass
             
@@ -339,14 +560,22 @@ class VideoDetectionRestService:
                     "total_detections": len(detections),
                     "vehicle_counts": vehicle_counts,
                     "processed_video_url": processed_url,
+                    "video_upload": dict(video_upload),
+                    "processing_mode": "count_only" if count_only else "full",
                     "video_info": {
                         "total_frames": total_frames,
                         "fps": fps,
-                        "duration": round(duration, 2)
-                    }
+                        "duration": round(duration, 2),
+                        "processing_resolution": f"{new_width}x{new_height}",
+                        "processing_fps": round(processing_fps, 2)
+                    },
+                    "stage_timings": timer.totals()
                 }
             })
             
+            if out is not None:
+                self._spawn(self._upload_processed_video(tracking_id, output_path))
+            
             gc.collect()
             return result_doc
             
@@ -369,23 +598,111 @@ class VideoDetectionRestService:
             
             return None
     
+    async def _upload_processed_video(self, tracking_id: str, output_path: str):
+        """
+        Store the annotated video and a thumbnail after the job is already completed
+        Progress goes into the status; the saved detection is updated at the end.
+        The time spent is added as the 'upload' stage of the job's stage timings.
+        """
+        from app.config.database import get_collection
+        
+        timer = StageTimer()
+        
+        def upload_stage() -> dict:
+            """$set fields and status result fields recording the upload stage"""
+            status = self.processing_tasks.get(tracking_id) or {}
+            status_timings = (status.get("result") or {}).get("stage_timings") or {}
+            return (
+                {"processingMetrics.stageTimings.upload": timer.summary()["upload"]},
+                {"stage_timings": {**status_timings, **timer.totals()}}
+            )
+        
+        last_progress = {"value": -1}
+        
+        def on_progress(sent: int, total: int):
+            progress = int(sent * 100 / total) if total else 100
+            if progress != last_progress["value"]:
+                last_progress["value"] = progress
+                self.update_result(tracking_id, {"video_upload": {"status": "uploading", "progress": progress}})
+        
+        on_progress(0, 1)
+        upload_start = time.perf_counter()
+        try:
+            thumbnail = None
+            thumbnail_path = f"/tmp/temp/thumb_{tracking_id}.jpg"
+            try:
+                if await asyncio.to_thread(create_thumbnail, output_path, thumbnail_path):
+                    thumbnail = await store_media(thumbnail_path, "thumbnails", f"{tracking_id}.jpg")
+            except Exception as e:
+                logger.warning(f"⚠️ Thumbnail failed for {tracking_id}: {e}")
+            
+            video = await store_media(output_path, "videos", f"{tracking_id}.mp4", progress_callback=on_progress)
+            upload_time = round(time.perf_counter() - upload_start, 3)
+            timer.add('upload', time.perf_counter() - upload_start)
+            stage_fields, status_fields = upload_stage()
+            logger.info(f"✅ Processed video stored ({video['backend']}) in {upload_time}s: {video['url']}")
+            
+            await get_collection("deteksi").update_one(
+                {"_id": tracking_id},
+                {"$set": {
+                    "processedVideoUrl": video["url"],
+                    "thumbnailUrl": thumbnail["url"] if thumbnail else None,
+                    "storage": {"video": video, "thumbnail": thumbnail},
+                    "videoUpload": {"status": "completed", "backend": video["backend"], "uploadTime": upload_time},
+                    **stage_fields,
+                    "updatedAt": datetime.utcnow()
+                }}
+            )
+            self.result_cache.pop(tracking_id)
+            self.update_result(tracking_id, {
+                **status_fields,
+                "processed_video_url": video["url"],
+                "thumbnail_url": thumbnail["url"] if thumbnail else None,
+                "video_upload": {"status": "completed", "progress": 100, "backend": video["backend"]}
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ Processed video upload failed for {tracking_id}: {e}")
+            timer.add('upload', time.perf_counter() - upload_start)
+            stage_fields, status_fields = upload_stage()
+            self.update_result(tracking_id, {**status_fields, "video_upload": {"status": "failed", "error": str(e)}})
+            try:
+                await get_collection("deteksi").update_one(
+                    {"_id": tracking_id},
+                    {"$set": {"videoUpload": {"status": "failed"}, **stage_fields, "updatedAt": datetime.utcnow()}}
+                )
+                self.result_cache.pop(tracking_id)
+            except Exception:
+                pass
+        finally:
+            for path in (output_path, f"/tmp/temp/thumb_{tracking_id}.jpg"):
+                if os.path.exists(path):
+                    os.remove(path)
+    
     async def start_detection(self, 
                              tracking_id: str,
                              video_file_path: str,
                              user_id: str,
-                             filename: str):
+                             filename: str,
+                             file_info: dict = None,
+                             progressive_source=None):
         """Start background detection task"""
+        # Probing opens the video; keep it off the event loop
+        full_mb, count_only_mb = await asyncio.to_thread(self.estimate_memory, video_file_path)
+        
         # Initialize status
         self.update_status(tracking_id, {
             "status": "queued",
             "progress": 0,
             "message": "Antrian proses deteksi...",
-            "tracking_id": tracking_id
+            "tracking_id": tracking_id,
+            "estimated_memory_mb": full_mb
         })
+        self.processing_tasks.set_owner(tracking_id, user_id)
         
         # Start async task with error callback
         task = asyncio.create_task(
-            self.process_video_async(tracking_id, video_file_path, user_id, filename)
+            self._run_scheduled(tracking_id, video_file_path, user_id, filename, full_mb, count_only_mb,
+                                file_info, progressive_source)
         )
         
         # Add error callback
@@ -404,7 +721,38 @@ class VideoDetectionRestService:
         task.add_done_callback(handle_error)
         
         return tracking_id
+    
+    async def _run_scheduled(self, tracking_id: str, video_file_path: str, user_id: str,
+                             filename: str, full_mb: float, count_only_mb: float,
+                             file_info: dict = None, progressive_source=None):
+        """Wait for memory admission, then process (downgraded to count-only if needed)"""
+        if job_scheduler.running or job_scheduler.queued:
+            self.update_status(tracking_id, {
+                "status": "queued",
+                "progress": 0,
+                "message": "Menunggu memori server tersedia...",
+                "tracking_id": tracking_id,
+                "queue_position": job_scheduler.queued + 1,
+                "estimated_memory_mb": full_mb
+            })
+        
+        mode = await job_scheduler.admit(tracking_id, full_mb, count_only_mb)
+        try:
+            return await self.process_video_async(
+                tracking_id, video_file_path, user_id, filename,
+                count_only=mode == MODE_COUNT_ONLY, file_info=file_info,
+                progressive_source=progressive_source
+            )
+        finally:
+            job_scheduler.release(tracking_id)
 
 
 # Global service instance
 video_detection_rest_service = VideoDetectionRestService()
+
+DETECTION_JOBS.labels(state="queued").set_function(
+    lambda: video_detection_rest_service.count_jobs("queued")
+)
+DETECTION_JOBS.labels(state="running").set_function(
+    lambda: video_detection_rest_service.count_jobs("initializing", "processing", "uploading")
+)
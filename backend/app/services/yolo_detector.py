@@ -5,14 +5,22 @@ Pure Python implementation for 100% accurate vehicle counting
 
 import os
 import cv2
+import asyncio
 import json
 import time
 import numpy as np
 import torch
-from collections import defaultdict, deque
 from ultralytics import YOLO
+from ultralytics.engine.results import Boxes
 from app.utils.logger import logger
+from app.utils.profiling import StageTimer
+from app.utils.metrics import DETECTION_FRAMES, DETECTION_FPS, MODEL_LOAD_SECONDS
 from app.config.constants import YOLO_CONFIG
+from app.services.resolution_tuning import calibrate_resolution
+from app.services.vehicle_counter import (
+    VehicleCounter, CLASS_MAP, MAX_TRACKING_FRAMES, MIN_DETECTION_FRAMES, CATCH_UP_ZONE, MIN_TRACK_DISTANCE,
+    validate_class_by_size, get_stable_class, get_lane_by_direction, check_crossing_with_catchup
+)
 
 # Get model path - update untuk deployment
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models/vehicle-night-yolo/runs/detect/vehicle_night2/weights/best.pt')
@@ -23,17 +31,19 @@ IOU_THRESHOLD = 0.3   # iou=0.3 dari script asli
 RESIZE_WIDTH = YOLO_CONFIG.get('RESIZE_WIDTH', 960)
 FRAME_SKIP = YOLO_CONFIG.get('FRAME_SKIP', 1)
 OFFSET = 40  # OFFSET=40 dari count_video.py
-MAX_TRACKING_FRAMES = YOLO_CONFIG.get('MAX_TRACKING_FRAMES', 60)
-MIN_DETECTION_FRAMES = 1  # MIN_FRAMES_BEFORE_COUNT=1 dari count_video.py
 DOT_SPACING = YOLO_CONFIG.get('DOT_SPACING', 30)
-CATCH_UP_ZONE = YOLO_CONFIG.get('CATCH_UP_ZONE', 100)
-MIN_TRACK_DISTANCE = YOLO_CONFIG.get('MIN_TRACK_DISTANCE', 30)
 MAX_FRAMES_SINCE_LINE = YOLO_CONFIG.get('MAX_FRAMES_SINCE_LINE', 15)
 PROGRESS_UPDATE = 5
 TRACKER_CONFIG = "botsort.yaml"  # Tracker dari count_video.py
 
-# Class mapping
-CLASS_MAP = {0: 'mobil', 1: 'bus', 2: 'truk'}
+# Tiled inference (resolusi penuh, hanya di sekitar garis hitung)
+TILED_INFERENCE = YOLO_CONFIG.get('TILED_INFERENCE', False)
+TILE_SIZE = YOLO_CONFIG.get('TILE_SIZE', 640)
+TILE_OVERLAP = YOLO_CONFIG.get('TILE_OVERLAP', 0.2)
+TILE_BAND_MARGIN = YOLO_CONFIG.get('TILE_BAND_MARGIN', 200)
+TILE_BATCH_SIZE = YOLO_CONFIG.get('TILE_BATCH_SIZE', 8)
+TILE_MERGE_IOS = YOLO_CONFIG.get('TILE_MERGE_IOS', 0.8)
+AUTO_RESOLUTION = YOLO_CONFIG.get('AUTO_RESOLUTION', False)
 
 # Size thresholds for classification validation
 SIZE_THRESHOLDS = {
@@ -43,12 +53,95 @@ SIZE_THRESHOLDS = {
 }
 
 
+def _tile_offsets(start: int, end: int, tile: int, overlap: float, limit: int) -> list:
+    """Tile origins along one axis covering [start, end) inside [0, limit)"""
+    if limit <= tile:
+        return [0]
+    
+    stride = max(1, int(tile * (1 - overlap)))
+    offsets = [max(0, min(start, limit - tile))]
+    while offsets[-1] + tile < min(end, limit):
+        offsets.append(min(offsets[-1] + stride, limit - tile))
+    return offsets
+
+
+def compute_band_tiles(frame_width: int, frame_height: int, band_top: int, band_bottom: int,
+                       tile_size: int = TILE_SIZE, overlap: float = TILE_OVERLAP) -> list:
+    """
+    Compute overlapping tiles (x1, y1, x2, y2) that intersect the counting band.
+    Tiles outside the band are never produced, so only the area around the
+    counting line is sent to the model.
+    """
+    band_top = max(0, band_top)
+    band_bottom = min(frame_height, band_bottom)
+    
+    # Narrow band: center a single row of tiles on it
+    if band_bottom - band_top < tile_size:
+        band_top = (band_top + band_bottom) // 2 - tile_size // 2
+        band_bottom = band_top + tile_size
+    
+    tile_w = min(tile_size, frame_width)
+    tile_h = min(tile_size, frame_height)
+    ys = _tile_offsets(band_top, band_bottom, tile_size, overlap, frame_height)
+    xs = _tile_offsets(0, frame_width, tile_size, overlap, frame_width)
+    
+    return [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs]
+
+
+def merge_tile_detections(detections: np.ndarray, iou_threshold: float = IOU_THRESHOLD,
+                          ios_threshold: float = TILE_MERGE_IOS) -> np.ndarray:
+    """
+    Class-agnostic greedy NMS across tiles.
+    
+    Besides plain IoU, a box is also suppressed when most of it lies inside a
+    higher-scoring box (intersection over the smaller area), which removes the
+    truncated duplicates produced where a vehicle straddles a tile border.
+    
+    Args:
+        detections: (N, 6) array of x1, y1, x2, y2, conf, cls in frame coordinates
+    """
+    if len(detections) == 0:
+        return detections
+    
+    x1, y1, x2, y2 = detections[:, 0], detections[:, 1], detections[:, 2], detections[:, 3]
+    areas = np.maximum(0, x2 - x1) * np.maximum(0, y2 - y1)
+    order = detections[:, 4].argsort()[::-1]
+    keep = []
+    
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        
+        inter_w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        inter_h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        ios = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-6)
+        
+        order = rest[(iou <= iou_threshold) & (ios <= ios_threshold)]
+    
+    return detections[keep]
+
+
+def create_tracker(fps: float):
+    """Create a standalone BoT-SORT tracker (used when detections come from tiles)"""
+    from ultralytics.trackers.bot_sort import BOTSORT
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+    
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(TRACKER_CONFIG)))
+    return BOTSORT(args=cfg, frame_rate=int(round(fps)) or 30)
+
+
 class YOLODetector:
     """YOLO Vehicle Detector with Counting Line"""
     
     def __init__(self, model_path: str = None):
         self.model_path = model_path or MODEL_PATH
         self.model = None
+        # Calibration runs in a worker thread; concurrent jobs must not share the model mid-predict
+        self._model_lock = asyncio.Lock()
         self._load_model()
     
     def _load_model(self):
@@ -58,6 +151,7 @@ class YOLODetector:
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"YOLO model not found at: {self.model_path}")
         
+        load_start = time.perf_counter()
         self.model = YOLO(self.model_path)
         self.model.fuse()  # Fuse Conv2d + BatchNorm2d layers
         
@@ -70,143 +164,56 @@ class YOLODetector:
         else:
             logger.info("⚠️ Running on CPU")
         
+        MODEL_LOAD_SECONDS.labels(pipeline='detector').set(time.perf_counter() - load_start)
         logger.info("✅ YOLO model loaded successfully")
     
     def validate_class_by_size(self, cls_name: str, width: int, height: int) -> str:
         """Validate and potentially correct vehicle classification based on size"""
-        area = width * height
-        aspect_ratio = width / max(height, 1)
-        
-        if cls_name == 'bus':
-            if area < 6000 or width < 70:
-                return 'mobil'
-            if aspect_ratio > 1.3 and area > 8000:
-                return 'bus'
-            if area < 10000 and aspect_ratio < 1.5:
-                return 'mobil'
-        elif cls_name == 'mobil':
-            if area > 20000 and aspect_ratio > 2.0:
-                return 'bus'
-            return 'mobil'
-        elif cls_name == 'truk':
-            if area < 5000:
-                return 'mobil'
-            return 'truk'
-        
-        return cls_name
+        return validate_class_by_size(cls_name, width, height)
     
     def get_stable_class(self, status: dict) -> str:
         """Determine stable class using weighted voting"""
-        if status['frame_count'] < 3:
-            return None
-        
-        widths = list(status['width_history'])
-        heights = list(status['height_history'])
-        
-        if widths and heights:
-            avg_width = sum(widths) / len(widths)
-            avg_height = sum(heights) / len(heights)
-        else:
-            avg_width = 100
-            avg_height = 60
-        
-        weighted_votes = status['class_votes_weighted']
-        
-        if not weighted_votes:
-            return 'mobil'
-        
-        best_class = max(weighted_votes.items(), key=lambda x: x[1])[0]
-        validated_class = self.validate_class_by_size(best_class, avg_width, avg_height)
-        
-        return validated_class
+        return get_stable_class(status)
     
     def get_lane_by_direction(self, y_history: list, first_y: int = None, min_y: int = None, max_y: int = None) -> str:
         """Detect lane based on movement direction"""
-        if len(y_history) < 2:
-            return None
-        
-        y_list = list(y_history)
-        first_y_val = first_y if first_y is not None else y_list[0]
-        last_y = y_list[-1]
-        
-        if min_y is not None and max_y is not None and max_y > min_y:
-            if first_y_val < (min_y + max_y) / 2:
-                return 'kanan'
-            else:
-                return 'kiri'
-        
-        overall_diff = last_y - first_y_val
-        
-        if overall_diff < -10:
-            return 'kiri'
-        elif overall_diff > 10:
-            return 'kanan'
-        else:
-            return 'kiri' if overall_diff <= 0 else 'kanan'
+        return get_lane_by_direction(y_history, first_y, min_y, max_y)
     
     def check_crossing_with_catchup(self, status: dict, track_id: int, line_y: int, curr_y: int, 
                                      frame_count: int, counted_ids_set: set) -> tuple:
         """Enhanced crossing detection with catch-up mechanism"""
-        if track_id in counted_ids_set or status['counted']:
-            return False, None
-        
-        y_history = status['y_history']
-        if len(y_history) < MIN_DETECTION_FRAMES:
-            return False, None
-        
-        y_list = list(y_history)
-        first_y = status['first_y']
-        
-        # Track position relative to line
-        if curr_y < line_y:
-            status['was_above_line'] = True
-        if curr_y > line_y:
-            status['was_below_line'] = True
+        return check_crossing_with_catchup(status, track_id, line_y, curr_y, frame_count, counted_ids_set)
+    
+    def detect_tiles(self, frame: np.ndarray, tiles: list) -> np.ndarray:
+        """
+        Run batched YOLO inference on frame tiles and merge boxes across tiles
         
-        # Determine direction
-        direction = None
-        if len(y_list) >= 3:
-            movement = y_list[-1] - y_list[0]
-            if movement > MIN_TRACK_DISTANCE:
-                direction = 'kanan'
-            elif movement < -MIN_TRACK_DISTANCE:
-                direction = 'kiri'
+        Returns:
+            (N, 6) array of x1, y1, x2, y2, conf, cls in frame coordinates
+        """
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        tile_boxes = []
         
-        # METHOD 1: Direct crossing detection
-        for i in range(max(1, len(y_list) - 10), len(y_list)):
-            prev_y = y_list[i - 1]
-            curr = y_list[i]
+        for start in range(0, len(crops), TILE_BATCH_SIZE):
+            results = self.model.predict(crops[start:start + TILE_BATCH_SIZE], conf=CONF_THRESHOLD,
+                                         iou=IOU_THRESHOLD, imgsz=TILE_SIZE, verbose=False)
             
-            if prev_y < line_y and curr >= line_y:
-                return True, 'kanan'
-            if prev_y > line_y and curr <= line_y:
-                return True, 'kiri'
-        
-        # METHOD 2: Catch-up detection
-        if status['was_above_line'] and status['was_below_line']:
-            if not status['crossing_confirmed']:
-                status['crossing_confirmed'] = True
-                if first_y is not None:
-                    if curr_y > first_y:
-                        return True, 'kanan'
-                    else:
-                        return True, 'kiri'
-        
-        # METHOD 3: Catch-up zone
-        if direction == 'kanan' and status['was_above_line']:
-            if line_y < curr_y < (line_y + CATCH_UP_ZONE):
-                if first_y is not None and first_y < line_y:
-                    return True, 'kanan'
-        
-        if direction == 'kiri' and status['was_below_line']:
-            if (line_y - CATCH_UP_ZONE) < curr_y < line_y:
-                if first_y is not None and first_y > line_y:
-                    return True, 'kiri'
-        
-        return False, direction
+            for (x1, y1, _, _), result in zip(tiles[start:start + TILE_BATCH_SIZE], results):
+                if result.boxes is None or len(result.boxes) == 0:
+                    continue
+                data = result.boxes.data.cpu().numpy()[:, :6].copy()
+                data[:, [0, 2]] += x1
+                data[:, [1, 3]] += y1
+                tile_boxes.append(data)
+        
+        if not tile_boxes:
+            return np.empty((0, 6), dtype=np.float32)
+        
+        return merge_tile_detections(np.concatenate(tile_boxes))
     
     async def process_video(self, video_path: str, output_path: str, results_path: str, 
-                           progress_callback=None) -> dict:
+                           progress_callback=None, tiled: bool = None,
+                           auto_resolution: bool = None) -> dict:
         """
         Process video with YOLO detection and counting line
         
@@ -215,45 +222,20 @@ class YOLODetector:
             output_path: Path for output video
             results_path: Path for results JSON
             progress_callback: Async callback for progress updates
+            tiled: Run full-resolution tiled inference around the counting line
+                   instead of downscaling the whole frame (default: YOLO_CONFIG)
+            auto_resolution: Calibrate the processing width on a video sample
+                             before processing (default: YOLO_CONFIG)
         
         Returns:
             Detection results dictionary
         """
-        logger.info(f"🚀 Starting YOLO processing for {video_path}")
+        if tiled is None:
+            tiled = TILED_INFERENCE
+        if auto_resolution is None:
+            auto_resolution = AUTO_RESOLUTION
         
-        # Initialize counters
-        counters = {
-            'kiri': {'total': 0, 'mobil': 0, 'bus': 0, 'truk': 0},
-            'kanan': {'total': 0, 'mobil': 0, 'bus': 0, 'truk': 0}
-        }
-        vehicle_count_total = 0
-        counted_vehicle_ids = []
-        counted_ids_set = set()
-        
-        # Vehicle tracking
-        vehicle_status = defaultdict(lambda: {
-            'counted': False,
-            'y_history': deque(maxlen=MAX_TRACKING_FRAMES),
-            'x_history': deque(maxlen=MAX_TRACKING_FRAMES),
-            'width_history': deque(maxlen=MAX_TRACKING_FRAMES),
-            'height_history': deque(maxlen=MAX_TRACKING_FRAMES),
-            'conf_sum': 0.0,
-            'conf_count': 0,
-            'class_votes': defaultdict(int),
-            'class_votes_weighted': defaultdict(float),
-            'stable_class': None,
-            'lane': None,
-            'frame_count': 0,
-            'last_seen': 0,
-            'crossed_line': False,
-            'first_y': None,
-            'min_y': 9999,
-            'max_y': 0,
-            'passed_line_frame': None,
-            'was_above_line': False,
-            'was_below_line': False,
-            'crossing_confirmed': False
-        })
+        logger.info(f"🚀 Starting YOLO processing for {video_path}")
         
         # Open video
         cap = cv2.VideoCapture(video_path)
@@ -264,16 +246,43 @@ class YOLODetector:
         original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        # Calculate resize ratio
-        resize_ratio = min(1.0, 640 / original_width)
-        process_width = int(original_width * resize_ratio)
-        process_height = int(original_height * resize_ratio)
-        
         # Line position (60% from top)
         LINE_POSITION = int(original_height * 0.60)
         
+        # Tracking and counting state
+        counter = VehicleCounter(LINE_POSITION)
+        counters = counter.counters
+        vehicle_count_total = 0
+        
+        # Calculate resize ratio (tiled mode keeps native resolution)
+        tiles = []
+        tracker = None
+        calibration = None
+        track_kwargs = {}
+        if tiled:
+            resize_ratio = 1.0
+            tiles = compute_band_tiles(original_width, original_height,
+                                       LINE_POSITION - TILE_BAND_MARGIN, LINE_POSITION + TILE_BAND_MARGIN)
+            tracker = create_tracker(fps)
+        elif auto_resolution:
+            # Several timed inferences: keep them off the event loop
+            async with self._model_lock:
+                calibration = await asyncio.to_thread(
+                    calibrate_resolution, self.model, video_path, LINE_POSITION,
+                    predict_kwargs={'conf': CONF_THRESHOLD, 'iou': IOU_THRESHOLD}
+                )
+            resize_ratio = min(1.0, calibration['width'] / original_width)
+            track_kwargs['imgsz'] = calibration['imgsz']
+        else:
+            resize_ratio = min(1.0, 640 / original_width)
+        process_width = int(original_width * resize_ratio)
+        process_height = int(original_height * resize_ratio)
+        
         logger.info(f"📹 Video: {original_width}x{original_height} @ {fps:.1f}fps, {total_frames} frames")
-        logger.info(f"⚡ Processing at: {process_width}x{process_height}")
+        if tiled:
+            logger.info(f"🧩 Tiled inference: {len(tiles)} tiles of {TILE_SIZE}px around Y={LINE_POSITION}")
+        else:
+            logger.info(f"⚡ Processing at: {process_width}x{process_height}")
         
         # Setup video writer
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
@@ -287,6 +296,13 @@ class YOLODetector:
             'height': original_height,
             'vehicle_detections': [],
             'total_vehicles': 0,
+            'inference_mode': 'tiled' if tiled else 'resize',
+            'tiles': len(tiles),
+            'processing_resolution': {
+                'width': process_width,
+                'height': process_height,
+                'calibration': calibration
+            },
             'counting_data': {
                 'total_counted': 0,
                 'lane_kiri': counters['kiri'],
@@ -300,27 +316,63 @@ class YOLODetector:
         processing_start = time.time()
         last_boxes = []
         last_progress = 0
+        timer = StageTimer()
+        frames_metric = DETECTION_FRAMES.labels(pipeline='detector')
         
         while True:
+            t0 = time.perf_counter()
             ret, frame = cap.read()
+            timer.add('decode', time.perf_counter() - t0)
             if not ret:
                 break
             
             frame_count += 1
+            frames_metric.inc()
             should_process = (frame_count % FRAME_SKIP == 0) or (frame_count <= 3)
             
             h, w = frame.shape[:2]
             
-            if should_process:
-                # Resize for faster processing
-                if resize_ratio < 1.0:
-                    frame_small = cv2.resize(frame, (process_width, process_height), interpolation=cv2.INTER_LINEAR)
+            if should_process and tiled:
+                # Batched inference on band tiles, merged before tracking
+                async with self._model_lock:
+                    with timer.stage('inference'):
+                        detections = self.detect_tiles(frame, tiles)
+                
+                # Update on every processed frame, even without detections, so
+                # lost tracks age out instead of re-matching after long gaps
+                with timer.stage('tracking'):
+                    tracks = tracker.update(Boxes(detections, (h, w)), frame)
+                
+                if len(tracks):
+                    last_boxes = list(zip(
+                        tracks[:, :4],
+                        tracks[:, 4].astype(int),
+                        tracks[:, 6].astype(int),
+                        tracks[:, 5]
+                    ))
                 else:
-                    frame_small = frame
+                    last_boxes = []
+            
+            elif should_process:
+                # Resize for faster processing
+                with timer.stage('resize'):
+                    if resize_ratio < 1.0:
+                        frame_small = cv2.resize(frame, (process_width, process_height), interpolation=cv2.INTER_LINEAR)
+                    else:
+                        frame_small = frame
                 
                 # Run YOLO detection dengan botsort tracker (sama seperti count_video.py)
-                results = self.model.track(frame_small, persist=True, conf=CONF_THRESHOLD, 
-                                          iou=IOU_THRESHOLD, tracker=TRACKER_CONFIG, verbose=False)
+                async with self._model_lock:
+                    t0 = time.perf_counter()
+                    results = self.model.track(frame_small, persist=True, conf=CONF_THRESHOLD, 
+                                              iou=IOU_THRESHOLD, tracker=TRACKER_CONFIG, verbose=False,
+                                              **track_kwargs)
+                    track_time = time.perf_counter() - t0
+                
+                # Split model time (pre/inference/postprocess) from the tracker update
+                inference_time = min(track_time, sum((results[0].speed or {}).values()) / 1000)
+                timer.add('inference', inference_time)
+                timer.add('tracking', track_time - inference_time)
                 
                 if results[0].boxes is not None and results[0].boxes.id is not None:
                     last_boxes = list(zip(
@@ -355,9 +407,17 @@ class YOLODetector:
                             'kiri': counters['kiri']['total'],
                             'kanan': counters['kanan']['total']
                         },
-                        'eta': f'{eta_min}:{eta_sec:02d}'
+                        'eta': f'{eta_min}:{eta_sec:02d}',
+                        'stageTimings': timer.totals()
                     })
             
+            # Process detections
+            with timer.stage('counting'):
+                annotations = counter.update(last_boxes, frame_count)
+                vehicle_count_total = counter.total
+            
+            t0 = time.perf_counter()
+            
             # Draw counting line
             cv2.line(frame, (0, LINE_POSITION), (w, LINE_POSITION), (0, 0, 255), 4)
             
@@ -377,68 +437,12 @@ class YOLODetector:
             cv2.putText(frame, f'COUNTING LINE (Y={LINE_POSITION})', (w // 2 - 150, LINE_POSITION - 20),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
             
-            # Process detections
-            for box, track_id, cls_id, conf in last_boxes:
-                x1, y1, x2, y2 = map(int, box)
-                cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                box_width = x2 - x1
-                box_height = y2 - y1
-                
-                status = vehicle_status[track_id]
-                status['last_seen'] = frame_count
-                status['frame_count'] += 1
-                status['y_history'].append(cy)
-                status['x_history'].append(cx)
-                status['width_history'].append(box_width)
-                status['height_history'].append(box_height)
-                status['conf_sum'] += conf
-                status['conf_count'] += 1
-                
-                if status['first_y'] is None:
-                    status['first_y'] = cy
-                status['min_y'] = min(status['min_y'], cy)
-                status['max_y'] = max(status['max_y'], cy)
-                
-                # Get and validate class
-                raw_cls_name = CLASS_MAP.get(cls_id, 'mobil')
-                validated_cls = self.validate_class_by_size(raw_cls_name, box_width, box_height)
-                
-                status['class_votes'][validated_cls] += 1
-                status['class_votes_weighted'][validated_cls] += conf
-                
-                if status['frame_count'] >= 3:
-                    status['stable_class'] = self.get_stable_class(status)
-                else:
-                    status['stable_class'] = validated_cls
-                
-                # Detect lane
-                detected_lane = self.get_lane_by_direction(status['y_history'], status['first_y'], 
-                                                          status['min_y'], status['max_y'])
-                if detected_lane:
-                    status['lane'] = detected_lane
-                
-                # Check crossing
-                if not status['counted'] and status['frame_count'] >= MIN_DETECTION_FRAMES:
-                    is_crossing, lane = self.check_crossing_with_catchup(
-                        status, track_id, LINE_POSITION, cy, frame_count, counted_ids_set
-                    )
-                    
-                    if is_crossing and lane:
-                        if track_id not in counted_ids_set:
-                            status['counted'] = True
-                            status['lane'] = lane
-                            counted_ids_set.add(track_id)
-                            
-                            final_class = self.get_stable_class(status) or status['stable_class']
-                            counters[lane]['total'] += 1
-                            counters[lane][final_class] += 1
-                            vehicle_count_total += 1
-                            counted_vehicle_ids.append(int(track_id))
-                            
-                            # Draw counted indicator
-                            cv2.circle(frame, (cx, cy), 35, (0, 255, 0), -1)
-                            cv2.putText(frame, f"#{vehicle_count_total}", (cx - 15, cy + 5),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+            for x1, y1, x2, y2, cx, cy, track_id, status, count_number in annotations:
+                if count_number is not None:
+                    # Draw counted indicator
+                    cv2.circle(frame, (cx, cy), 35, (0, 255, 0), -1)
+                    cv2.putText(frame, f"#{count_number}", (cx - 15, cy + 5),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
                 
                 # Draw bounding box
                 current_lane = status['lane'] or 'unknown'
@@ -471,13 +475,17 @@ class YOLODetector:
                 cv2.putText(frame, f"{ln.upper()}: {c['total']} (M:{c['mobil']} B:{c['bus']} T:{c['truk']})",
                            (10, y0), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
             
-            out.write(frame)
+            timer.add('drawing', time.perf_counter() - t0)
+            
+            with timer.stage('encoding'):
+                out.write(frame)
         
         cap.release()
         out.release()
         
         processing_time = time.time() - processing_start
         avg_fps = frame_count / processing_time if processing_time > 0 else 0
+        DETECTION_FPS.labels(pipeline='detector').set(avg_fps)
         
         logger.info(f"✅ COMPLETED in {processing_time:.1f}s ({avg_fps:.1f} fps)")
         logger.info(f"🚗 Total vehicles counted: {vehicle_count_total}")
@@ -488,7 +496,7 @@ class YOLODetector:
             'lane_kiri': counters['kiri'],
             'lane_kanan': counters['kanan'],
             'line_position': LINE_POSITION,
-            'counted_vehicle_ids': counted_vehicle_ids,
+            'counted_vehicle_ids': counter.counted_vehicle_ids,
             'processing_fps': avg_fps,
             'processing_time': processing_time
         }
@@ -497,6 +505,8 @@ class YOLODetector:
         results_data['status'] = 'completed'
         results_data['processing_time'] = processing_time
         results_data['frame_count'] = frame_count
+        results_data['processing_resolution']['fps'] = avg_fps
+        results_data['stage_timings'] = timer.summary()
         
         # Save results
         with open(results_path, 'w') as f:
@@ -0,0 +1,154 @@
+"""
+In-process Caches
+Bounded LRU with optional per-entry expiry, and a tagged response cache
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count; `ttl` in seconds (None = no expiry)"""
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def peek(self, key) -> bool:
+        """True if the key is present (expired or not), without touching LRU order or stats"""
+        return key in self._entries
+
+    def pop(self, key, default: Any = None) -> Any:
+        entry = self._entries.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class ResponseCache:
+    """
+    Cache for computed endpoint responses
+
+    Entries are keyed by endpoint, scope (a user ID or "global") and query
+    parameters, expire after a per-endpoint TTL and carry tags such as
+    "perhitungan" or "users"; writes call invalidate(tag) to drop every entry
+    derived from that data. Concurrent misses for one key share a single
+    computation.
+    """
+
+    def __init__(self, max_size: int = 512, default_ttl: float = 30, ttls: dict = None, on_lookup=None):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.on_lookup = on_lookup  # callback(endpoint, hit: bool)
+        self._entries = LRUCache(max_size)
+        self._tags = {}     # tag -> keys of entries carrying it
+        self._pending = {}  # key -> (future, tags) of an in-flight computation
+
+    @staticmethod
+    def make_key(endpoint: str, scope: str = "global", params: dict = None) -> tuple:
+        return (endpoint, str(scope), tuple(sorted((params or {}).items())))
+
+    async def get_or_compute(self, endpoint: str, compute, scope: str = "global",
+                             params: dict = None, tags: tuple = ()):
+        """Return the cached response or await compute() and cache its result"""
+        key = self.make_key(endpoint, scope, params)
+        cached = self._entries.get(key, _MISSING)
+        if cached is not _MISSING:
+            self._record(endpoint, True)
+            return cached
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self._record(endpoint, True)
+            return await asyncio.shield(pending[0])
+
+        self._record(endpoint, False)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = (future, tags)
+        try:
+            value = await compute()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved, even when nobody else was waiting
+            raise
+        else:
+            future.set_result(value)
+            # Not stored when an invalidation ran while computing
+            if key in self._pending:
+                self._store(key, value, endpoint, tags)
+            return value
+        finally:
+            pending = self._pending.get(key)
+            if pending is not None and pending[0] is future:
+                del self._pending[key]
+
+    def _store(self, key, value, endpoint: str, tags: tuple):
+        self._entries.set(key, value, ttl=self.ttls.get(endpoint, self.default_ttl))
+        for tag in tags:
+            keys = self._tags.setdefault(tag, set())
+            keys.add(key)
+            if len(keys) > 2 * self.max_size:
+                # Forget keys the LRU already evicted
+                self._tags[tag] = {k for k in keys if self._entries.peek(k)}
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every entry (and in-flight computation) carrying any of the tags"""
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                if self._entries.pop(key, _MISSING) is not _MISSING:
+                    removed += 1
+            for key in [key for key, (_, pending_tags) in self._pending.items() if tag in pending_tags]:
+                del self._pending[key]
+        return removed
+
+    def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+        self._pending.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _record(self, endpoint: str, hit: bool):
+        if self.on_lookup is not None:
+            self.on_lookup(endpoint, hit)
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from app.utils.logger import logger
+from app.config.constants import PROGRESS_CONFIG
 
 SECRET_KEY = os.getenv("JWT_SECRET", "your-super-secret-key-change-in-production")
 ALGORITHM = "HS256"
@@ -34,6 +35,29 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def generate_stream_token(user_id: str, tracking_id: str) -> str:
+    """
+    Short-lived token for one job's progress stream (EventSource cannot send headers)
+    Uses `sub` instead of `id` so it is never accepted as a login token.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=PROGRESS_CONFIG['STREAM_TOKEN_TTL'])
+    to_encode = {
+        "sub": str(user_id),
+        "scope": "stream",
+        "job": tracking_id,
+        "exp": expire
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def verify_stream_token(token: str, tracking_id: str) -> Optional[str]:
+    """Return the user_id of a stream token issued for `tracking_id`"""
+    payload = verify_token(token)
+    if not payload or payload.get("scope") != "stream" or payload.get("job") != tracking_id:
+        return None
+    return payload.get("sub")
+
+
 def decode_token(token: str) -> Optional[str]:
     """Decode token and return user_id"""
     payload = verify_token(token)
@@ -0,0 +1,288 @@
+"""
+Metrics Utility - In-memory counters exposed in Prometheus text format
+Intentionally dependency-free; scraping only renders a few dicts
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+
+try:
+    from pymongo import monitoring
+except ImportError:  # pragma: no cover - pymongo is a hard dependency in production
+    monitoring = None
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPLOAD_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """Get (or create) the child for a label combination"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function):
+        """Compute the value at scrape time instead of storing it"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}']
+
+
+class Gauge(Counter):
+    """Value that can go up and down, or be computed at scrape time"""
+    kind = 'gauge'
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _HistogramValue:
+    __slots__ = ('upper_bounds', 'counts', 'sum')
+
+    def __init__(self, upper_bounds: tuple):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('target', 'start')
+
+    def __init__(self, target):
+        self.target = target
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.target.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, key, child):
+        lines = []
+        labelnames = self.labelnames + ('le',)
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), list(child.counts)):
+            cumulative += count
+            labels = _format_labels(labelnames, key + (_format_value(bound),))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(child.sum)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Holds metrics and renders the text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# =============================================================================
+# Application metrics
+# =============================================================================
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status')
+))
+DETECTION_JOBS = registry.register(Gauge(
+    'detection_jobs', 'Detection jobs by state (queued, running)', ('state',)
+))
+DETECTION_FRAMES = registry.register(Counter(
+    'detection_frames_processed_total', 'Video frames processed by the detection pipeline', ('pipeline',)
+))
+DETECTION_FPS = registry.register(Gauge(
+    'detection_processing_fps', 'Frames per second of the most recently finished job', ('pipeline',)
+))
+MODEL_LOAD_SECONDS = registry.register(Gauge(
+    'model_load_seconds', 'Duration of the last YOLO model load', ('pipeline',)
+))
+MONGO_OPERATION_DURATION = registry.register(Histogram(
+    'mongodb_operation_duration_seconds', 'MongoDB command latency', ('command', 'outcome')
+))
+CLOUDINARY_UPLOAD_DURATION = registry.register(Histogram(
+    'cloudinary_upload_duration_seconds', 'Cloudinary upload duration', ('outcome',),
+    buckets=UPLOAD_BUCKETS
+))
+RESPONSE_CACHE_REQUESTS = registry.register(Counter(
+    'response_cache_requests_total', 'Response cache lookups by endpoint (hit, miss)', ('endpoint', 'result')
+))
+RESPONSE_CACHE_ENTRIES = registry.register(Gauge(
+    'response_cache_entries', 'Responses currently cached'
+))
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route template keeps label cardinality bounded (no raw IDs)
+            route = scope.get('route')
+            path = getattr(route, 'path', None) or 'unmatched'
+            HTTP_REQUEST_DURATION.labels(
+                method=scope.get('method', ''), route=path, status=status['code']
+            ).observe(time.perf_counter() - start)
+
+
+if monitoring is not None:
+    class MongoCommandMetrics(monitoring.CommandListener):
+        """pymongo command listener feeding MONGO_OPERATION_DURATION"""
+
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            MONGO_OPERATION_DURATION.labels(command=event.command_name, outcome='success').observe(
+                event.duration_micros / 1e6
+            )
+
+        def failed(self, event):
+            MONGO_OPERATION_DURATION.labels(command=event.command_name, outcome='failure').observe(
+                event.duration_micros / 1e6
+            )
@@ -0,0 +1,105 @@
+"""
+Pagination Utilities
+Keyset (cursor) pagination on (sort field, _id) with opaque continuation
+tokens; page numbers remain supported for existing clients
+"""
+
+import json
+import base64
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"d": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"o": str(value)}
+    return {"v": value}
+
+
+def _decode_value(data: dict):
+    if "d" in data:
+        return datetime.fromisoformat(data["d"])
+    if "o" in data:
+        return ObjectId(data["o"])
+    return data["v"]
+
+
+def encode_cursor(sort_value, last_id) -> str:
+    """Opaque token pointing just after (sort_value, last_id)"""
+    payload = json.dumps([_encode_value(sort_value), _encode_value(last_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple:
+    """Inverse of encode_cursor; raises ValueError for malformed tokens"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _decode_value(sort_value), _decode_value(last_id)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+
+def keyset_filter(sort_field: str, sort_value, last_id) -> dict:
+    """Documents after (sort_value, last_id) in (sort_field desc, _id desc) order"""
+    return {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, "_id": {"$lt": last_id}}
+    ]}
+
+
+async def paginate(collection, query: dict, limit: int, page: int = 1, cursor: Optional[str] = None,
+                   sort_field: str = "createdAt", projection: dict = None,
+                   include_total: Optional[bool] = None) -> dict:
+    """
+    Newest-first page of `query`
+
+    With `cursor` the page starts after the token (no skip, index-only seek);
+    otherwise `page` is used with skip for compatibility. Totals are counted
+    for page requests and only on request (`include_total`) for cursor ones;
+    an unfiltered query uses the collection's estimated count.
+
+    Returns {"items", "next_cursor", "has_more", "total"}.
+    """
+    find_query = query
+    skip = (page - 1) * limit
+    if cursor:
+        try:
+            sort_value, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail={"success": False, "message": "Cursor tidak valid"})
+        seek = keyset_filter(sort_field, sort_value, last_id)
+        find_query = {"$and": [query, seek]} if query else seek
+        skip = 0
+
+    if include_total is None:
+        include_total = not cursor
+
+    find = collection.find(find_query, projection).sort([(sort_field, -1), ("_id", -1)])
+    if skip:
+        find = find.skip(skip)
+    find = find.limit(limit + 1)  # one extra row tells whether another page exists
+
+    async def count():
+        if not include_total:
+            return None
+        if not query:
+            return await collection.estimated_document_count()
+        return await collection.count_documents(query)
+
+    items, total = await asyncio.gather(find.to_list(length=limit + 1), count())
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+
+    return {"items": items, "next_cursor": next_cursor, "has_more": has_more, "total": total}
@@ -1,15 +1,27 @@
 """
 Password Hashing Utilities
 Using bcrypt directly for compatibility
+Async variants run on a small dedicated pool so hashing never blocks the event loop
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
+from app.config.constants import PASSWORD_CONFIG
+
+# bcrypt releases the GIL, so these threads hash in parallel with request handling
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_CONFIG['MAX_WORKERS'],
+    thread_name_prefix="bcrypt"
+)
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=PASSWORD_CONFIG['BCRYPT_ROUNDS'])
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -22,3 +34,24 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return bcrypt.checkpw(password_bytes, hashed_bytes)
     except Exception:
         return False
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if a hash uses another variant or cost factor than configured"""
+    try:
+        _, variant, rounds, _ = hashed_password.split('$', 3)
+        return variant != '2b' or int(rounds) != PASSWORD_CONFIG['BCRYPT_ROUNDS']
+    except (AttributeError, ValueError):
+        return False
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the bcrypt pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
@@ -0,0 +1,73 @@
+"""
+Pipeline Stage Timing
+Cumulative and percentile timings per processing stage
+"""
+
+import random
+import time
+from contextlib import contextmanager
+
+# Samples kept per stage for percentiles (reservoir sampling beyond this)
+RESERVOIR_SIZE = 2048
+
+
+class StageTimer:
+    """Collects per-stage durations with bounded memory"""
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.reservoir_size = reservoir_size
+        self._rng = random.Random(seed)
+        self._stages = {}
+
+    def add(self, stage: str, seconds: float):
+        """Record one duration (seconds) for a stage"""
+        entry = self._stages.get(stage)
+        if entry is None:
+            entry = self._stages[stage] = {'count': 0, 'total': 0.0, 'max': 0.0, 'samples': []}
+
+        entry['count'] += 1
+        entry['total'] += seconds
+        if seconds > entry['max']:
+            entry['max'] = seconds
+
+        samples = entry['samples']
+        if len(samples) < self.reservoir_size:
+            samples.append(seconds)
+        else:
+            slot = self._rng.randrange(entry['count'])
+            if slot < self.reservoir_size:
+                samples[slot] = seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block: `with timer.stage('inference'): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        """Per-stage count, total, mean and p50/p90/p99/max in milliseconds"""
+        result = {}
+        for stage, entry in self._stages.items():
+            ordered = sorted(entry['samples'])
+            n = len(ordered)
+
+            def pick(q):
+                return ordered[min(n - 1, int(q * n))] * 1000
+
+            result[stage] = {
+                'count': entry['count'],
+                'total_ms': round(entry['total'] * 1000, 2),
+                'mean_ms': round(entry['total'] / entry['count'] * 1000, 3),
+                'p50_ms': round(pick(0.50), 3),
+                'p90_ms': round(pick(0.90), 3),
+                'p99_ms': round(pick(0.99), 3),
+                'max_ms': round(entry['max'] * 1000, 3),
+            }
+        return result
+
+    def totals(self) -> dict:
+        """Cumulative seconds per stage (cheap, for progress payloads)"""
+        return {stage: round(entry['total'], 3) for stage, entry in self._stages.items()}
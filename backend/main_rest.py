@@ -16,13 +16,16 @@ load_dotenv()
 
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config.database import connect_db, close_db
 from app.config.cloudinary import test_cloudinary_connection
-from app.routes import auth, admin, histori, dashboard, perhitungan, dashboard_backend, status_dashboard
+from app.routes import auth, admin, histori, dashboard, perhitungan, dashboard_backend, status_dashboard, media
 from app.routes.deteksi_rest import router as deteksi_router  # Use REST-only routes
+from app.services.upload_sessions import upload_session_manager
 from app.utils.logger import logger
+from app.utils.metrics import MetricsMiddleware, render_metrics
 
 
 # Lifespan handler
@@ -39,6 +42,9 @@ async def lifespan(app: FastAPI):
         os.makedirs("/tmp/temp", exist_ok=True)
         os.makedirs("/tmp/models", exist_ok=True)
         
+        # Abandoned resumable uploads are swept even when no new upload starts
+        app.state.upload_cleanup = asyncio.create_task(upload_session_manager.run_cleanup())
+        
         logger.info("✅ Server startup complete!")
         
     except Exception as e:
@@ -48,6 +54,9 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("🛑 Shutting down server...")
+    cleanup_task = getattr(app.state, "upload_cleanup", None)
+    if cleanup_task is not None:
+        cleanup_task.cancel()
     await close_db()
     logger.info("👋 Server shutdown complete!")
 
@@ -79,6 +88,8 @@ app.add_middleware(
     expose_headers=["Content-Length", "Content-Range", "X-Total-Count"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 logger.info("🌐 CORS configured for Vercel + localhost")
 
 
@@ -94,10 +105,12 @@ async def root():
         "mode": "REST-only (no WebSocket)",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "api": "/api",
             "docs": "/docs",
             "upload": "/api/deteksi/upload",
-            "status": "/api/deteksi/status/{tracking_id}"
+            "status": "/api/deteksi/status/{tracking_id}",
+            "events": "/api/deteksi/events/{tracking_id}"
         },
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
@@ -119,13 +132,15 @@ async def health_check():
         
         from app.services.video_detection_rest import video_detection_rest_service
         model_status = "✅ Loaded" if video_detection_rest_service.model else "⏳ Not Loaded (lazy)"
+        status_store = video_detection_rest_service.processing_tasks.stats()
         
         return {
             "status": "healthy",
             "timestamp": datetime.datetime.utcnow().isoformat(),
             "database": db_status,
             "yolo_model": model_status,
-            "active_processing": len(video_detection_rest_service.processing_tasks),
+            "active_processing": status_store["active"],
+            "status_store": status_store,
             "mode": "REST-only"
         }
         
@@ -137,6 +152,12 @@ async def health_check():
         }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api")
 async def api_info():
     """API information"""
@@ -150,12 +171,13 @@ async def api_info():
             "deteksi": "/api/deteksi",
             "histori": "/api/histori",
             "dashboard": "/api/dashboard",
-            "perhitungan": "/api/perhitungan"
+            "perhitungan": "/api/perhitungan",
+            "media": "/api/media"
         },
         "notes": {
             "detection_flow": [
                 "1. POST /api/deteksi/upload - Upload video, get tracking_id",
-                "2. GET /api/deteksi/status/{tracking_id} - Poll every 2s for progress",
+                "2. GET /api/deteksi/events/{tracking_id}?token=... - SSE progress stream (or poll /status)",
                 "3. Status will be: queued → processing → uploading → completed",
                 "4. When status=completed, result contains processed video URL"
             ]
@@ -171,6 +193,7 @@ try:
     app.include_router(histori.router, prefix="/api/histori", tags=["History"])
     app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
     app.include_router(perhitungan.router, prefix="/api/perhitungan", tags=["Calculation"])
+    app.include_router(media.router, prefix="/api/media", tags=["Media"])
     app.include_router(dashboard_backend.router, tags=["Backend Info"])
     app.include_router(status_dashboard.router, tags=["System Status"])
     logger.info("✅ All API routes registered")
@@ -0,0 +1,262 @@
+"""
+Microbenchmark for the tracking/counting layer (no model involved)
+Run: python scripts/benchmark_counting.py --tracks 2000 --frames 300
+
+Feeds synthetic (or recorded) track streams straight into
+app.services.vehicle_counter.VehicleCounter and reports per-frame cost and
+allocations as JSON, so counting optimizations can be measured on their own.
+
+Recorded streams are JSON lines, one frame per line:
+    {"frame": 1, "boxes": [[x1, y1, x2, y2, track_id, cls_id, conf], ...]}
+Use --save to write the synthetic stream in this format for later replay.
+"""
+
+import argparse
+import cProfile
+import gc
+import io
+import json
+import os
+import platform
+import pstats
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.vehicle_counter import VehicleCounter
+
+LINE_RATIO = 0.60
+
+
+def synthetic_stream(tracks: int, frames: int, width: int, height: int, seed: int) -> list:
+    """
+    Build a deterministic stream with roughly `tracks` concurrent tracks
+
+    Each track drives vertically across the counting line for a random
+    lifetime; when it ends a new track ID replaces it, so concurrency stays
+    constant and new IDs keep arriving like on a busy road.
+    """
+    rng = random.Random(seed)
+    next_id = 0
+    active = []
+    stream = []
+
+    def spawn(start_frame):
+        nonlocal next_id
+        next_id += 1
+        down = rng.random() < 0.5
+        w = rng.uniform(40, 220)
+        h = w * rng.uniform(0.5, 1.1)
+        speed = rng.uniform(4, 18) * (1 if down else -1)
+        lifetime = rng.randint(20, 120)
+        # Start so the midpoint of the lifetime is close to the line
+        line_y = height * LINE_RATIO
+        y0 = line_y - speed * lifetime / 2 + rng.uniform(-40, 40)
+        return {
+            'id': next_id,
+            'x': rng.uniform(0, width - w),
+            'y0': y0,
+            'w': w,
+            'h': h,
+            'speed': speed,
+            'start': start_frame,
+            'end': start_frame + lifetime,
+            'cls': rng.choices([0, 1, 2], weights=[6, 2, 2])[0],
+            'conf': rng.uniform(0.25, 0.95),
+        }
+
+    for _ in range(tracks):
+        track = spawn(0)
+        # Stagger initial tracks so they don't all end together
+        offset = rng.randint(0, track['end'] - track['start'] - 1)
+        track['start'] -= offset
+        track['end'] -= offset
+        active.append(track)
+
+    for frame in range(1, frames + 1):
+        boxes = []
+        for index, track in enumerate(active):
+            if frame >= track['end']:
+                track = spawn(frame)
+                active[index] = track
+            cy = track['y0'] + track['speed'] * (frame - track['start'])
+            x1, y1 = track['x'], cy - track['h'] / 2
+            boxes.append(((x1, y1, x1 + track['w'], y1 + track['h']), track['id'], track['cls'], track['conf']))
+        stream.append(boxes)
+
+    return stream
+
+
+def load_stream(path: str) -> list:
+    """Load a recorded JSON lines stream"""
+    stream = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            stream.append([
+                ((x1, y1, x2, y2), int(track_id), int(cls_id), float(conf))
+                for x1, y1, x2, y2, track_id, cls_id, conf in record['boxes']
+            ])
+    return stream
+
+
+def save_stream(stream: list, path: str):
+    with open(path, 'w') as f:
+        for frame, boxes in enumerate(stream, start=1):
+            f.write(json.dumps({
+                'frame': frame,
+                'boxes': [[round(v, 2) for v in box] + [track_id, cls_id, round(conf, 4)]
+                          for box, track_id, cls_id, conf in boxes]
+            }) + '\n')
+
+
+def percentiles(samples: list) -> dict:
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def pick(q):
+        return ordered[min(n - 1, int(q * n))]
+
+    return {
+        'mean': sum(ordered) / n,
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p99': pick(0.99),
+        'max': ordered[-1],
+    }
+
+
+def run_timing(stream: list, line_y: int, warmup: int) -> dict:
+    """Per-frame wall time, GC disabled to keep collector pauses out of the numbers"""
+    counter = VehicleCounter(line_y)
+    samples = []
+    boxes_total = 0
+
+    gc.collect()
+    gc.disable()
+    try:
+        for frame, boxes in enumerate(stream, start=1):
+            start = time.perf_counter()
+            counter.update(boxes, frame)
+            elapsed = time.perf_counter() - start
+            if frame > warmup:
+                samples.append(elapsed)
+                boxes_total += len(boxes)
+    finally:
+        gc.enable()
+
+    stats = percentiles(samples)
+    return {
+        'frames': len(samples),
+        'boxes': boxes_total,
+        'per_frame_ms': {k: round(v * 1000, 4) for k, v in stats.items()},
+        'per_box_us': round(sum(samples) / max(boxes_total, 1) * 1e6, 3),
+        'counted': counter.total,
+        'tracked_ids': len(counter.vehicle_status),
+    }
+
+
+def run_allocations(stream: list, line_y: int) -> dict:
+    """Per-frame allocation profile using tracemalloc (separate pass, tracing is slow)"""
+    counter = VehicleCounter(line_y)
+    net_bytes = []
+    peak_bytes = []
+    blocks = []
+
+    tracemalloc.start()
+    try:
+        for frame, boxes in enumerate(stream, start=1):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            blocks_before = sys.getallocatedblocks()
+            counter.update(boxes, frame)
+            after, peak = tracemalloc.get_traced_memory()
+            blocks.append(sys.getallocatedblocks() - blocks_before)
+            net_bytes.append(after - before)
+            peak_bytes.append(peak - before)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'net_bytes_per_frame': {k: round(v, 1) for k, v in percentiles(net_bytes).items()},
+        'peak_bytes_per_frame': {k: round(v, 1) for k, v in percentiles(peak_bytes).items()},
+        'net_blocks_per_frame': {k: round(v, 1) for k, v in percentiles(blocks).items()},
+        'retained_state_mb': round(retained / (1024 * 1024), 2),
+    }
+
+
+def run_profile(stream: list, line_y: int, top: int = 15) -> str:
+    counter = VehicleCounter(line_y)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for frame, boxes in enumerate(stream, start=1):
+        counter.update(boxes, frame)
+    profiler.disable()
+
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(top)
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=2000, help='Concurrent tracks per frame')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--warmup', type=int, default=10, help='Frames excluded from timing')
+    parser.add_argument('--input', default=None, help='Replay a recorded JSON lines stream')
+    parser.add_argument('--save', default=None, help='Write the synthetic stream to this path')
+    parser.add_argument('--no-alloc', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--profile', action='store_true', help='Print a cProfile breakdown to stderr')
+    parser.add_argument('--output', default=None, help='Write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    if args.input:
+        stream = load_stream(args.input)
+        source = {'type': 'recorded', 'path': args.input}
+    else:
+        stream = synthetic_stream(args.tracks, args.frames, args.width, args.height, args.seed)
+        source = {'type': 'synthetic', 'tracks': args.tracks, 'seed': args.seed}
+        if args.save:
+            save_stream(stream, args.save)
+
+    line_y = int(args.height * LINE_RATIO)
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'source': source,
+            'frames': len(stream),
+            'line_position': line_y,
+        },
+        'timing': run_timing(stream, line_y, args.warmup),
+    }
+
+    if not args.no_alloc:
+        report['allocations'] = run_allocations(stream, line_y)
+
+    if args.profile:
+        print(run_profile(stream, line_y), file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f'✅ Results written to {args.output}', file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,453 @@
+"""
+End-to-end detection pipeline benchmark on synthetic traffic videos
+Run: python scripts/benchmark_pipeline.py --output bench.json
+
+Generates a deterministic synthetic video (vehicle-like rectangles crossing
+the counting line at known frames), then runs YOLODetector.process_video and
+VideoDetectionRestService.process_video_async under several settings. Every
+scenario runs in its own process so peak RSS is measured per scenario.
+Results (fps, latency percentiles, peak RSS, count accuracy) are printed as
+JSON so runs can be compared between commits.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+LINE_RATIO = 0.60  # Same counting line as YOLODetector (60% from top)
+
+VEHICLE_SIZES = {
+    'mobil': (0.07, 0.10),
+    'bus': (0.10, 0.22),
+    'truk': (0.09, 0.18),
+}
+
+VEHICLE_COLORS = [(200, 200, 200), (40, 40, 160), (30, 120, 200), (20, 20, 20), (160, 60, 30)]
+
+SCENARIOS = {
+    'detector-resize': {'pipeline': 'detector', 'tiled': False, 'auto_resolution': False},
+    'detector-tiled': {'pipeline': 'detector', 'tiled': True, 'auto_resolution': False},
+    'detector-auto-resolution': {'pipeline': 'detector', 'tiled': False, 'auto_resolution': True},
+    'rest-default': {'pipeline': 'rest', 'auto_resolution': False},
+    'rest-auto-resolution': {'pipeline': 'rest', 'auto_resolution': True},
+}
+
+
+# =============================================================================
+# Synthetic video
+# =============================================================================
+
+def plan_vehicles(width: int, height: int, fps: float, duration: float, count: int, seed: int) -> list:
+    """Deterministic vehicle schedule with the frame each one crosses the line"""
+    rng = random.Random(seed)
+    total_frames = int(duration * fps)
+    line_y = int(height * LINE_RATIO)
+    vehicles = []
+
+    for vehicle_id in range(count):
+        cls = rng.choices(['mobil', 'bus', 'truk'], weights=[6, 2, 2])[0]
+        w_ratio, h_ratio = VEHICLE_SIZES[cls]
+        box_w, box_h = int(width * w_ratio), int(height * h_ratio)
+        lane = rng.choice(['kiri', 'kanan'])
+        speed = rng.uniform(0.006, 0.012) * height  # px per frame
+
+        # kanan moves down (top -> bottom), kiri moves up, like the counting logic
+        lane_x_min, lane_x_max = (0.05, 0.45) if lane == 'kiri' else (0.55, 0.95)
+        x = int(rng.uniform(lane_x_min, lane_x_max) * width - box_w / 2)
+        start_y = -box_h / 2 if lane == 'kanan' else height + box_h / 2
+
+        # Spread crossings over the video, leaving room to enter and exit
+        travel = abs(line_y - start_y) / speed
+        cross_frame = int(rng.uniform(0.1, 0.85) * total_frames)
+        spawn_frame = int(cross_frame - travel)
+
+        vehicles.append({
+            'id': vehicle_id,
+            'class': cls,
+            'lane': lane,
+            'x': max(0, x),
+            'w': box_w,
+            'h': box_h,
+            'speed': speed if lane == 'kanan' else -speed,
+            'start_y': start_y,
+            'spawn_frame': spawn_frame,
+            'cross_frame': cross_frame,
+            'color': VEHICLE_COLORS[vehicle_id % len(VEHICLE_COLORS)],
+        })
+
+    return vehicles
+
+
+def _draw_vehicle(frame: np.ndarray, x: int, cy: float, vehicle: dict):
+    w, h = vehicle['w'], vehicle['h']
+    y1, y2 = int(cy - h / 2), int(cy + h / 2)
+    cv2.rectangle(frame, (x, y1), (x + w, y2), vehicle['color'], -1)
+    # Windshield and roof so the shape looks vehicle-like from above
+    cv2.rectangle(frame, (x + w // 8, y1 + h // 8), (x + w - w // 8, y1 + h // 3), (60, 50, 40), -1)
+    cv2.rectangle(frame, (x + w // 8, y2 - h // 4), (x + w - w // 8, y2 - h // 10), (60, 50, 40), -1)
+    cv2.rectangle(frame, (x, y1), (x + w, y2), (10, 10, 10), 2)
+
+
+def generate_synthetic_video(path: str, width: int, height: int, fps: float, duration: float,
+                             vehicles: list) -> int:
+    """Render the vehicle schedule to an MP4 file, returns frame count"""
+    total_frames = int(duration * fps)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+
+    background = np.full((height, width, 3), 70, dtype=np.uint8)
+    cv2.line(background, (width // 2, 0), (width // 2, height), (0, 200, 230), 6)
+    for lane_x in (width // 4, 3 * width // 4):
+        for y in range(0, height, 80):
+            cv2.line(background, (lane_x, y), (lane_x, y + 40), (230, 230, 230), 3)
+
+    for frame_index in range(total_frames):
+        frame = background.copy()
+        for vehicle in vehicles:
+            elapsed = frame_index - vehicle['spawn_frame']
+            if elapsed < 0:
+                continue
+            cy = vehicle['start_y'] + vehicle['speed'] * elapsed
+            if -vehicle['h'] < cy < height + vehicle['h']:
+                _draw_vehicle(frame, vehicle['x'], cy, vehicle)
+        writer.write(frame)
+
+    writer.release()
+    return total_frames
+
+
+def expected_counts(vehicles: list, total_frames: int) -> dict:
+    """Ground truth for vehicles that cross the line inside the video"""
+    counts = {'kiri': 0, 'kanan': 0}
+    for vehicle in vehicles:
+        if 0 <= vehicle['cross_frame'] < total_frames:
+            counts[vehicle['lane']] += 1
+    counts['total'] = counts['kiri'] + counts['kanan']
+    return counts
+
+
+# =============================================================================
+# Measurement helpers
+# =============================================================================
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1000
+    return {
+        'count': len(samples),
+        'total_ms': round(float(values.sum()), 2),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p90_ms': round(float(np.percentile(values, 90)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+class TimedModel:
+    """Proxy around an ultralytics model that records inference call latency"""
+
+    def __init__(self, model, samples: list):
+        self._model = model
+        self._samples = samples
+
+    def _timed(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._samples.append(time.perf_counter() - start)
+
+    def __call__(self, *args, **kwargs):
+        return self._timed(self._model, *args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        return self._timed(self._model.track, *args, **kwargs)
+
+    def predict(self, *args, **kwargs):
+        return self._timed(self._model.predict, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class MemoryCollection:
+    """In-memory stand-in for a Motor collection so the REST pipeline runs without MongoDB"""
+
+    def __init__(self):
+        self.documents = {}
+
+    async def insert_one(self, document: dict):
+        self.documents[document.get('_id')] = document
+
+    async def find_one(self, query: dict, *args, **kwargs):
+        return self.documents.get(query.get('_id'))
+
+    async def update_one(self, query: dict, update: dict, *args, **kwargs):
+        document = self.documents.get(query.get('_id'))
+        if document is not None:
+            document.update(update.get('$set', {}))
+
+
+def count_accuracy(counted: dict, expected: dict) -> dict:
+    accuracy = {}
+    for key in ('kiri', 'kanan', 'total'):
+        if expected[key] == 0:
+            accuracy[key] = 1.0 if counted.get(key, 0) == 0 else 0.0
+        else:
+            accuracy[key] = round(max(0.0, 1 - abs(counted.get(key, 0) - expected[key]) / expected[key]), 4)
+    return accuracy
+
+
+# =============================================================================
+# Scenarios (each runs in a child process)
+# =============================================================================
+
+async def _run_detector(settings: dict, video_path: str, workdir: str, model_path: str, inference: list) -> dict:
+    from app.services.yolo_detector import YOLODetector
+
+    load_start = time.perf_counter()
+    detector = YOLODetector(model_path)
+    model_load_time = time.perf_counter() - load_start
+    detector.model = TimedModel(detector.model, inference)
+
+    start = time.perf_counter()
+    results = await detector.process_video(
+        video_path,
+        os.path.join(workdir, 'detector_out.mp4'),
+        os.path.join(workdir, 'detector_results.json'),
+        tiled=settings['tiled'],
+        auto_resolution=settings['auto_resolution']
+    )
+    wall_time = time.perf_counter() - start
+
+    counting = results['counting_data']
+    return {
+        'model_load_time': round(model_load_time, 3),
+        'wall_time': round(wall_time, 3),
+        'frames': results['frame_count'],
+        'counted': {
+            'kiri': counting['lane_kiri']['total'],
+            'kanan': counting['lane_kanan']['total'],
+            'total': counting['total_counted'],
+        },
+        'processing_resolution': results.get('processing_resolution'),
+        'pipeline_stages': results.get('stage_timings'),
+    }
+
+
+async def _run_rest(settings: dict, video_path: str, workdir: str, model_path: str, inference: list) -> dict:
+    from app.config import database
+    from app.services.video_detection_rest import VideoDetectionRestService
+
+    collection = MemoryCollection()
+    database.db = {'deteksi': collection}
+
+    service = VideoDetectionRestService()
+    if model_path:
+        service.model_path = model_path
+    service.auto_resolution = settings['auto_resolution']
+
+    load_start = time.perf_counter()
+    await service.initialize_model()
+    model_load_time = time.perf_counter() - load_start
+    service.model = TimedModel(service.model, inference)
+
+    # The service deletes its input when done
+    input_path = os.path.join(workdir, 'rest_input.mp4')
+    shutil.copyfile(video_path, input_path)
+    tracking_id = 'benchmark'
+
+    start = time.perf_counter()
+    document = await service.process_video_async(tracking_id, input_path, '0' * 24, 'benchmark.mp4')
+    wall_time = time.perf_counter() - start
+
+    if document is None:
+        status = service.get_processing_status(tracking_id) or {}
+        raise RuntimeError(status.get('error') or status.get('message') or 'REST pipeline failed')
+
+    lanes = document.get('countingData', {})
+    kiri = sum(lanes.get('laneKiri', {}).values())
+    kanan = sum(lanes.get('laneKanan', {}).values())
+    return {
+        'model_load_time': round(model_load_time, 3),
+        'wall_time': round(wall_time, 3),
+        'frames': document['videoInfo']['totalFrames'],
+        'counted': {'kiri': kiri, 'kanan': kanan, 'total': kiri + kanan},
+        'processing_resolution': document['videoInfo'].get('processingResolution'),
+        'pipeline_stages': document.get('processingMetrics', {}).get('stageTimings'),
+    }
+
+
+def _scenario_worker(name: str, settings: dict, video_path: str, expected: dict, args: dict, queue):
+    os.environ.setdefault('YOLO_VERBOSE', 'False')
+    workdir = tempfile.mkdtemp(prefix=f'bench_{name}_')
+    inference = []
+
+    try:
+        if settings['pipeline'] == 'detector':
+            result = asyncio.run(_run_detector(settings, video_path, workdir, args['model'], inference))
+        else:
+            result = asyncio.run(_run_rest(settings, video_path, workdir, args['rest_model'], inference))
+
+        frames = result['frames']
+        result.update({
+            'scenario': name,
+            'settings': settings,
+            'fps': round(frames / result['wall_time'], 2) if result['wall_time'] > 0 else 0.0,
+            'frame_latency_ms': round(result['wall_time'] / frames * 1000, 3) if frames else None,
+            'stages': {
+                'inference': percentiles(inference),
+                # Per-stage breakdown recorded by the pipeline itself (ms)
+                'pipeline': result.pop('pipeline_stages', None),
+            },
+            'peak_rss_mb': peak_rss_mb(),
+            'expected': expected,
+            'count_accuracy': count_accuracy(result['counted'], expected),
+        })
+        queue.put(result)
+    except Exception as e:
+        queue.put({'scenario': name, 'settings': settings, 'error': f'{type(e).__name__}: {e}'})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_scenario(name: str, video_path: str, expected: dict, args: dict, timeout: float = None) -> dict:
+    """Run one scenario in a fresh process; a crashed or hung worker is reported as failed"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_scenario_worker,
+                          args=(name, SCENARIOS[name], video_path, expected, args, queue))
+    process.start()
+    deadline = time.monotonic() + timeout if timeout else None
+
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1.0)
+        except queue_module.Empty:
+            if not process.is_alive():
+                # The result may have been queued just before exiting
+                try:
+                    result = queue.get(timeout=1.0)
+                except queue_module.Empty:
+                    result = {'scenario': name, 'settings': SCENARIOS[name],
+                              'error': f'worker exited with code {process.exitcode} without a result'}
+            elif deadline is not None and time.monotonic() > deadline:
+                process.terminate()
+                result = {'scenario': name, 'settings': SCENARIOS[name],
+                          'error': f'timed out after {timeout:.0f}s'}
+
+    process.join(timeout=10)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    if 'error' in result:
+        print(f'❌ Scenario {name} failed: {result["error"]}', file=sys.stderr)
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--fps', type=float, default=25.0)
+    parser.add_argument('--duration', type=float, default=20.0, help='Video length in seconds')
+    parser.add_argument('--vehicles', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f'Comma separated subset of: {", ".join(SCENARIOS)}')
+    parser.add_argument('--model', default=None, help='Weights for YOLODetector (default: MODEL_PATH)')
+    parser.add_argument('--rest-model', default=None, help='Weights for the REST service (default: auto)')
+    parser.add_argument('--video', default=None, help='Keep the generated video at this path')
+    parser.add_argument('--output', default=None, help='Write JSON here instead of stdout')
+    parser.add_argument('--timeout', type=float, default=3600, help='Seconds before a scenario is abandoned')
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f'Unknown scenarios: {", ".join(unknown)}')
+
+    workdir = tempfile.mkdtemp(prefix='bench_video_')
+    video_path = args.video or os.path.join(workdir, 'synthetic.mp4')
+
+    try:
+        vehicles = plan_vehicles(args.width, args.height, args.fps, args.duration, args.vehicles, args.seed)
+        total_frames = generate_synthetic_video(video_path, args.width, args.height, args.fps,
+                                                args.duration, vehicles)
+        expected = expected_counts(vehicles, total_frames)
+        print(f'🎞️  Synthetic video: {args.width}x{args.height} @ {args.fps}fps, '
+              f'{total_frames} frames, {expected["total"]} crossings', file=sys.stderr)
+
+        scenario_args = {'model': args.model, 'rest_model': args.rest_model}
+        results = []
+        for name in names:
+            print(f'⏱️  Running {name}...', file=sys.stderr)
+            results.append(run_scenario(name, video_path, expected, scenario_args, timeout=args.timeout))
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'timestamp': datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'video': {
+                    'width': args.width,
+                    'height': args.height,
+                    'fps': args.fps,
+                    'frames': total_frames,
+                    'vehicles': args.vehicles,
+                    'seed': args.seed,
+                },
+            },
+            'scenarios': results,
+        }
+
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output)
+            print(f'✅ Results written to {args.output}', file=sys.stderr)
+        else:
+            print(output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ load_dotenv()
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.utils.password import hash_password
+from app.models.user import user_search_keys
 
 
 async def create_admin():
@@ -38,6 +39,7 @@ async def create_admin():
         "passwordUser": hash_password("admin123"),
         "role": "admin",
         "isActive": True,
+        "searchKeys": user_search_keys("Administrator", "admin@admin.com"),
         "createdAt": datetime.utcnow(),
         "updatedAt": datetime.utcnow()
     }
@@ -16,6 +16,7 @@ load_dotenv()
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.utils.password import hash_password
+from app.models.user import user_search_keys
 
 
 async def create_surveyor():
@@ -38,6 +39,7 @@ async def create_surveyor():
         "passwordUser": hash_password("surveyor123"),
         "role": "surveyor",
         "isActive": True,
+        "searchKeys": user_search_keys("Surveyor", "surveyor@surveyor.com"),
         "createdAt": datetime.utcnow(),
         "updatedAt": datetime.utcnow()
     }
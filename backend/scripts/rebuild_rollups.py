@@ -0,0 +1,40 @@
+"""
+Script to rebuild the daily traffic rollups from raw data
+Run: python scripts/rebuild_rollups.py
+"""
+
+import asyncio
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.services.rollups import rebuild_rollups
+
+
+async def main():
+    """Regenerate daily_rollups from perhitungan and deteksi"""
+    
+    # Get MongoDB URI
+    mongodb_uri = os.getenv("MONGODB_URI")
+    if not mongodb_uri:
+        print("❌ MONGODB_URI not set in environment variables")
+        return
+    
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(mongodb_uri)
+    db = client[os.getenv("DB_NAME", "yolo_detection")]
+    
+    count = await rebuild_rollups(db)
+    print(f"✅ {count} rollup dokumen dibuat ulang")
+    
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Admin user search - query shape and index usage
+"""
+
+import os
+import re
+import uuid
+
+import pytest
+
+from app.models.user import user_search_keys, user_search_filter
+
+
+def test_search_filter_is_anchored_lowercased_and_escaped():
+    search = "  Budi.S+(Jasa)*  "
+
+    pattern = user_search_filter(search)["searchKeys"]["$regex"]
+
+    assert pattern == "^" + re.escape("budi.s+(jasa)*")
+    assert pattern.startswith("^")
+    # Metacharacters are literal: the pattern matches only the exact prefix
+    assert re.match(pattern, "budi.s+(jasa)*@example.com")
+    assert not re.match(pattern, "budixs+(jasa)*")
+
+
+def test_search_keys_cover_name_words_email_and_domain():
+    keys = user_search_keys("Andi Budi", "Andi.B@Jasamarga.co.id")
+
+    assert keys == sorted(["andi budi", "andi", "budi", "andi.b@jasamarga.co.id", "jasamarga.co.id"])
+
+
+def _stages(plan: dict):
+    """Every stage in an explain plan tree (classic and SBE layouts)"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+@pytest.mark.skipif(not os.getenv("MONGODB_URI"), reason="MONGODB_URI not set")
+def test_search_query_uses_search_keys_index():
+    from pymongo import MongoClient
+
+    client = MongoClient(os.environ["MONGODB_URI"], serverSelectionTimeoutMS=5000)
+    collection = client[os.getenv("DB_NAME", "yolo_detection")][f"test_user_search_{uuid.uuid4().hex[:8]}"]
+    try:
+        # Same index as app.config.database.create_indexes
+        collection.create_index("searchKeys")
+        collection.insert_many([
+            {"namaUser": f"User {i}", "searchKeys": user_search_keys(f"User {i}", f"user{i}@example.com")}
+            for i in range(200)
+        ])
+
+        explain = collection.find(user_search_filter("User 1")).explain()
+        stages = list(_stages(explain["queryPlanner"]["winningPlan"]))
+
+        assert any(s["stage"] == "IXSCAN" and s.get("indexName") == "searchKeys_1" for s in stages), stages
+        assert not any(s["stage"] == "COLLSCAN" for s in stages), stages
+    finally:
+        collection.drop()
+        client.close()
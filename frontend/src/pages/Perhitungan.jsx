@@ -54,6 +54,8 @@ export default function Perhitungan({ onLogout }) {
   
   // Deteksi available
   const [deteksiList, setDeteksiList] = useState([])
+  const [deteksiCursor, setDeteksiCursor] = useState(null)
+  const [deteksiLoadingMore, setDeteksiLoadingMore] = useState(false)
   const [selectedDeteksi, setSelectedDeteksi] = useState(null)
   
   // Perhitungan history
@@ -106,15 +108,23 @@ export default function Perhitungan({ onLogout }) {
     }
   }
 
-  const loadDeteksiAvailable = async () => {
+  // First page replaces the list; passing the previous nextCursor appends the next one
+  const loadDeteksiAvailable = async (cursor = null) => {
+    const url = cursor
+      ? `${API_ENDPOINTS.PERHITUNGAN_DETEKSI_AVAILABLE}?cursor=${encodeURIComponent(cursor)}`
+      : API_ENDPOINTS.PERHITUNGAN_DETEKSI_AVAILABLE
+    if (cursor) setDeteksiLoadingMore(true)
     try {
-      const response = await apiRequest(API_ENDPOINTS.PERHITUNGAN_DETEKSI_AVAILABLE)
+      const response = await apiRequest(url)
       if (response.success) {
-        setDeteksiList(response.data)
+        setDeteksiList(prev => (cursor ? [...prev, ...response.data] : response.data))
+        setDeteksiCursor(response.pagination?.hasMore ? response.pagination.nextCursor : null)
       }
     } catch (err) {
       console.error('Failed to load deteksi:', err)
       setError('Gagal memuat daftar deteksi')
+    } finally {
+      setDeteksiLoadingMore(false)
     }
   }
 
@@ -438,6 +448,16 @@ export default function Perhitungan({ onLogout }) {
                       </div>
                     ))
                   )}
+                  {deteksiCursor && (
+                    <button
+                      type="button"
+                      onClick={() => loadDeteksiAvailable(deteksiCursor)}
+                      disabled={deteksiLoadingMore}
+                      className="w-full px-3 py-1.5 border border-gray-300 rounded-lg text-sm text-gray-700 hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
+                    >
+                      {deteksiLoadingMore ? 'Memuat...' : 'Muat lebih banyak'}
+                    </button>
+                  )}
                 </div>
               </div>
             )}